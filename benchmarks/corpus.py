@@ -0,0 +1,137 @@
+import os
+import json
+import wave
+import shutil
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+GENERATED_DIR_NAME = "generated"
+SAMPLES_DIR_NAME = "samples"
+
+# Versão do gerador: muda quando o áudio sintético muda, para não comparar corpora diferentes
+CORPUS_VERSION = 1
+
+# Frases lidas por um sintetizador de voz local (espeak-ng), quando disponível
+TTS_SENTENCES = [
+    ("pt", "O FalaMemo transcreve gravações de áudio diretamente no computador, sem enviar nada para a internet."),
+    ("pt", "A reunião de amanhã foi remarcada para as três horas da tarde na sala de conferências."),
+    ("en", "The quick brown fox jumps over the lazy dog while the radio plays in the kitchen."),
+]
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".opus")
+
+
+def write_wav(path, audio, sample_rate=SAMPLE_RATE):
+    """Grava áudio float32 (-1 a 1) como WAV PCM 16 bits mono"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def _silence(rng, seconds):
+    """Silêncio com um chiado de fundo muito baixo"""
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 1e-4).astype(np.float32)
+
+
+def _noise(rng, seconds):
+    """Ruído rosa aproximado (ruído branco filtrado), sem voz"""
+    white = rng.standard_normal(int(seconds * SAMPLE_RATE))
+    pink = np.convolve(white, np.ones(32) / 32, mode="same")
+    return (pink / np.abs(pink).max() * 0.2).astype(np.float32)
+
+
+def _syllables(rng, seconds):
+    """Rajadas harmônicas moduladas como sílabas, separadas por pausas longas
+
+    Não é fala de verdade, mas tem a estrutura de energia que exercita o
+    VAD e o corte por silêncios.
+    """
+    audio = _silence(rng, seconds)
+    position = 0
+    while position < len(audio) - SAMPLE_RATE:
+        burst = int(rng.uniform(1.5, 6.0) * SAMPLE_RATE)
+        burst = min(burst, len(audio) - position)
+        t = np.arange(burst) / SAMPLE_RATE
+        pitch = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 6) * t))
+        audio[position:position + burst] += (0.2 * voice * envelope).astype(np.float32)
+        position += burst + int(rng.uniform(1.0, 8.0) * SAMPLE_RATE)
+    return audio
+
+
+SYNTHETIC_ITEMS = [
+    ("silencio_60s", _silence, 60),
+    ("ruido_60s", _noise, 60),
+    ("silabas_180s", _syllables, 180),
+]
+
+
+def _tts_command():
+    """Sintetizador de voz local, se houver"""
+    for name in ("espeak-ng", "espeak"):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _generate_tts(directory, items):
+    """Gera frases faladas com referência exata para o cálculo do WER"""
+    command = _tts_command()
+    if not command:
+        return
+    for index, (language, sentence) in enumerate(TTS_SENTENCES):
+        path = os.path.join(directory, f"fala_{index:02d}_{language}.wav")
+        if not os.path.exists(path):
+            subprocess.run([command, "-v", language, "-s", "150", "-w", path, sentence],
+                           capture_output=True, check=True)
+        items.append({"name": os.path.basename(path), "path": path, "reference": sentence,
+                      "language": language, "kind": "tts"})
+
+
+def _collect_samples(directory, items):
+    """Amostras reais colocadas pelo usuário: <nome>.<áudio> com a referência em <nome>.txt"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        path = os.path.join(directory, name)
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+        items.append({"name": name, "path": path, "reference": reference, "language": None, "kind": "sample"})
+
+
+def build_corpus(corpus_dir=CORPUS_DIR, seed=0):
+    """Gera (uma vez) o corpus sintético e devolve a lista de itens com referências"""
+    generated_dir = os.path.join(corpus_dir, GENERATED_DIR_NAME)
+    os.makedirs(generated_dir, exist_ok=True)
+
+    items = []
+    for index, (name, generator, seconds) in enumerate(SYNTHETIC_ITEMS):
+        path = os.path.join(generated_dir, f"{name}_v{CORPUS_VERSION}.wav")
+        if not os.path.exists(path):
+            # Semente por item: o conteúdo não depende da ordem ou da lista de itens
+            write_wav(path, generator(np.random.default_rng(seed + index), seconds))
+        # Sem voz: a referência é vazia e o que sair é alucinação
+        items.append({"name": os.path.basename(path), "path": path, "reference": "",
+                      "language": "pt", "kind": "synthetic"})
+
+    _generate_tts(generated_dir, items)
+    _collect_samples(os.path.join(corpus_dir, SAMPLES_DIR_NAME), items)
+    return items
+
+
+if __name__ == "__main__":
+    print(json.dumps(build_corpus(), ensure_ascii=False, indent=2))
@@ -0,0 +1,206 @@
+import os
+import sys
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transcritor_model_store import PARTIAL_SUFFIX, ModelStore
+
+MODEL_NAME = "teste"
+FILE_NAME = "teste.pt"
+
+# Tamanho do arquivo servido e ponto em que a primeira resposta é cortada
+DEFAULT_SIZE = 3 * 1024 * 1024 + 123
+DEFAULT_CUT = 1024 * 1024 + 45
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+
+class ModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload):
+        """Servidor local que entrega payload em /<sha256>/teste.pt, com suporte a Range
+
+        cut_next corta a próxima resposta depois desse número de bytes
+        (a conexão cai com o Content-Length prometido incompleto);
+        accept_range=False faz o servidor ignorar o cabeçalho Range.
+        """
+        super().__init__(("127.0.0.1", 0), _ModelHandler)
+        self.payload = payload
+        self.cut_next = None
+        self.accept_range = True
+        self.requests = []  # Cabeçalho Range (ou None) de cada pedido
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _ModelHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        requested = self.headers.get("Range")
+        server.requests.append(requested)
+        if not self.path.endswith("/" + FILE_NAME):
+            self.send_error(404)
+            return
+
+        start = 0
+        if requested and server.accept_range:
+            start = int(requested.split("=", 1)[1].split("-", 1)[0])
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(payload)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+        else:
+            self.send_response(200)
+        body = payload[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if server.cut_next is not None:
+            body = body[:server.cut_next]
+            server.cut_next = None
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _store(model_dir, server, sha256):
+    """ModelStore com um só modelo, servido pelo servidor local e conferido contra sha256"""
+    return ModelStore(model_dir=model_dir, mirror="", urls={
+        MODEL_NAME: f"{server.base_url}/{sha256}/{FILE_NAME}",
+    })
+
+
+def check_resume(server, sha256, cut):
+    """Download interrompido no meio e retomado com Range de onde parou"""
+    errors = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        store = _store(model_dir, server, sha256)
+        partial_path = store.path_for(MODEL_NAME) + PARTIAL_SUFFIX
+
+        server.requests.clear()
+        server.cut_next = cut
+        try:
+            store.ensure(MODEL_NAME)
+            errors.append("o download cortado não falhou")
+        except RuntimeError:
+            pass
+        size = os.path.getsize(partial_path) if os.path.exists(partial_path) else None
+        if size != cut:
+            errors.append(f"arquivo parcial com {size} bytes, esperado {cut}")
+
+        progress = []
+        path = store.ensure(MODEL_NAME, progress=lambda done, total: progress.append((done, total)))
+        if server.requests[-1] != f"bytes={cut}-":
+            errors.append(f"a retomada pediu Range {server.requests[-1]!r}, esperado 'bytes={cut}-'")
+        if progress and progress[0][0] != cut:
+            errors.append(f"o progresso da retomada começou em {progress[0][0]}, esperado {cut}")
+        if not progress or progress[-1] != (len(server.payload), len(server.payload)):
+            errors.append(f"o progresso terminou em {progress[-1] if progress else None}")
+        with open(path, "rb") as f:
+            if f.read() != server.payload:
+                errors.append("o arquivo retomado difere do original")
+        if os.path.exists(partial_path):
+            errors.append("o arquivo .part ficou para trás")
+        if not store.is_available(MODEL_NAME):
+            errors.append("o modelo retomado não consta como disponível")
+    return errors
+
+
+def check_no_range(server, sha256, cut):
+    """Servidor sem retomada: o download recomeça do zero em vez de duplicar o início"""
+    errors = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        store = _store(model_dir, server, sha256)
+        server.cut_next = cut
+        try:
+            store.ensure(MODEL_NAME)
+        except RuntimeError:
+            pass
+        server.accept_range = False
+        try:
+            path = store.ensure(MODEL_NAME)
+            with open(path, "rb") as f:
+                if f.read() != server.payload:
+                    errors.append("o arquivo baixado de novo difere do original")
+        except RuntimeError as e:
+            errors.append(f"o download sem Range falhou: {e}")
+        finally:
+            server.accept_range = True
+    return errors
+
+
+def check_mismatch(server):
+    """SHA-256 diferente do esperado: falha, sem deixar o arquivo final nem o .part"""
+    errors = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        store = _store(model_dir, server, hashlib.sha256(b"outro arquivo").hexdigest())
+        path = store.path_for(MODEL_NAME)
+        try:
+            store.ensure(MODEL_NAME)
+            errors.append("um arquivo com o SHA-256 errado foi aceito")
+        except RuntimeError:
+            pass
+        if os.path.exists(path):
+            errors.append("o arquivo com o SHA-256 errado foi movido para o lugar final")
+        if os.path.exists(path + PARTIAL_SUFFIX):
+            errors.append("o arquivo .part com o SHA-256 errado ficou para trás")
+        if store.is_available(MODEL_NAME):
+            errors.append("o modelo consta como disponível")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.downloads",
+        description="FalaMemo - confere a retomada do download de modelos e a verificação do SHA-256 "
+                    "contra um servidor HTTP local",
+    )
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE,
+                        help=f"Tamanho do arquivo servido em bytes (padrão: {DEFAULT_SIZE})")
+    parser.add_argument("--cut", type=int, default=DEFAULT_CUT,
+                        help=f"Bytes entregues antes de a conexão cair (padrão: {DEFAULT_CUT})")
+    args = parser.parse_args(argv)
+    if not 0 < args.cut < args.size:
+        print("--cut precisa ficar entre 0 e --size", file=sys.stderr)
+        return EXIT_FAILED
+
+    payload = os.urandom(args.size)
+    sha256 = hashlib.sha256(payload).hexdigest()
+    server = ModelServer(payload)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    checks = [
+        ("retomada com Range", lambda: check_resume(server, sha256, args.cut)),
+        ("servidor sem Range", lambda: check_no_range(server, sha256, args.cut)),
+        ("SHA-256 divergente", lambda: check_mismatch(server)),
+    ]
+    failed = False
+    try:
+        for label, check in checks:
+            errors = check()
+            print(f"{label}: {'ok' if not errors else 'FALHOU'}")
+            for error in errors:
+                print(f"  {error}", file=sys.stderr)
+            failed = failed or bool(errors)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+import gc
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.corpus import CORPUS_DIR, GENERATED_DIR_NAME, SAMPLE_RATE, _syllables
+from benchmarks.metrics import peak_rss_mb
+
+# Áudio longo gerado em blocos deste tamanho, para o gerador também não crescer com a duração
+CHUNK_SECONDS = 600
+
+# Crescimento do pico de memória (do arquivo mais curto ao mais longo) aceito no modo de memória limitada
+DEFAULT_TOLERANCE_MB = 64
+
+# Maior leitura aceita em --reads: um bloco de quadros do VAD (cerca de 4 min) ou uma janela de 30 s
+MAX_READ_SECONDS = 300
+
+# Duração do áudio transcrito em --reads para conferir que o arquivo PCM é fechado
+CLOSE_CHECK_SECONDS = 60
+
+EXIT_OK = 0
+EXIT_GROWTH = 1
+EXIT_FAILED = 2
+
+
+def long_wav_path(hours, corpus_dir=CORPUS_DIR):
+    return os.path.join(corpus_dir, GENERATED_DIR_NAME, f"longo_{hours:g}h.wav")
+
+
+def write_long_wav(path, seconds, seed=0):
+    """Grava (uma vez) um WAV sintético longo, bloco a bloco"""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+    with wave.open(partial, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        for index, start in enumerate(range(0, int(seconds), CHUNK_SECONDS)):
+            chunk = _syllables(np.random.default_rng(seed + index), min(CHUNK_SECONDS, seconds - start))
+            f.writeframes((np.clip(chunk, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    os.replace(partial, path)
+    return path
+
+
+def _features(audio, low_memory):
+    """Mel de todas as janelas de 30 s do arquivo, como o laço de decodificação faz"""
+    from whisper.audio import N_FRAMES, N_SAMPLES, log_mel_spectrogram
+    from transcritor_decoder import WindowedMel
+
+    if low_memory:
+        features = WindowedMel(audio, 80)
+        frames = features.frames - N_FRAMES
+        for seek in range(0, frames, N_FRAMES):
+            features.window_at(seek, N_FRAMES)
+        return frames
+    mel = log_mel_spectrogram(np.asarray(audio), 80, padding=N_SAMPLES)
+    return mel.shape[-1] - N_FRAMES
+
+
+def write_pcm(path, seconds, seed=0):
+    """Grava um PCM float32 sintético direto, como o cache de áudio guarda (sem passar pelo ffmpeg)"""
+    with open(path, "wb") as f:
+        for index, start in enumerate(range(0, int(seconds), CHUNK_SECONDS)):
+            chunk = _syllables(np.random.default_rng(seed + index), min(CHUNK_SECONDS, seconds - start))
+            np.clip(chunk, -1.0, 1.0).astype(np.float32).tofile(f)
+    return path
+
+
+def _read_counter(pcm_path):
+    """PcmFile que anota o tamanho de cada leitura"""
+    from transcritor_audio import PcmFile
+
+    class ReadCounter(PcmFile):
+        def __init__(self, pcm_path):
+            super().__init__(pcm_path)
+            self.largest = 0
+            self.total = 0
+
+        def __getitem__(self, key):
+            data = super().__getitem__(key)
+            self.largest = max(self.largest, len(data))
+            self.total += len(data)
+            return data
+
+    return ReadCounter(pcm_path)
+
+
+def measure_reads(pcm_path, vad):
+    """Maior leitura e total lido do arquivo no VAD e no mel de todas as janelas do modo de memória limitada"""
+    from transcritor_vad import prepare_speech_audio
+
+    with _read_counter(pcm_path) as reader:
+        audio = reader
+        if vad:
+            audio, _, _ = prepare_speech_audio(reader, lazy=True)
+        _features(audio, low_memory=True)
+    return {"largest": reader.largest, "total": reader.total, "samples": len(reader)}
+
+
+def _open_files(path):
+    """Descritores do processo abertos para path; None onde /proc não existe"""
+    if not os.path.isdir("/proc/self/fd"):
+        return None
+    opened = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            opened += os.readlink(os.path.join("/proc/self/fd", fd)) == path
+        except OSError:
+            pass
+    return opened
+
+
+def check_closed(work_dir, model_name):
+    """Transcreve no modo de memória limitada até o fim e cancelando no meio; o PCM tem de ficar fechado"""
+    from benchmarks.corpus import write_wav
+    from transcritor_audio import get_audio_cache
+    from transcritor_backend import TranscritorBackend
+    from transcritor_decoder import CancellationToken, TranscriptionCancelled
+
+    # O PCM vai direto para o cache de áudio, com o hash do WAV, e o backend não precisa do ffmpeg
+    wav_path = os.path.join(work_dir, "fechamento.wav")
+    write_wav(wav_path, _syllables(np.random.default_rng(7), CLOSE_CHECK_SECONDS))
+    cache = get_audio_cache()
+    os.makedirs(cache.cache_dir, exist_ok=True)
+    pcm_path = os.path.realpath(write_pcm(cache.pcm_path(cache.file_hash(wav_path)), CLOSE_CHECK_SECONDS, 7))
+
+    backend = TranscritorBackend()
+    if not backend.load_model(model_name, device="cpu"):
+        return [f"não foi possível carregar o modelo {model_name}"]
+
+    errors = []
+    for cancel in (False, True):
+        label = "cancelada" if cancel else "concluída"
+        token = CancellationToken()
+        backend.set_callbacks(transcription_progress=(lambda *_: token.cancel()) if cancel else None)
+        # Um arquivo esquecido aberto e recolhido pelo coletor gera ResourceWarning
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            try:
+                for _ in backend.transcribe_iter(wav_path, language="pt", checkpoint=False, use_cache=False,
+                                                 cancel_token=token, low_memory=True):
+                    pass
+                if cancel:
+                    errors.append("a transcrição não foi cancelada")
+            except TranscriptionCancelled:
+                if not cancel:
+                    errors.append("a transcrição foi cancelada sem pedido")
+            gc.collect()
+        unclosed = [w for w in caught if issubclass(w.category, ResourceWarning) and os.path.basename(pcm_path) in str(w.message)]
+        if unclosed:
+            errors.append(f"transcrição {label}: o PCM foi recolhido sem ser fechado")
+        opened = _open_files(pcm_path)
+        if opened:
+            errors.append(f"transcrição {label}: {opened} descritor(es) do PCM continuam abertos")
+    return errors
+
+
+def check_reads(args):
+    """--reads: a maior leitura do PCM não cresce com a duração e o arquivo é fechado no fim"""
+    from whisper.audio import SAMPLE_RATE as WHISPER_RATE
+
+    failed = False
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.environ["FALAMEMO_AUDIO_CACHE"] = os.path.join(work_dir, "audio")
+        results = []
+        for value in args.hours:
+            pcm_path = write_pcm(os.path.join(work_dir, f"longo_{value:g}h.f32"), int(value * 3600))
+            for vad in (False, True):
+                result = measure_reads(pcm_path, vad)
+                result.update(hours=value, vad=vad)
+                results.append(result)
+                print(f"{value:g} h ({'com VAD' if vad else 'sem VAD'}): maior leitura "
+                      f"{result['largest'] / WHISPER_RATE:.1f} s, {result['total'] / result['samples']:.2f}x "
+                      f"o arquivo lido no total")
+            os.remove(pcm_path)
+
+        for vad in (False, True):
+            rows = [result for result in results if result["vad"] == vad]
+            largest = max(result["largest"] for result in rows)
+            if largest > MAX_READ_SECONDS * WHISPER_RATE:
+                print(f"Leitura de {largest / WHISPER_RATE:.0f} s, acima de {MAX_READ_SECONDS} s", file=sys.stderr)
+                failed = True
+            if rows[-1]["largest"] > rows[0]["largest"]:
+                print(f"A maior leitura cresceu de {rows[0]['largest']} para {rows[-1]['largest']} amostras "
+                      f"de {rows[0]['hours']:g} h a {rows[-1]['hours']:g} h", file=sys.stderr)
+                failed = True
+
+        from benchmarks.server import random_checkpoint
+
+        model = args.model or random_checkpoint(os.path.join(work_dir, "aleatorio.pt"))
+        errors = check_closed(work_dir, model)
+        print(f"PCM fechado no fim e no cancelamento: {'ok' if not errors else 'FALHOU'}")
+        for error in errors:
+            print(f"  {error}", file=sys.stderr)
+
+    if errors:
+        return EXIT_FAILED
+    return EXIT_GROWTH if failed else EXIT_OK
+
+
+def measure(path, low_memory, vad=False, model_name=None, decode_seconds=120.0, threads=None):
+    """Pico de memória de um arquivo; roda em um processo novo, para o pico ser só desta medição
+
+    Sem modelo, mede a leitura do áudio, o VAD e o mel de todas as janelas.
+    Com modelo, transcreve pelo backend até decode_seconds de áudio, gravando
+    os segmentos em disco como a CLI.
+    """
+    result = {"path": path, "low_memory": low_memory, "vad": vad, "model": model_name}
+    try:
+        from transcritor_audio import load_audio, pcm_reader
+        from transcritor_cpu import configure_threads
+        from transcritor_vad import prepare_speech_audio
+
+        result["threads"] = configure_threads(threads)
+        import torch  # noqa: F401 (importado antes da linha de base da memória)
+        import whisper  # noqa: F401
+
+        start = time.perf_counter()
+        if model_name:
+            from transcritor_backend import TranscritorBackend
+            from transcritor_export import Exporter, output_paths
+
+            backend = TranscritorBackend()
+            if not backend.load_model(model_name, device="cpu"):
+                raise RuntimeError(f"não foi possível carregar o modelo {model_name}")
+            result["base_rss_mb"] = peak_rss_mb()
+            start = time.perf_counter()
+            segments = 0
+            with tempfile.TemporaryDirectory() as output_dir:
+                with Exporter(output_paths(path, output_dir, ["txt", "json"])) as exporter:
+                    for segment in backend.transcribe_iter(path, language="pt", checkpoint=False, use_cache=False,
+                                                           vad=vad, low_memory=low_memory):
+                        exporter.write([segment])
+                        segments += 1
+                        if segment.end >= decode_seconds:
+                            break
+            result["segments"] = segments
+            result["duration"] = backend.last_duration
+        else:
+            result["base_rss_mb"] = peak_rss_mb()
+            audio = load_audio(path)
+            if low_memory:
+                audio = pcm_reader(audio)
+            result["duration"] = len(audio) / SAMPLE_RATE
+            source = audio
+            if vad:
+                audio, _, _ = prepare_speech_audio(audio, lazy=low_memory)
+            result["frames"] = _features(audio, low_memory)
+            if low_memory:
+                source.close()
+        result["elapsed"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory",
+        description="FalaMemo - confere que o pico de memória do modo de memória limitada não cresce com a duração",
+    )
+    parser.add_argument("--hours", default="0.5,1,2",
+                        help="Durações dos áudios sintéticos em horas, separadas por vírgula (padrão: 0.5,1,2)")
+    parser.add_argument("--full-max-hours", type=float, default=1.0,
+                        help="Medir também o modo normal (mel do arquivo inteiro) até esta duração (padrão: 1)")
+    parser.add_argument("--vad", action="store_true", help="Incluir o VAD antes do mel")
+    parser.add_argument("-m", "--model", default=None,
+                        help="Transcrever com este modelo em vez de medir só áudio, VAD e mel")
+    parser.add_argument("--decode-seconds", type=float, default=120.0,
+                        help="Com --model, parar depois deste trecho de áudio transcrito (padrão: 120)")
+    parser.add_argument("--reads", action="store_true",
+                        help="Em vez do pico de memória, conferir que a maior leitura do PCM não cresce com a duração "
+                             "(com e sem VAD) e que o backend fecha o arquivo no fim e no cancelamento; "
+                             "dispensa o ffmpeg")
+    parser.add_argument("-t", "--threads", type=int, default=None, help="Threads do PyTorch")
+    parser.add_argument("--tolerance-mb", type=float, default=DEFAULT_TOLERANCE_MB,
+                        help=f"Crescimento aceito do pico de memória (padrão: {DEFAULT_TOLERANCE_MB} MB)")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR, help="Pasta do corpus (padrão: benchmarks/corpus)")
+    parser.add_argument("-o", "--output", default=None, help="Gravar as medições neste arquivo JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        hours = sorted(float(value) for value in args.hours.split(",") if value.strip())
+    except ValueError:
+        print(f"Durações inválidas: {args.hours}", file=sys.stderr)
+        return EXIT_FAILED
+    if args.reads:
+        args.hours = hours
+        return check_reads(args)
+
+    # Decodificar cada áudio antes de medir: o ffmpeg roda fora do processo medido, mas só uma vez
+    from transcritor_audio import load_audio
+
+    paths = {}
+    for value in hours:
+        path = write_long_wav(long_wav_path(value, args.corpus_dir), int(value * 3600))
+        print(f"Preparando {os.path.basename(path)}...")
+        load_audio(path)
+        paths[value] = path
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for value in hours:
+        modes = [True] + ([False] if value <= args.full_max_hours else [])
+        for low_memory in modes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(measure, paths[value], low_memory, args.vad, args.model,
+                                         args.decode_seconds, args.threads).result()
+            result["hours"] = value
+            results.append(result)
+            label = "limitada" if low_memory else "normal"
+            if result.get("error"):
+                print(f"{value:g} h ({label}): erro: {result['error']}", file=sys.stderr)
+            else:
+                print(f"{value:g} h ({label}): pico {result['peak_rss_mb']:.0f} MB "
+                      f"(+{result['peak_rss_mb'] - result['base_rss_mb']:.0f} MB), {result['elapsed']:.1f} s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if any(result.get("error") for result in results):
+        return EXIT_FAILED
+
+    bounded = [result for result in results if result["low_memory"]]
+    growth = bounded[-1]["peak_rss_mb"] - bounded[0]["peak_rss_mb"]
+    print(f"Crescimento do pico no modo de memória limitada: {growth:+.0f} MB "
+          f"de {bounded[0]['hours']:g} h a {bounded[-1]['hours']:g} h")
+    if growth > args.tolerance_mb:
+        print(f"O pico cresceu mais que {args.tolerance_mb:g} MB", file=sys.stderr)
+        return EXIT_GROWTH
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
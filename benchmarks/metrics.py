@@ -0,0 +1,54 @@
+import re
+import sys
+import unicodedata
+
+
+def normalize_text(text):
+    """Minúsculas, sem pontuação e com espaços simples, para comparar palavras"""
+    text = unicodedata.normalize("NFC", text.lower())
+    text = re.sub(r"[^\w\s']", " ", text)
+    return text.split()
+
+
+def word_errors(reference, hypothesis):
+    """Distância de edição em palavras (substituições + inserções + remoções)"""
+    ref = normalize_text(reference)
+    hyp = normalize_text(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1], len(ref)
+
+
+def word_error_rate(reference, hypothesis):
+    """WER da hipótese; None sem referência ou com referência vazia (sem voz)"""
+    if not reference:
+        return None
+    errors, words = word_errors(reference, hypothesis)
+    return errors / words
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo atual, em MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil, se instalado, informa o pico do conjunto de trabalho
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
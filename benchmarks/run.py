@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.corpus import build_corpus
+from benchmarks.metrics import peak_rss_mb, word_error_rate, word_errors, normalize_text
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# Modos medidos: nome -> opções do backend
+MODES = {
+    "default": {"vad": False, "fast_cpu": False},
+    "vad": {"vad": True, "fast_cpu": False},
+    "fast-cpu": {"vad": False, "fast_cpu": True},
+}
+
+# Piora relativa do RTF (em relação à linha de base) que conta como regressão
+DEFAULT_THRESHOLD = 0.10
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_FAILED = 2
+
+
+def combination_key(model_name, engine, mode):
+    return f"{model_name}/{engine}/{mode}"
+
+
+def audio_duration(path):
+    """Duração de um WAV sem decodificar; None para outros formatos"""
+    try:
+        with wave.open(path, "rb") as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def _check_offline(model_name, engine):
+    """Garante que nada será baixado: o modelo precisa estar no diretório local"""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    if engine != "whisper" or os.path.isfile(model_name):
+        return
+    from transcritor_model_store import get_model_store
+    store = get_model_store()
+    if store.is_known(model_name) and not store.is_available(model_name):
+        raise RuntimeError(f"O modelo {model_name} não está no diretório local; use "
+                           f"'python transcritor_cli.py models --download {model_name}' (ou --import) antes")
+
+
+def run_combination(model_name, engine, mode, items, threads=None, repeat=1):
+    """Mede uma combinação modelo/motor/modo; roda em um processo novo, para a carga e o RSS serem limpos"""
+    options = MODES[mode]
+    result = {"model": model_name, "engine": engine, "mode": mode, "files": []}
+    try:
+        _check_offline(model_name, engine)
+
+        from transcritor_backend import TranscritorBackend
+        from transcritor_audio import load_audio
+        from transcritor_cpu import configure_threads
+
+        # Mesmo número de threads em todos os modos, para comparar só o que muda entre eles
+        result["threads"] = configure_threads(threads)
+
+        backend = TranscritorBackend()
+        start = time.perf_counter()
+        if not backend.load_model(model_name, device="cpu", engine=engine, fast_cpu=options["fast_cpu"]):
+            raise RuntimeError(f"não foi possível carregar o modelo {model_name}")
+        result["load_time"] = time.perf_counter() - start
+
+        for item in items:
+            # Decodificar o áudio antes de medir: o tempo medido é só o da transcrição
+            load_audio(item["path"])
+
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                first_segment = None
+                texts = []
+                for segment in backend.transcribe_iter(item["path"], language=item["language"], checkpoint=False,
+                                                       use_cache=False, vad=options["vad"]):
+                    if first_segment is None:
+                        first_segment = time.perf_counter() - start
+                    texts.append(segment.text.strip())
+                wall = time.perf_counter() - start
+                if best is None or wall < best["wall_time"]:
+                    best = {"wall_time": wall, "time_to_first_segment": first_segment, "texts": texts}
+
+            duration = audio_duration(item["path"]) or backend.last_duration
+            hypothesis = " ".join(best["texts"])
+            entry = {
+                "name": item["name"],
+                "kind": item["kind"],
+                "duration": duration,
+                "wall_time": best["wall_time"],
+                "rtf": best["wall_time"] / duration if duration else None,
+                "time_to_first_segment": best["time_to_first_segment"],
+                "segments": len(best["texts"]),
+                "hypothesis": hypothesis,
+                "wer": word_error_rate(item["reference"], hypothesis),
+            }
+            if item["reference"]:
+                entry["word_errors"], entry["reference_words"] = word_errors(item["reference"], hypothesis)
+            elif item["reference"] == "":
+                # Áudio sem voz: toda palavra gerada é alucinação
+                entry["hallucinated_words"] = len(normalize_text(hypothesis))
+            result["files"].append(entry)
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def summarize(result):
+    """Totais de uma combinação: RTF agregado, WER agregado e médias"""
+    files = result["files"]
+    audio = sum(f["duration"] or 0 for f in files)
+    wall = sum(f["wall_time"] for f in files)
+    errors = sum(f.get("word_errors", 0) for f in files)
+    words = sum(f.get("reference_words", 0) for f in files)
+    first = [f["time_to_first_segment"] for f in files if f["time_to_first_segment"] is not None]
+    return {
+        "load_time": result.get("load_time"),
+        "audio_duration": audio,
+        "wall_time": wall,
+        "rtf": wall / audio if audio else None,
+        "time_to_first_segment": sum(first) / len(first) if first else None,
+        "wer": errors / words if words else None,
+        "hallucinated_words": sum(f.get("hallucinated_words", 0) for f in files),
+        "peak_rss_mb": result.get("peak_rss_mb"),
+    }
+
+
+def environment():
+    """Máquina e versões, para saber se duas medições são comparáveis"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+    for package in ("torch", "whisper", "faster_whisper"):
+        try:
+            module = __import__(package)
+            info[package] = getattr(module, "__version__", "?")
+        except ImportError:
+            pass
+    try:
+        info["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def _format(value, pattern):
+    return "-" if value is None else pattern.format(value)
+
+
+def comparison_table(report, baseline, threshold):
+    """Tabela de texto com o RTF atual, o da linha de base e a variação; devolve (linhas, regressões)"""
+    header = ("combinação", "carga(s)", "RTF", "base", "Δ", "1º seg(s)", "WER", "alucin.", "RSS(MB)")
+    rows = [header]
+    regressions = []
+    failures = []
+    base_summary = (baseline or {}).get("summary", {})
+
+    for key, summary in report["summary"].items():
+        base = base_summary.get(key, {}).get("rtf")
+        delta = None
+        if summary.get("error"):
+            failures.append(f"{key}: erro: {summary['error']}")
+            continue
+        if base and summary["rtf"] is not None:
+            delta = summary["rtf"] / base - 1
+            if delta > threshold:
+                regressions.append(key)
+        rows.append((
+            key,
+            _format(summary["load_time"], "{:.2f}"),
+            _format(summary["rtf"], "{:.3f}"),
+            _format(base, "{:.3f}"),
+            _format(delta, "{:+.1%}"),
+            _format(summary["time_to_first_segment"], "{:.2f}"),
+            _format(summary["wer"], "{:.1%}"),
+            str(summary["hallucinated_words"]),
+            _format(summary["peak_rss_mb"], "{:.0f}"),
+        ))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return lines + failures, regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="FalaMemo - mede tempo, RTF, memória e WER por modelo, motor e modo",
+    )
+    parser.add_argument("--models", default="tiny", help="Modelos separados por vírgula (padrão: tiny)")
+    parser.add_argument("--engines", default="whisper", help="Motores separados por vírgula (padrão: whisper)")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help=f"Modos separados por vírgula: {', '.join(MODES)} (padrão: todos)")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="Threads do PyTorch (padrão: núcleos físicos)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Transcrever cada arquivo N vezes e ficar com a mais rápida")
+    parser.add_argument("--corpus-dir", default=None, help="Pasta do corpus (padrão: benchmarks/corpus)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Arquivo JSON de resultado (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Linha de base para comparação")
+    parser.add_argument("--save-baseline", action="store_true", help="Gravar este resultado como linha de base")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Piora relativa do RTF que falha a execução (padrão: 0.10)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    models = [name.strip() for name in args.models.split(",") if name.strip()]
+    engines = [name.strip() for name in args.engines.split(",") if name.strip()]
+    modes = [name.strip() for name in args.modes.split(",") if name.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        print(f"Modos desconhecidos: {', '.join(unknown)}", file=sys.stderr)
+        return EXIT_FAILED
+
+    items = build_corpus(args.corpus_dir) if args.corpus_dir else build_corpus()
+    print(f"Corpus: {len(items)} arquivos")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "corpus": [{key: item[key] for key in ("name", "kind", "reference")} for item in items],
+        "results": [],
+        "summary": {},
+    }
+
+    # Um processo novo por combinação: tempo de carga e pico de memória sem interferência das anteriores
+    context = multiprocessing.get_context("spawn")
+    for model_name in models:
+        for engine in engines:
+            for mode in modes:
+                key = combination_key(model_name, engine, mode)
+                print(f"Medindo {key}...")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_combination, model_name, engine, mode, items,
+                                             args.threads, args.repeat).result()
+                report["results"].append(result)
+                summary = summarize(result)
+                if result.get("error"):
+                    summary["error"] = result["error"]
+                    print(f"Falha em {key}: {result['error']}", file=sys.stderr)
+                report["summary"][key] = summary
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    write_json(output, report)
+    print(f"Resultado salvo em {output}")
+
+    baseline = load_baseline(args.baseline)
+    lines, regressions = comparison_table(report, baseline, args.threshold)
+    print()
+    print("\n".join(lines))
+    print()
+
+    if baseline and baseline.get("environment", {}).get("processor") != report["environment"]["processor"]:
+        print("Aviso: a linha de base foi medida em outra máquina", file=sys.stderr)
+
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print(f"Linha de base atualizada: {args.baseline}")
+
+    if any(result.get("error") for result in report["results"]):
+        return EXIT_FAILED
+    if regressions and not args.save_baseline:
+        print(f"Regressão acima de {args.threshold:.0%} em: {', '.join(regressions)}", file=sys.stderr)
+        return EXIT_REGRESSION
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
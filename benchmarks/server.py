@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import http.client
+from dataclasses import asdict
+
+import numpy as np
+
+from benchmarks.corpus import _syllables, write_wav
+
+# Duração dos áudios sintéticos: curtos para os fluxos, longo para cancelar no meio
+DEFAULT_SECONDS = 40
+LONG_SECONDS = 600
+
+# Jobs enviados e cancelados logo em seguida na verificação da corrida entre fila e cancelamento
+DEFAULT_RACE_JOBS = 12
+
+REQUEST_TIMEOUT = 300
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+FINAL_EVENTS = ("done", "failed", "cancelled")
+
+
+def random_checkpoint(path):
+    """Grava um checkpoint whisper pequeno com pesos aleatórios (o texto não importa aqui)"""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+                           n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1)
+    torch.manual_seed(0)
+    model = Whisper(dims)
+    # O whisper cria este parâmetro com torch.empty (o checkpoint real o preenche): sem isto ele
+    # carrega lixo da memória e os logits podem sair NaN em algumas execuções
+    with torch.no_grad():
+        model.decoder.positional_embedding.normal_(0.0, 0.02)
+    torch.save({"dims": asdict(dims), "model_state_dict": model.state_dict()}, path)
+    return path
+
+
+def synthetic_wav(directory, name, seconds, seed):
+    """WAV de sílabas sintéticas; sementes diferentes não repetem o cache de resultados"""
+    path = os.path.join(directory, name)
+    write_wav(path, _syllables(np.random.default_rng(seed), seconds))
+    return path
+
+
+class Client:
+    def __init__(self, url):
+        """Cliente mínimo da API do servidor, uma conexão por pedido"""
+        self.address = url.split("//", 1)[1]
+
+    def request(self, method, path, body=None, content_type="application/json"):
+        """Devolve (código HTTP, JSON da resposta)"""
+        connection = http.client.HTTPConnection(self.address, timeout=REQUEST_TIMEOUT)
+        try:
+            headers = {"Content-Type": content_type} if body is not None else {}
+            if isinstance(body, dict):
+                body = json.dumps(body).encode("utf-8")
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read() or b"null")
+        finally:
+            connection.close()
+
+    def submit(self, path, **options):
+        status, job = self.request("POST", "/jobs", {"path": path, **options})
+        if status != 202:
+            raise RuntimeError(f"POST /jobs respondeu {status}: {job}")
+        return job
+
+    def stream(self, path):
+        """Lê um fluxo chunked até o fim; devolve (código, Content-Type, linhas)"""
+        connection = http.client.HTTPConnection(self.address, timeout=REQUEST_TIMEOUT)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            lines = [line.decode("utf-8").rstrip("\n") for line in response]
+            return response.status, response.headers.get("Content-Type", ""), lines
+        finally:
+            connection.close()
+
+    def events(self, job_id):
+        """Eventos (tipo, dados) do fluxo Server-Sent Events do job, até ele terminar"""
+        status, content_type, lines = self.stream(f"/jobs/{job_id}/events")
+        if status != 200 or not content_type.startswith("text/event-stream"):
+            raise RuntimeError(f"/events respondeu {status} ({content_type})")
+        events = []
+        kind = None
+        for line in lines:
+            if line.startswith("event: "):
+                kind = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((kind, json.loads(line[len("data: "):])))
+        return events
+
+
+def _final_events(events):
+    return [kind for kind, _ in events if kind in FINAL_EVENTS]
+
+
+def check_stream(client, audio_path):
+    """Envio por caminho, estado, fluxo SSE e repetição dos segmentos em linhas JSON"""
+    errors = []
+    job = client.submit(audio_path, language="pt")
+    if job["status"] not in ("queued", "running"):
+        errors.append(f"job recém-criado com estado {job['status']}")
+
+    events = client.events(job["id"])
+    segments = [data for kind, data in events if kind == "segment"]
+    if _final_events(events) != ["done"]:
+        errors.append(f"eventos finais do fluxo: {_final_events(events)}")
+    if not any(kind == "progress" for kind, _ in events):
+        errors.append("o fluxo não trouxe progresso")
+
+    status, state = client.request("GET", f"/jobs/{job['id']}")
+    if status != 200 or state["status"] != "done":
+        errors.append(f"GET /jobs/{{id}} respondeu {status} com estado {state.get('status')}")
+    elif state["segments"] != len(segments):
+        errors.append(f"{state['segments']} segmentos no estado e {len(segments)} no fluxo")
+    elif "text" not in state:
+        errors.append("o estado do job concluído não tem o texto")
+
+    status, content_type, lines = client.stream(f"/jobs/{job['id']}/segments")
+    rows = [json.loads(line) for line in lines if line]
+    if status != 200 or not content_type.startswith("application/x-ndjson"):
+        errors.append(f"/segments respondeu {status} ({content_type})")
+    elif rows[:-1] != segments or rows[-1].get("status") != "done":
+        errors.append("as linhas JSON não repetem os segmentos do fluxo seguidos do estado final")
+    return errors
+
+
+def check_upload(client, manager, audio_path):
+    """Áudio enviado no corpo: transcrito e apagado do servidor no fim"""
+    errors = []
+    with open(audio_path, "rb") as f:
+        status, job = client.request("POST", "/jobs?filename=enviado.wav&language=pt", f.read(), "audio/wav")
+    if status != 202:
+        return [f"POST /jobs com o áudio respondeu {status}: {job}"]
+    if _final_events(client.events(job["id"])) != ["done"]:
+        errors.append("o job do áudio enviado não terminou com done")
+    if os.listdir(manager.upload_dir):
+        errors.append(f"áudios enviados ficaram em {manager.upload_dir}")
+    return errors
+
+
+def check_cancel(client, long_path, short_path):
+    """Cancelar um job em andamento e outro ainda na fila atrás dele"""
+    errors = []
+    running = client.submit(long_path, language="pt")
+    queued = client.submit(short_path, language="pt")
+
+    status, state = client.request("DELETE", f"/jobs/{queued['id']}")
+    if status != 200 or state["status"] != "cancelled":
+        errors.append(f"o job na fila ficou {state.get('status')} depois do DELETE")
+
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    while client.request("GET", f"/jobs/{running['id']}")[1]["status"] == "queued":
+        if time.monotonic() > deadline:
+            return errors + ["o job longo não começou"]
+        time.sleep(0.05)
+    client.request("DELETE", f"/jobs/{running['id']}")
+    events = client.events(running["id"])
+    if _final_events(events) != ["cancelled"]:
+        errors.append(f"o job em andamento terminou com {_final_events(events)}")
+
+    events = client.events(queued["id"])
+    if _final_events(events) != ["cancelled"] or any(kind == "status" for kind, _ in events):
+        errors.append(f"o job cancelado na fila chegou a rodar: {[kind for kind, _ in events]}")
+    return errors
+
+
+def check_cancel_race(client, audio_paths):
+    """Cancelar logo depois de enviar: cada job termina uma vez só e nunca volta a rodar"""
+    errors = []
+    jobs = []
+    for index, path in enumerate(audio_paths):
+        job = client.submit(path, language="pt")
+        # Atrasos variados, para o cancelamento cair antes, durante e depois da saída da fila
+        time.sleep(0.002 * (index % 5))
+        client.request("DELETE", f"/jobs/{job['id']}")
+        jobs.append(job)
+
+    for job in jobs:
+        events = client.events(job["id"])
+        finals = _final_events(events)
+        state = client.request("GET", f"/jobs/{job['id']}")[1]
+        if len(finals) != 1:
+            errors.append(f"job {job['id']} com eventos finais {finals}")
+        elif finals[0] != state["status"]:
+            errors.append(f"job {job['id']} terminou com {finals[0]} mas está {state['status']}")
+        elif finals[0] == "cancelled" and events[-1][0] != "cancelled":
+            errors.append(f"job {job['id']} recebeu eventos depois de cancelado")
+    return errors
+
+
+def check_not_found(client):
+    status, _ = client.request("GET", "/jobs/inexistente")
+    return [] if status == 404 else [f"job inexistente respondeu {status}"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.server",
+        description="FalaMemo - confere a API do servidor local (envio, estado, cancelamento e fluxos) "
+                    "contra um servidor em 127.0.0.1",
+    )
+    parser.add_argument("-m", "--model", default=None,
+                        help="Modelo usado nos jobs (padrão: um checkpoint pequeno com pesos aleatórios)")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS,
+                        help=f"Duração dos áudios curtos (padrão: {DEFAULT_SECONDS} s)")
+    parser.add_argument("--race-jobs", type=int, default=DEFAULT_RACE_JOBS,
+                        help=f"Jobs enviados e cancelados em seguida (padrão: {DEFAULT_RACE_JOBS})")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Cache de resultados próprio: nenhum job pode sair pronto de uma execução anterior
+        os.environ["FALAMEMO_RESULT_CACHE"] = os.path.join(work_dir, "resultados.sqlite3")
+        from transcritor_server import JobManager, TranscriptionServer
+
+        model = args.model or random_checkpoint(os.path.join(work_dir, "aleatorio.pt"))
+        short = [synthetic_wav(work_dir, f"curto_{index}.wav", args.seconds, index)
+                 for index in range(args.race_jobs + 3)]
+        long_path = synthetic_wav(work_dir, "longo.wav", LONG_SECONDS, 1000)
+
+        manager = JobManager(workers=1, threads_per_job=2, default_model=model,
+                             upload_dir=os.path.join(work_dir, "envios"))
+        manager.start()
+        manager.preload(model)
+        server = TranscriptionServer(manager, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        client = Client(server.url)
+
+        checks = [
+            ("envio, estado e fluxos", lambda: check_stream(client, short[0])),
+            ("áudio enviado no corpo", lambda: check_upload(client, manager, short[1])),
+            ("cancelamento na fila e em andamento", lambda: check_cancel(client, long_path, short[2])),
+            ("corrida entre fila e cancelamento", lambda: check_cancel_race(client, short[3:])),
+            ("job inexistente", lambda: check_not_found(client)),
+        ]
+        failed = False
+        try:
+            for label, check in checks:
+                started = time.perf_counter()
+                try:
+                    errors = check()
+                except (OSError, RuntimeError, ValueError) as e:
+                    errors = [str(e)]
+                print(f"{label}: {'ok' if not errors else 'FALHOU'} ({time.perf_counter() - started:.1f} s)")
+                for error in errors:
+                    print(f"  {error}", file=sys.stderr)
+                failed = failed or bool(errors)
+        finally:
+            server.shutdown()
+            server.server_close()
+            manager.stop()
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que não podem ser importados antes da primeira transcrição
+HEAVY_MODULES = ("torch", "whisper", "faster_whisper", "ctranslate2")
+
+# Importa o mesmo que o main.py (sem criar a janela, que exige display) em um interpretador novo
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    """Tempo de importação de module em runs processos novos; devolve (tempos, módulos pesados carregados)"""
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["elapsed"])
+        loaded.update(result["loaded"])
+    return times, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.startup",
+        description="FalaMemo - mede a importação da interface e confere que torch/whisper ficam para depois",
+    )
+    parser.add_argument("--module", default="transcritor_frontend", help="Módulo importado (padrão: transcritor_frontend)")
+    parser.add_argument("--runs", type=int, default=5, help="Processos medidos (padrão: 5)")
+    args = parser.parse_args(argv)
+
+    try:
+        times, loaded = measure(args.module, args.runs)
+    except subprocess.CalledProcessError as e:
+        print(f"Falha ao importar {args.module}:\n{e.stderr}", file=sys.stderr)
+        return 2
+
+    print(f"{args.module}: mediana {statistics.median(times) * 1000:.0f} ms, "
+          f"mínimo {min(times) * 1000:.0f} ms em {len(times)} processos")
+    print(f"Tempo até a janela em uso real: {os.path.join('~', '.falamemo', 'inicializacao.jsonl')}")
+    if loaded:
+        print(f"Importados cedo demais: {', '.join(loaded)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
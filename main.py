@@ -1,7 +1,11 @@
+import time
+STARTED = time.perf_counter()
+
 import tkinter as tk
 import customtkinter as ctk
 import webbrowser
 from transcritor_frontend import TranscritorFrontend
+IMPORTED = time.perf_counter()
 
 def add_developer_signature(root):
     """Adiciona a assinatura do desenvolvedor na parte inferior da janela"""
@@ -60,6 +64,9 @@ if __name__ == "__main__":
         # Inicializar a aplicação
         app = TranscritorFrontend(root)
         
+        # Tempo até a janela aparecer (métrica de inicialização)
+        app.report_startup(STARTED, IMPORTED)
+        
         # Iniciar o loop principal
         root.mainloop()
     except Exception as e:
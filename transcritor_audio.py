@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+
+from transcritor_trace import get_tracer
+
+SAMPLE_RATE = 16000
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".falamemo", "audio_cache")
+
+# Orçamento padrão do cache de áudio decodificado (em MB)
+DEFAULT_BUDGET_MB = 10240
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+class AudioCache:
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """Cache de áudio decodificado para PCM float32 16 kHz mono
+
+        Cada arquivo é decodificado pelo ffmpeg uma única vez e salvo com o
+        hash do conteúdo como nome; depois é lido com numpy.memmap, que só
+        carrega da memória as páginas realmente usadas.
+        """
+        self.cache_dir = cache_dir or os.environ.get("FALAMEMO_AUDIO_CACHE", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            budget_mb = int(os.environ.get("FALAMEMO_AUDIO_CACHE_MB", DEFAULT_BUDGET_MB))
+            max_bytes = budget_mb * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.cache_dir, "hashes.json")
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _read_index(self):
+        """Índice caminho -> hash como está no disco"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_index(self):
+        """Lê o índice caminho -> hash (chamar com o lock)"""
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _save_entry(self, file_path, entry):
+        """Grava uma entrada no índice de forma atômica (chamar com o lock)
+
+        O índice é relido antes de gravar: outros processos (os da transcrição
+        paralela, outra instância do app) podem ter acrescentado entradas.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._read_index()
+        self._index[file_path] = entry
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix="hashes.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def file_hash(self, file_path):
+        """SHA-256 do conteúdo do arquivo, memorizado por caminho, tamanho e data"""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        with self._lock:
+            entry = self._load_index().get(file_path)
+            if entry and entry["signature"] == signature:
+                return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with get_tracer().span("audio_hash", bytes=stat.st_size), open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        with self._lock:
+            self._save_entry(file_path, {"signature": signature, "sha256": sha256})
+        return sha256
+
+    def pcm_path(self, audio_hash):
+        """Caminho do PCM decodificado de um hash"""
+        return os.path.join(self.cache_dir, audio_hash + ".f32")
+
+    def decode(self, file_path):
+        """Garante que o arquivo está decodificado no cache e devolve o caminho do PCM"""
+        pcm_path = self.pcm_path(self.file_hash(file_path))
+        if os.path.exists(pcm_path):
+            # Marcar como usado recentemente para o descarte por idade
+            os.utime(pcm_path)
+            return pcm_path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Nome único por chamada: duas threads podem decodificar o mesmo arquivo ao mesmo tempo
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(pcm_path) + ".",
+                                         suffix=".tmp")
+        os.close(fd)
+        cmd = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", file_path,
+            "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(SAMPLE_RATE),
+            "-y", "-loglevel", "error", temp_path,
+        ]
+        try:
+            with get_tracer().span("ffmpeg", file=os.path.basename(file_path)):
+                subprocess.run(cmd, capture_output=True, check=True)
+            os.replace(temp_path, pcm_path)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Falha ao decodificar áudio: {e.stderr.decode(errors='ignore')}") from e
+        finally:
+            # Com falha (ou sem ffmpeg), o arquivo temporário não fica para trás
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict(keep=pcm_path)
+        return pcm_path
+
+    def load(self, file_path):
+        """Retorna o áudio como array float32 mapeado do disco"""
+        return open_pcm(self.decode(file_path))
+
+    def used_bytes(self):
+        """Espaço ocupado pelos arquivos PCM do cache"""
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, max_bytes=None, keep=None):
+        """Apaga os PCMs usados há mais tempo até caber no orçamento"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        used = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if used <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Apaga todo o áudio decodificado"""
+        self.evict(0)
+
+    def _entries(self):
+        """Lista (caminho, último uso, tamanho) dos PCMs do cache"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".f32"):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+
+def open_pcm(pcm_path):
+    """Abre um arquivo PCM float32 como memmap (cópia na escrita, nunca altera o cache)"""
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(pcm_path, dtype=np.float32, mode="c")
+
+
+class PcmFile:
+    def __init__(self, pcm_path):
+        """PCM float32 lido do disco por fatias, sem mapear o arquivo na memória
+
+        Páginas lidas de um memmap continuam contando na memória do processo
+        até o sistema precisar delas; aqui cada fatia é uma leitura comum e
+        a memória usada é só a da fatia pedida.
+        """
+        self.path = pcm_path
+        self.dtype = np.dtype(np.float32)
+        self._length = os.path.getsize(pcm_path) // self.dtype.itemsize
+        self._file = open(pcm_path, "rb")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def shape(self):
+        return (self._length,)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("PcmFile só aceita fatias contíguas")
+        first, last, _ = key.indices(self._length)
+        if last <= first:
+            return np.zeros(0, dtype=np.float32)
+        with self._lock:
+            self._file.seek(first * self.dtype.itemsize)
+            return np.fromfile(self._file, dtype=np.float32, count=last - first)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Fecha o arquivo aberto para as leituras"""
+        self._file.close()
+
+
+def pcm_reader(audio):
+    """Troca o memmap devolvido por load_audio por um PcmFile do mesmo arquivo"""
+    if isinstance(audio, np.memmap) and audio.filename:
+        return PcmFile(audio.filename)
+    return audio
+
+
+def get_audio_cache():
+    """Retorna o cache de áudio compartilhado pelo processo"""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
+
+
+def load_audio(file_path):
+    """Carrega um arquivo de áudio pelo cache de PCM decodificado"""
+    return get_audio_cache().load(file_path)
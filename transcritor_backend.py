@@ -1,23 +1,46 @@
 import os
-import sys
+import time
 import threading
-import whisper
-import re
-import io
-from datetime import datetime
+from contextlib import nullcontext
+from transcritor_decoder import CancellationToken, TranscriptionCancelled
+from transcritor_engines import DEFAULT_ENGINE, create_engine, import_libraries
+from transcritor_checkpoint import TranscriptionCheckpoint
+from transcritor_vad import SAMPLE_RATE, prepare_speech_audio
+from transcritor_audio import PcmFile, get_audio_cache, load_audio, pcm_reader
+from transcritor_result_cache import get_result_cache
+from transcritor_language import DEFAULT_SAMPLE_WINDOWS, cached_detection, detect_in_windows, store_detection
+from transcritor_trace import get_tracer
+from transcritor_batch import DEFAULT_MAX_WAIT, get_encoder_batcher
+from transcritor_stream import DEFAULT_BUFFER_SECONDS, DEFAULT_STEP_SECONDS, RingBuffer, StreamingTranscriber
+
+# A partir desta duração o modo de memória limitada é ligado automaticamente
+LOW_MEMORY_SECONDS = 3600
 
 class TranscritorBackend:
     def __init__(self):
         """Inicializa o backend do transcritor"""
         self.model = None
         self.model_name = None
+        self.engine = None
+        self.engine_name = DEFAULT_ENGINE
+        self.fast_cpu = False
         self.stop_transcription = False
-        self.monitor_running = False
+        self.cancel_token = CancellationToken()
+        self.last_segments = []
+        self.last_duration = 0.0
+        self.last_vad_report = None
+        self.last_language_detection = None
+        self.last_result_key = None
+        self.live_buffer = None
+        # Janelas por passada do codificador junto com outras transcrições do mesmo modelo (1: sem lote)
+        self.batch_size = 1
+        self.batch_max_wait = DEFAULT_MAX_WAIT
         self.download_progress_callback = None
         self.transcription_progress_callback = None
         self.transcription_complete_callback = None
         self.transcription_update_callback = None
         self.error_callback = None
+        self.language_detected_callback = None
         
         # Dicionário com descrições dos modelos
         self.model_descriptions = {
@@ -38,14 +61,28 @@ class TranscritorBackend:
         }
     
     def set_callbacks(self, download_progress=None, transcription_progress=None, 
-                     transcription_complete=None, transcription_update=None, error=None):
+                     transcription_complete=None, transcription_update=None, error=None,
+                     language_detected=None):
         """Define callbacks para comunicação com o frontend"""
+        # transcription_update recebe uma lista com os segmentos novos, não o texto acumulado
         self.download_progress_callback = download_progress
         self.transcription_progress_callback = transcription_progress
         self.transcription_complete_callback = transcription_complete
         self.transcription_update_callback = transcription_update
         self.error_callback = error
+        # language_detected recebe o LanguageDetection antes da decodificação começar
+        self.language_detected_callback = language_detected
     
+    def set_batching(self, batch_size=1, max_wait=DEFAULT_MAX_WAIT):
+        """Agrupa o codificador com outras transcrições do mesmo modelo no processo
+
+        Com batch_size > 1, cada janela de 30 s espera até max_wait segundos
+        por janelas de outros backends (threads) que usam o mesmo modelo, e
+        todas passam juntas pelo codificador. Só vale para o motor whisper.
+        """
+        self.batch_size = max(1, int(batch_size))
+        self.batch_max_wait = max_wait
+
     def get_model_description(self, model_name):
         """Retorna a descrição de um modelo específico"""
         return self.model_descriptions.get(model_name, "")
@@ -54,20 +91,27 @@ class TranscritorBackend:
         """Retorna o tamanho aproximado de um modelo específico"""
         return self.model_sizes.get(model_name, "Desconhecido")
     
-    def load_model(self, model_name):
-        """Carrega um modelo Whisper"""
+    def load_model(self, model_name, device=None, engine=None, fast_cpu=False):
+        """Carrega um modelo no motor de inferência escolhido, reaproveitando o cache de modelos
+
+        Com fast_cpu=True, as threads seguem os núcleos físicos e, no motor
+        whisper em CPU, as camadas Linear usam pesos int8.
+        """
+        engine = create_engine(engine or self.engine_name, fast_cpu=fast_cpu)
         self.model_name = model_name
+        self.engine_name = engine.name
+        self.fast_cpu = fast_cpu
+        self.engine = None
         self.model = None
-        
-        print(f"Iniciando carregamento do modelo {model_name}")
-        
-        # Configurar monitoramento do download do modelo
-        self._setup_download_monitor()
-        
+
+        print(f"Iniciando carregamento do modelo {model_name} ({engine.name})")
+
         try:
-            # Carregar o modelo
-            print(f"Chamando whisper.load_model({model_name})")
-            self.model = whisper.load_model(model_name)
+            # Baixar (se preciso) e carregar o modelo
+            with get_tracer().span("load_model", model=model_name, engine=engine.name):
+                engine.load(model_name, device, progress=self.download_progress_callback)
+            self.engine = engine
+            self.model = engine.model
             print(f"Modelo {model_name} carregado com sucesso")
             return True
         except Exception as e:
@@ -76,241 +120,344 @@ class TranscritorBackend:
                 self.error_callback(f"Erro ao carregar modelo: {str(e)}")
             return False
     
-    def _setup_download_monitor(self):
-        """Configura o monitoramento do download do modelo"""
-        if not self.download_progress_callback:
-            print("Callback de progresso de download não configurado")
-            return
-            
-        print(f"Configurando monitoramento de download para modelo {self.model_name}")
-        
-        # Thread para monitorar o progresso do download do modelo
-        def monitor_download_progress():
-            # Padrão para capturar a porcentagem de download
-            pattern = re.compile(r'(\d+)%\|[█▒]+\| (\d+\.\d+)M/(\d+)M')
-            alt_pattern = re.compile(r'(\d+)% \d+\.\d+M/(\d+\.\d+)M')
-            
-            # Simular progresso inicial para feedback imediato
-            if self.download_progress_callback:
-                self.download_progress_callback(1)
-                print("Enviando progresso inicial de 1%")
-            
-            last_progress = 1
-            check_count = 0
-            max_checks = 600  # 5 minutos (600 * 0.5s)
-            
-            while last_progress < 100 and check_count < max_checks:
-                check_count += 1
-                found_progress = False
-                
-                # Verificar o terminal para o progresso de download
-                try:
-                    # Ler o arquivo de log mais recente na pasta temp
-                    import glob
-                    import os
-                    temp_dir = os.path.join(os.path.expanduser("~"), "AppData", "Local", "Temp")
-                    log_files = glob.glob(os.path.join(temp_dir, "*.log"))
-                    
-                    if log_files:
-                        # Pegar os arquivos de log mais recentes (até 3)
-                        recent_logs = sorted(log_files, key=os.path.getmtime, reverse=True)[:3]
-                        
-                        for log_file in recent_logs:
-                            try:
-                                # Ler as últimas linhas do arquivo
-                                with open(log_file, 'r', errors='ignore') as f:
-                                    # Ir para o final do arquivo e voltar algumas linhas
-                                    f.seek(0, 2)
-                                    file_size = f.tell()
-                                    f.seek(max(0, file_size - 5000), 0)  # Ler os últimos 5000 bytes
-                                    last_lines = f.read()
-                                    
-                                    # Procurar por padrões de progresso
-                                    matches = pattern.findall(last_lines)
-                                    if not matches:
-                                        matches = alt_pattern.findall(last_lines)
-                                    
-                                    if matches:
-                                        # Pegar o último match
-                                        if len(matches[0]) >= 1:
-                                            percent = int(matches[-1][0])
-                                            
-                                            if percent > last_progress:
-                                                last_progress = percent
-                                                # Atualizar a interface
-                                                self.download_progress_callback(percent)
-                                                print(f"Progresso de download detectado: {percent}%")
-                                                found_progress = True
-                                                break
-                            except Exception as e:
-                                print(f"Erro ao ler arquivo de log {log_file}: {e}")
-                except Exception as e:
-                    print(f"Erro ao monitorar progresso em logs: {e}")
-                
-                # Método alternativo: capturar diretamente da saída
-                if not found_progress:
-                    import sys
-                    if hasattr(sys.stdout, 'getvalue'):
-                        try:
-                            output = sys.stdout.getvalue()
-                            matches = pattern.findall(output)
-                            if not matches:
-                                matches = alt_pattern.findall(output)
-                                
-                            if matches:
-                                percent = int(matches[-1][0])
-                                
-                                if percent > last_progress:
-                                    last_progress = percent
-                                    # Atualizar a interface
-                                    self.download_progress_callback(percent)
-                                    print(f"Progresso de download detectado na saída: {percent}%")
-                                    found_progress = True
-                        except Exception as e:
-                            print(f"Erro ao capturar saída: {e}")
-                
-                # Se o modelo já estiver carregado, podemos parar o monitoramento
-                if self.model is not None:
-                    print("Modelo já carregado, finalizando monitoramento")
-                    # Enviar 100% para completar a barra de progresso
-                    self.download_progress_callback(100)
-                    break
-                
-                # Se estamos há muito tempo sem encontrar progresso, simular progresso
-                if not found_progress and check_count % 20 == 0 and last_progress < 95:
-                    # A cada 10 segundos (20 * 0.5s), incrementar um pouco o progresso
-                    # para dar feedback ao usuário
-                    new_progress = min(95, last_progress + 5)
-                    if new_progress > last_progress:
-                        last_progress = new_progress
-                        self.download_progress_callback(last_progress)
-                        print(f"Simulando progresso: {last_progress}%")
-                
-                import time
-                time.sleep(0.5)  # Verificar a cada meio segundo
-            
-            # Garantir que o progresso chegue a 100% no final
-            if last_progress < 100 and self.model is not None:
-                self.download_progress_callback(100)
-                print("Finalizando progresso em 100%")
-        
-        # Iniciar thread de monitoramento
-        download_monitor = threading.Thread(target=monitor_download_progress)
-        download_monitor.daemon = True
-        download_monitor.start()
-        print("Thread de monitoramento de download iniciada")
+    def preload_model(self, model_name, engine=None, fast_cpu=False, device=None, cancelled=None):
+        """Carrega um modelo no cache de modelos sem trocar o modelo em uso
+
+        Usado para adiantar a carga antes do clique em Transcrever: o
+        load_model seguinte encontra o modelo pronto (ou espera a carga em
+        andamento, sem repeti-la). Nunca baixa nada; devolve o motor
+        carregado, ou None se o modelo não estiver no disco ou cancelled()
+        ficar verdadeiro antes da carga.
+        """
+        engine = create_engine(engine or self.engine_name, fast_cpu=fast_cpu)
+        if not engine.is_local(model_name):
+            return None
+        import_libraries()
+        if cancelled and cancelled():
+            return None
+        with get_tracer().span("preload_model", model=model_name, engine=engine.name):
+            engine.load(model_name, device)
+        return engine
     
-    def transcribe(self, file_path, language=None, start_from_scratch=True):
-        """Transcreve um arquivo de áudio"""
+    def release_preloaded(self, engine):
+        """Libera um modelo carregado por preload_model que não será usado
+
+        Só descarta o modelo se a própria carga antecipada o colocou no cache
+        de modelos: um modelo que já estava lá (de uma transcrição anterior ou
+        de outra carga) continua em memória.
+        """
+        if engine.created and engine.model is not None and engine.model is not self.model:
+            engine.unload()
+    
+    def preload_libraries(self):
+        """Importa torch e whisper antes da primeira transcrição (pode rodar em segundo plano)"""
+        import_libraries()
+    
+    def detect_language(self, file_path, windows=DEFAULT_SAMPLE_WINDOWS, use_cache=True, audio=None,
+                        audio_hash=None):
+        """Detecta o idioma amostrando várias janelas de 30 s com voz ao longo do arquivo
+
+        Devolve um LanguageDetection com as probabilidades médias. Com
+        use_cache=True, uma detecção anterior do mesmo áudio (mesmo modelo) é
+        reaproveitada e, sem ela, o idioma de vários arquivos recentes da mesma
+        pasta, quando todos concordam com boa confiança.
+        """
         if not os.path.exists(file_path):
-            if self.error_callback:
-                self.error_callback("O arquivo selecionado não existe.")
-            return None
-            
+            raise FileNotFoundError("O arquivo selecionado não existe.")
         if not self.model:
-            if self.error_callback:
-                self.error_callback("Nenhum modelo carregado. Carregue um modelo primeiro.")
+            raise RuntimeError("Nenhum modelo carregado. Carregue um modelo primeiro.")
+
+        detection = None
+        if use_cache:
+            audio_hash = audio_hash or get_audio_cache().file_hash(file_path)
+            detection = cached_detection(audio_hash, self.model_name, os.path.dirname(os.path.abspath(file_path)))
+
+        if detection is None:
+            if audio is None:
+                audio = load_audio(file_path)
+            with get_tracer().span("detect_language", windows=windows):
+                detection = detect_in_windows(self.engine, audio, windows)
+            if use_cache:
+                store_detection(audio_hash, self.model_name, file_path, detection)
+
+        origin = {"audio": f"{detection.windows} janelas", "cache": "cache", "directory": "pasta"}[detection.source]
+        print(f"Idioma detectado: {detection.language} ({detection.probability:.0%}, {origin})")
+        if detection.low_confidence:
+            print(f"Aviso: idioma detectado com pouca confiança; prováveis: {detection.probabilities}")
+
+        self.last_language_detection = detection
+        if self.language_detected_callback:
+            self.language_detected_callback(detection)
+        return detection
+    
+    def transcribe_iter(self, file_path, language=None, resume=False, checkpoint=True,
+                        cancel_token=None, vad=False, use_cache=True, low_memory=None, **options):
+        """Gera os segmentos transcritos à medida que cada janela é decodificada
+
+        Com resume=True, os segmentos salvos no checkpoint são gerados primeiro
+        e a decodificação continua a partir da última janela concluída.
+        Sem cancel_token, usa o token do backend (controlado por stop/pause).
+        Com vad=True, só os trechos com voz são enviados ao modelo e os tempos
+        são convertidos de volta para a linha do tempo original.
+        Com use_cache=True, um resultado idêntico já salvo é devolvido sem
+        nenhum trabalho do modelo.
+        Com language=None, o idioma é detectado antes (detect_language) e
+        informado pelo callback language_detected antes da decodificação.
+        Com low_memory=True (automático com low_memory=None em áudios a partir
+        de LOW_MEMORY_SECONDS, se o motor suportar), o mel é calculado por
+        janela e o áudio só com voz não é copiado, então a memória não cresce
+        com a duração; os segmentos não ficam acumulados e o resultado não vai
+        para o cache de resultados.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError("O arquivo selecionado não existe.")
+
+        # Opções que mudam o resultado: entram na chave do cache e do checkpoint
+        result_options = self._result_options(vad, options)
+        tracer = get_tracer()
+
+        self.last_result_key = None
+        audio_hash = get_audio_cache().file_hash(file_path) if use_cache else None
+        if use_cache and self.model_name:
+            with tracer.span("result_cache"):
+                cached = get_result_cache().get(audio_hash, self.model_name, language, result_options)
+            if cached:
+                print(f"Transcrição encontrada no cache de resultados ({len(cached.segments)} segmentos)")
+                self.last_result_key = cached.key
+                self.last_duration = cached.duration
+                self.last_vad_report = None
+                for segment in cached.segments:
+                    yield segment
+                return
+
+        if not self.model:
+            raise RuntimeError("Nenhum modelo carregado. Carregue um modelo primeiro.")
+
+        # PCM decodificado uma única vez e lido do disco sob demanda
+        with tracer.span("load_audio"):
+            audio = load_audio(file_path)
+        if low_memory is None:
+            low_memory = len(audio) >= LOW_MEMORY_SECONDS * SAMPLE_RATE
+        if low_memory and not self.engine.supports_low_memory:
+            print(f"O motor {self.engine_name} não tem modo de memória limitada; usando o modo normal")
+            low_memory = False
+        if low_memory:
+            print("Modo de memória limitada: mel por janela, sem guardar o resultado no cache")
+            audio = pcm_reader(audio)
+        # O PcmFile do modo de memória limitada é fechado no fim, também com cancelamento ou erro
+        with audio if isinstance(audio, PcmFile) else nullcontext():
+            source_audio = audio
+            timeline = None
+            self.last_vad_report = None
+            if vad:
+                with tracer.span("vad"):
+                    audio, timeline, report = prepare_speech_audio(audio, lazy=low_memory)
+                self.last_vad_report = report
+                print(f"VAD: {report.skipped_duration:.1f}s de {report.total_duration:.1f}s "
+                      f"sem voz foram pulados ({report.skipped_ratio:.0%})")
+
+            saved = TranscriptionCheckpoint(file_path) if checkpoint or resume else None
+            state = saved.load(self.model_name, language, result_options) if resume else None
+            collected = []
+            detected_language = language
+
+            decode_options = dict(options, cancel_token=cancel_token or self.cancel_token)
+            if low_memory:
+                decode_options["low_memory"] = True
+            if self.batch_size > 1 and self.engine.supports_batching:
+                decode_options["encoder"] = get_encoder_batcher(self.model, self.batch_size, self.batch_max_wait)
+            # Sem acumular segmentos quando a memória precisa ficar limitada
+            store_result = use_cache and not low_memory
+            if state:
+                print(f"Retomando transcrição a partir de {state['seek']:.1f}s")
+                decode_options.update(
+                    language=state["language"],
+                    initial_seek=state["seek"],
+                    initial_prompt_tokens=state["prompt_tokens"],
+                    first_segment_id=len(state["segments"]),
+                )
+                self.last_duration = state["duration"]
+                detected_language = state["language"]
+                for segment in state["segments"]:
+                    if store_result:
+                        collected.append(segment)
+                    yield segment
+                if checkpoint:
+                    saved.resume()
+            else:
+                if language is None:
+                    # Idioma escolhido antes da decodificação; as chaves continuam "auto"
+                    detection = self.detect_language(file_path, use_cache=use_cache, audio=source_audio,
+                                                     audio_hash=audio_hash)
+                    decode_options["language"] = detection.language
+                    detected_language = detection.language
+                else:
+                    decode_options["language"] = language
+                if checkpoint:
+                    saved.start(self.model_name, language, result_options)
+
+            windows = []
+            if timeline is None or timeline.regions:
+                windows = self.engine.transcribe_stream(audio, **decode_options)
+
+            try:
+                # Tempo de cada janela no motor, sem contar o tempo de quem consome os segmentos
+                window_start = time.perf_counter()
+                for window in windows:
+                    tracer.record("window", window_start, time.perf_counter(), {"start": round(window.start, 1)})
+                    tracer.count("windows")
+                    if timeline is not None:
+                        for segment in window.segments:
+                            timeline.map_segment(segment)
+                        self.last_duration = self.last_vad_report.total_duration
+                    else:
+                        self.last_duration = window.duration
+                    if checkpoint:
+                        saved.append(window)
+                    detected_language = window.language
+
+                    # Progresso calculado pela posição real no áudio
+                    if self.transcription_progress_callback:
+                        self.transcription_progress_callback(min(0.99, window.progress))
+
+                    for segment in window.segments:
+                        if store_result:
+                            collected.append(segment)
+                        yield segment
+                    window_start = time.perf_counter()
+            finally:
+                if saved:
+                    saved.close()
+
+            # Transcrição completa: guardar o resultado e descartar o checkpoint
+            if store_result:
+                self.last_result_key = get_result_cache().put(
+                    audio_hash, self.model_name, language, result_options, collected,
+                    detected_language=detected_language, duration=self.last_duration,
+                )
+            if saved:
+                saved.remove()
+
+    def transcribe_live(self, source, language=None, buffer_seconds=DEFAULT_BUFFER_SECONDS,
+                        step_seconds=DEFAULT_STEP_SECONDS, cancel_token=None, **options):
+        """Transcreve uma entrada ao vivo (LiveSource), gerando um StreamUpdate por decodificação
+
+        O áudio passa por um RingBuffer de buffer_seconds, então a memória
+        não depende da duração da sessão. Termina quando a entrada acaba ou
+        finish_live() é chamado; o áudio já recebido é decodificado antes.
+        Só os segmentos definitivos vão para o callback transcription_update.
+        """
+        if not self.model:
+            raise RuntimeError("Nenhum modelo carregado. Carregue um modelo primeiro.")
+
+        buffer = self.live_buffer = RingBuffer(buffer_seconds)
+        stop = threading.Event()
+        source.start(buffer, stop)
+        transcriber = StreamingTranscriber(self.engine, language, step_seconds,
+                                           cancel_token=cancel_token or self.cancel_token,
+                                           language_detected=self.language_detected_callback, **options)
+        self.last_vad_report = None
+        try:
+            for update in transcriber.run(buffer):
+                self.last_duration = update.position
+                if update.final and self.transcription_update_callback:
+                    self.transcription_update_callback(update.final)
+                yield update
+        finally:
+            stop.set()
+            buffer.close()
+            self.live_buffer = None
+
+    def finish_live(self):
+        """Encerra a entrada ao vivo; o que já chegou ainda é transcrito e vira definitivo"""
+        if self.live_buffer is not None:
+            self.live_buffer.close()
+
+    def _result_options(self, vad, options, engine=None, fast_cpu=None):
+        """Opções que entram na chave do resultado (o motor padrão fica de fora, como antes)"""
+        result_options = dict(options)
+        if vad:
+            result_options["vad"] = True
+        engine = engine or self.engine_name
+        if engine != DEFAULT_ENGINE:
+            result_options["engine"] = engine
+        # Pesos int8 mudam levemente o texto: resultado separado do fp32
+        fast_cpu = self.fast_cpu if fast_cpu is None else fast_cpu
+        if engine == DEFAULT_ENGINE and fast_cpu:
+            result_options["int8"] = True
+        return result_options
+
+    def lookup_result(self, file_path, model_name, language=None, vad=False, engine=None, fast_cpu=False,
+                      **options):
+        """Procura uma transcrição já feita com as mesmas configurações, sem carregar o modelo"""
+        if not os.path.exists(file_path):
             return None
-            
+        result_options = self._result_options(vad, options, engine, fast_cpu)
+        audio_hash = get_audio_cache().file_hash(file_path)
+        cached = get_result_cache().get(audio_hash, model_name, language, result_options)
+        if cached:
+            self.last_result_key = cached.key
+            self.last_duration = cached.duration
+        return cached
+
+    def remember_saved_path(self, saved_path):
+        """Associa o arquivo salvo pelo usuário ao último resultado no cache"""
+        if self.last_result_key:
+            get_result_cache().set_saved_path(self.last_result_key, saved_path)
+
+    def has_checkpoint(self, file_path):
+        """Indica se existe uma transcrição interrompida que pode ser retomada"""
+        return os.path.exists(file_path) and TranscriptionCheckpoint(file_path).load() is not None
+
+    def transcribe(self, file_path, language=None, start_from_scratch=True, vad=False):
+        """Transcreve um arquivo de áudio"""
         # Resetar flags
-        self.stop_transcription = False
-        self.monitor_running = True
-        
-        # Capturar a saída do Whisper usando um pipe
-        buffer = io.StringIO()
-        original_stdout = sys.stdout
-        
+        self.reset_cancellation()
+        self.last_segments = []
+
         try:
-            # Redirecionar a saída padrão para o buffer
-            sys.stdout = buffer
-            
-            # Iniciar monitoramento em uma thread separada
-            monitor_thread = threading.Thread(target=self._monitor_transcription_output, args=(buffer,))
-            monitor_thread.daemon = True
-            monitor_thread.start()
-            
-            # Transcrever áudio
-            result = self.model.transcribe(
-                file_path,
-                language=language,
-                verbose=True,  # Mostrar progresso no console
-            )
-            
+            segments = self.transcribe_iter(file_path, language=language, resume=not start_from_scratch, vad=vad)
+            for segment in segments:
+                self.last_segments.append(segment)
+
+                # Notificar apenas os segmentos novos; o texto anterior já foi entregue
+                if self.transcription_update_callback:
+                    self.transcription_update_callback([segment])
+
+            text = "".join(segment.text for segment in self.last_segments).strip()
+
             # Notificar que a transcrição foi concluída
-            if self.transcription_complete_callback and not self.stop_transcription:
-                self.transcription_complete_callback(result["text"])
-                
-            return result["text"] if not self.stop_transcription else None
-            
+            if self.transcription_complete_callback:
+                self.transcription_complete_callback(text)
+
+            return text
+
+        except TranscriptionCancelled:
+            # O checkpoint continua salvo para o botão Continuar
+            return None
         except Exception as e:
             if self.error_callback:
                 self.error_callback(f"Erro na transcrição: {str(e)}")
             return None
-        finally:
-            # Restaurar a saída padrão
-            sys.stdout = original_stdout
-            # Parar a thread de monitoramento
-            self.monitor_running = False
-            monitor_thread.join(timeout=1.0)  # Esperar a thread terminar
-    
-    def _monitor_transcription_output(self, buffer):
-        """Monitora a saída da transcrição e atualiza o progresso"""
-        last_position = 0
-        segment_count = 0
-        total_segments_estimate = 100  # Estimativa inicial
-        partial_transcription = ""
-        
-        while self.monitor_running and not self.stop_transcription:
-            # Verificar se devemos parar
-            if self.stop_transcription:
-                break
-                
-            # Obter o conteúdo atual do buffer
-            buffer.seek(0)
-            content = buffer.read()
-            
-            # Verificar se há novos dados
-            if len(content) > last_position:
-                # Extrair apenas os novos dados
-                new_content = content[last_position:]
-                last_position = len(content)
-                
-                # Procurar por linhas de transcrição
-                matches = re.findall(r'\[\d+:\d+\.\d+ --> \d+:\d+\.\d+\]\s+(.*)', new_content)
-                if matches:
-                    for match in matches:
-                        # Adicionar o texto transcrito
-                        if match.strip():
-                            partial_transcription += " " + match.strip()
-                            
-                            # Notificar sobre a atualização da transcrição
-                            if self.transcription_update_callback:
-                                self.transcription_update_callback(partial_transcription)
-                            
-                            # Atualizar progresso
-                            segment_count += 1
-                            # Estimar o total de segmentos com base na duração do áudio
-                            if "duration:" in content:
-                                duration_match = re.search(r'duration:\s+(\d+\.\d+)', content)
-                                if duration_match:
-                                    duration = float(duration_match.group(1))
-                                    # Estimar número total de segmentos (aproximadamente 1 segmento a cada 5 segundos)
-                                    total_segments_estimate = max(20, int(duration / 5))
-                            
-                            # Calcular e atualizar o progresso
-                            progress = min(0.99, segment_count / total_segments_estimate)
-                            if self.transcription_progress_callback:
-                                self.transcription_progress_callback(progress)
-            
-            # Verificar novamente se devemos parar
-            if self.stop_transcription:
-                break
-                
-            # Pequena pausa para não sobrecarregar a CPU
-            import time
-            time.sleep(0.1)
-    
+
+    def reset_cancellation(self):
+        """Prepara um novo token de cancelamento para a próxima transcrição"""
+        self.stop_transcription = False
+        self.cancel_token = CancellationToken()
+
     def stop(self):
-        """Para a transcrição em andamento"""
+        """Para a transcrição em andamento, liberando a CPU no próximo passo do modelo"""
         self.stop_transcription = True
-        self.monitor_running = False
+        self.cancel_token.cancel()
+
+    def pause(self):
+        """Pausa a transcrição em andamento sem perder o estado do decodificador"""
+        self.cancel_token.pause()
+
+    def resume(self):
+        """Retoma uma transcrição pausada"""
+        self.cancel_token.resume()
+
+    @property
+    def paused(self):
+        return self.cancel_token.paused
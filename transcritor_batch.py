@@ -0,0 +1,204 @@
+import time
+import weakref
+import threading
+from contextlib import contextmanager
+
+from transcritor_trace import get_tracer
+
+# Janelas de 30 s por passada do codificador; 1 desliga o agrupamento
+DEFAULT_BATCH_SIZE = 4
+
+# Espera máxima (em segundos) por outras janelas antes de rodar um lote incompleto
+DEFAULT_MAX_WAIT = 0.5
+
+# Intervalo para verificar o cancelamento enquanto se espera o lote ou a vez no modelo
+POLL_SECONDS = 0.1
+
+# Um modelo whisper não pode decodificar duas janelas ao mesmo tempo (os hooks do
+# cache de chaves/valores são do módulo): o decodificador é usado por uma thread de
+# cada vez. O codificador não tem esses hooks e roda em lote fora do lock.
+_model_locks = weakref.WeakKeyDictionary()
+_model_locks_lock = threading.Lock()
+
+_batchers = weakref.WeakKeyDictionary()
+_batchers_lock = threading.Lock()
+
+
+def model_lock(model):
+    """Lock de decodificação do objeto de modelo (compartilhado pelo cache de modelos)
+
+    É reentrante: quem já segura o modelo inteiro (um job do servidor sem
+    agrupamento) pode passar pelos locks de cada chamada ao decodificador.
+    """
+    with _model_locks_lock:
+        lock = _model_locks.get(model)
+        if lock is None:
+            lock = _model_locks[model] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def using_model(model, cancel_token=None):
+    """Segura o lock do modelo, sem deixar de atender um cancelamento durante a espera"""
+    lock = model_lock(model)
+    while not lock.acquire(timeout=POLL_SECONDS):
+        if cancel_token:
+            cancel_token.check()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+class _EncodeRequest:
+    def __init__(self, mel_segment):
+        self.mel_segment = mel_segment
+        self.features = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class EncoderBatcher:
+    def __init__(self, model, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        """Junta janelas de mel de várias transcrições em uma única passada do codificador
+
+        Cada transcrição (decode_windows com encoder=) chama attach() ao
+        começar, encode() a cada janela e passa pelo decodificador dentro de
+        decoding(). Um lote sai quando tem batch_size janelas ou quando todas
+        as transcrições ligadas já estão esperando; cada uma recebe de volta
+        só a sua saída. Como o decodificador atende uma transcrição por vez,
+        as que estão nele (ou na fila dele) chegam ao codificador uma a uma:
+        o lote espera por elas, e os max_wait segundos só contam com o
+        decodificador parado. Assim as transcrições andam juntas, uma janela
+        por rodada. O modelo é guardado por referência fraca, para o cache de
+        modelos poder descartá-lo.
+        """
+        self._model = weakref.ref(model)
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.clients = 0
+        self.decoding_clients = 0
+        self.batches = 0
+        self.windows = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def attach(self):
+        """Registra uma transcrição que vai mandar janelas"""
+        with self._condition:
+            self.clients += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="falamemo-encoder", daemon=True)
+                self._thread.start()
+
+    def detach(self):
+        """Remove uma transcrição concluída; os lotes deixam de esperar por ela"""
+        with self._condition:
+            self.clients = max(0, self.clients - 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def decoding(self):
+        """Marca a transcrição como ocupada no decodificador (esperando a vez ou decodificando)"""
+        with self._condition:
+            self.decoding_clients += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.decoding_clients -= 1
+                self._condition.notify_all()
+
+    def encode(self, mel_segment, cancel_token=None):
+        """Saída do codificador para uma janela (n_mels x 3000), esperando o lote em que ela entrar"""
+        request = _EncodeRequest(mel_segment)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify_all()
+        try:
+            while not request.done.wait(POLL_SECONDS):
+                if cancel_token:
+                    cancel_token.check()
+        except BaseException:
+            with self._condition:
+                request.cancelled = True
+                if request in self._pending:
+                    self._pending.remove(request)
+                    self._condition.notify_all()
+            raise
+        if request.error is not None:
+            raise request.error
+        return request.features
+
+    def _full(self):
+        """Indica se nenhuma outra janela pode entrar no lote pendente (chamado com a condição travada)"""
+        waiting = len(self._pending)
+        return waiting >= self.batch_size or waiting >= self.clients
+
+    def _next_batch(self):
+        """Espera e retira o próximo lote de pedidos; None encerra a thread (ninguém mais ligado)"""
+        with self._condition:
+            while not self._pending:
+                if self.clients == 0:
+                    self._thread = None
+                    return None
+                self._condition.wait()
+            started = time.monotonic()
+            while self._pending and not self._full():
+                if self.decoding_clients:
+                    # As janelas de quem está no decodificador chegam quando ele liberar
+                    self._condition.wait()
+                    started = time.monotonic()
+                    continue
+                remaining = self.max_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:len(batch)]
+            return batch
+
+    def _run(self):
+        import torch
+
+        tracer = get_tracer()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [request for request in batch if not request.cancelled]
+            if not batch:
+                continue
+            try:
+                model = self._model()
+                if model is None:
+                    raise RuntimeError("O modelo foi descarregado durante a transcrição")
+                with tracer.span("encoder", batch=len(batch)), torch.no_grad():
+                    features = model.embed_audio(torch.stack([request.mel_segment for request in batch]))
+                tracer.count("encoder_batches")
+                self.batches += 1
+                self.windows += len(batch)
+                for index, request in enumerate(batch):
+                    request.features = features[index]
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            # Sem referência forte entre os lotes: o cache de modelos pode descartar o modelo
+            model = features = None
+            for request in batch:
+                request.done.set()
+
+
+def get_encoder_batcher(model, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+    """Agrupador do codificador do modelo, compartilhado por todas as transcrições do processo"""
+    with _batchers_lock:
+        batcher = _batchers.get(model)
+        if batcher is None:
+            batcher = _batchers[model] = EncoderBatcher(model, batch_size, max_wait)
+        else:
+            # A configuração mais recente vale para os próximos lotes
+            batcher.batch_size = max(1, int(batch_size))
+            batcher.max_wait = max(0.0, float(max_wait))
+        return batcher
@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+from transcritor_decoder import Segment
+
+CHECKPOINT_SUFFIX = ".falamemo.ckpt"
+
+# Pasta usada quando não é possível gravar ao lado do áudio
+FALLBACK_DIR = os.path.join(os.path.expanduser("~"), ".falamemo", "checkpoints")
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path_for(audio_path):
+    """Caminho do arquivo de checkpoint de um áudio"""
+    audio_path = os.path.abspath(audio_path)
+    if os.access(os.path.dirname(audio_path), os.W_OK):
+        return audio_path + CHECKPOINT_SUFFIX
+
+    digest = hashlib.sha1(audio_path.encode("utf-8")).hexdigest()
+    return os.path.join(FALLBACK_DIR, digest + CHECKPOINT_SUFFIX)
+
+
+class TranscriptionCheckpoint:
+    def __init__(self, audio_path):
+        """Checkpoint incremental de uma transcrição, gravado em um arquivo lateral
+
+        O arquivo tem uma linha JSON de cabeçalho seguida de uma linha por
+        janela decodificada, então cada janela custa apenas um append.
+        """
+        self.audio_path = os.path.abspath(audio_path)
+        self.path = checkpoint_path_for(self.audio_path)
+        self._file = None
+        self._valid_bytes = None
+
+    def _audio_signature(self):
+        """Tamanho e data de modificação do áudio, para invalidar checkpoints antigos"""
+        stat = os.stat(self.audio_path)
+        return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+    def exists(self):
+        """Indica se há um checkpoint salvo para o áudio"""
+        return os.path.exists(self.path)
+
+    def load(self, model_name=None, language=None, options=None):
+        """Lê o checkpoint e retorna o estado para retomar, ou None se não servir"""
+        if not self.exists():
+            return None
+
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline().decode("utf-8"))
+                state = {
+                    "seek": 0.0,
+                    "language": header.get("language"),
+                    "prompt_tokens": [],
+                    "segments": [],
+                    "duration": 0.0,
+                }
+                self._valid_bytes = f.tell()
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        # Última linha incompleta (queda durante a gravação)
+                        break
+                    window = json.loads(line.decode("utf-8"))
+                    self._valid_bytes = f.tell()
+                    state["seek"] = window["seek"]
+                    state["language"] = window["language"]
+                    state["prompt_tokens"] = window["prompt_tokens"]
+                    state["duration"] = window.get("duration", 0.0)
+                    state["segments"].extend(Segment.from_dict(data) for data in window["segments"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Checkpoint ilegível em {self.path}: {e}")
+            return None
+
+        # O checkpoint só vale para o mesmo áudio, modelo, idioma e opções
+        if header.get("version") != CHECKPOINT_VERSION or header.get("audio") != self._audio_signature():
+            return None
+        if model_name is not None and header.get("model") != model_name:
+            return None
+        if language is not None and state["language"] != language:
+            return None
+        if options is not None and header.get("options") != options:
+            return None
+
+        return state
+
+    def start(self, model_name, language, options=None):
+        """Cria um checkpoint novo, descartando o anterior"""
+        self.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({
+            "version": CHECKPOINT_VERSION,
+            "audio": self._audio_signature(),
+            "model": model_name,
+            "language": language,
+            "options": options or {},
+        })
+
+    def resume(self):
+        """Reabre o checkpoint existente para continuar acrescentando janelas"""
+        self.close()
+        if self._valid_bytes is not None:
+            # Descartar uma possível linha incompleta antes de acrescentar
+            with open(self.path, "r+b") as f:
+                f.truncate(self._valid_bytes)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, window):
+        """Grava o resultado de uma janela decodificada"""
+        if self._file is None:
+            return
+        self._write({
+            "seek": window.end,
+            "duration": window.duration,
+            "language": window.language,
+            "prompt_tokens": window.prompt_tokens,
+            "segments": [segment.to_dict() for segment in window.segments],
+        })
+
+    def close(self):
+        """Fecha o arquivo do checkpoint"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Apaga o checkpoint (transcrição concluída ou reiniciada)"""
+        self.close()
+        if self.exists():
+            os.remove(self.path)
+
+    def _write(self, data):
+        """Acrescenta uma linha JSON e força a gravação em disco"""
+        self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self._file.flush()
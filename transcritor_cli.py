@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import time
+import signal
+import pstats
+import cProfile
+import argparse
+import contextlib
+from transcritor_backend import TranscritorBackend
+from transcritor_queue import BatchQueue, JOB_FAILED, collect_audio_files
+from transcritor_parallel import DEFAULT_THREADS_PER_WORKER, ParallelTranscriber
+from transcritor_batch import DEFAULT_MAX_WAIT
+from transcritor_audio import get_audio_cache
+from transcritor_result_cache import get_result_cache
+from transcritor_model_store import get_model_store
+from transcritor_engines import DEFAULT_ENGINE, ENGINES
+from transcritor_cpu import configure_threads
+from transcritor_trace import get_tracer
+from transcritor_export import EXPORT_FORMATS, Exporter, output_paths, parse_formats
+from transcritor_server import DEFAULT_HOST, DEFAULT_MAX_UPLOAD_MB, DEFAULT_PORT, serve
+from transcritor_stream import DEFAULT_BUFFER_SECONDS, DEFAULT_IDLE_TIMEOUT, DEFAULT_STEP_SECONDS, LiveSource
+from transcritor_vad import SAMPLE_RATE
+
+# Códigos de saída
+EXIT_OK = 0
+EXIT_FAILED = 1          # Pelo menos um arquivo falhou
+EXIT_USAGE = 2           # Argumentos inválidos (mesmo código do argparse)
+EXIT_NO_INPUT = 3        # Nenhum arquivo de entrada encontrado
+EXIT_MODEL_ERROR = 4     # Não foi possível carregar o modelo
+EXIT_INTERRUPTED = 130   # Interrompido pelo usuário (Ctrl+C)
+
+# Funções mostradas no resumo do --profile
+PROFILE_TOP = 25
+
+
+class EventWriter:
+    def __init__(self, stream):
+        """Escreve eventos de progresso como linhas JSON"""
+        self.stream = stream
+
+    def emit(self, event, **fields):
+        """Escreve um evento e força a saída imediata"""
+        fields["event"] = event
+        fields["time"] = round(time.time(), 3)
+        self.stream.write(json.dumps(fields, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def expand_inputs(inputs, stdin=None):
+    """Expande arquivos, padrões glob e listas lidas da entrada padrão"""
+    stdin = stdin or sys.stdin
+    paths = []
+    for item in inputs:
+        if item == "-":
+            items = [line.strip() for line in stdin if line.strip()]
+        else:
+            items = [item]
+
+        for entry in items:
+            if os.path.isfile(entry):
+                paths.append(os.path.abspath(entry))
+            else:
+                paths.extend(collect_audio_files(entry))
+
+    # Remover duplicados mantendo a ordem
+    return list(dict.fromkeys(paths))
+
+
+def output_formats(value):
+    """Tipo do argparse para --format: "srt,vtt", "all"..."""
+    try:
+        return parse_formats(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def set_threads(threads):
+    """Define o número de threads usadas pelo PyTorch"""
+    if threads:
+        configure_threads(threads)
+
+
+def cmd_transcribe(args, events):
+    """Transcreve os arquivos um a um, emitindo cada segmento"""
+    files = expand_inputs(args.inputs)
+    if not files:
+        events.emit("error", message="Nenhum arquivo de áudio encontrado.")
+        return EXIT_NO_INPUT
+
+    language = None if args.language == "auto" else args.language
+    if args.parallel:
+        return transcribe_parallel(args, events, files, language)
+
+    set_threads(args.threads)
+
+    backend = TranscritorBackend()
+    # Sem --parallel, o lote vale para as transcrições do mesmo modelo neste processo
+    backend.set_batching(args.batch_size, args.batch_wait)
+    backend.set_callbacks(download_progress=lambda percent: events.emit("download", model=args.model, percent=percent))
+
+    events.emit("model", model=args.model, engine=args.engine, status="loading")
+    if not backend.load_model(args.model, engine=args.engine, fast_cpu=args.fast_cpu):
+        events.emit("error", message=f"Erro ao carregar modelo {args.model}")
+        return EXIT_MODEL_ERROR
+    events.emit("model", model=args.model, status="loaded")
+
+    failed = 0
+    for file_path in files:
+        events.emit("start", file=file_path)
+        started = time.monotonic()
+        last_progress = -1
+
+        def report_progress(progress, file_path=file_path):
+            nonlocal last_progress
+            percent = int(progress * 100)
+            if percent != last_progress:
+                last_progress = percent
+                events.emit("progress", file=file_path, progress=round(progress, 4))
+
+        backend.set_callbacks(
+            transcription_progress=report_progress,
+            language_detected=lambda detection, file_path=file_path: check_language(args, events, file_path,
+                                                                                    detection),
+        )
+        try:
+            # Cada segmento vai para os arquivos .part assim que é decodificado
+            with Exporter(output_paths(file_path, args.output_dir, args.format)) as exporter:
+                for segment in backend.transcribe_iter(file_path, language=language, vad=args.vad,
+                                                        low_memory=args.low_memory):
+                    exporter.write([segment])
+                    if args.segments:
+                        events.emit("segment", file=file_path, **segment.to_dict())
+            outputs = exporter.paths
+
+            if backend.last_vad_report:
+                events.emit("vad", file=file_path, **backend.last_vad_report.to_dict())
+
+            elapsed = time.monotonic() - started
+            duration = backend.last_duration
+            events.emit("done", file=file_path, output=outputs[0], outputs=outputs, elapsed=round(elapsed, 3),
+                        duration=round(duration, 3), rtf=round(elapsed / duration, 4) if duration else None)
+        except Exception as e:
+            failed += 1
+            events.emit("error", file=file_path, message=str(e))
+
+    events.emit("summary", files=len(files), failed=failed)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def check_language(args, events, file_path, detection):
+    """Emite o idioma detectado e falha o arquivo se a detecção for incerta demais"""
+    events.emit("language", file=file_path, **detection.to_dict())
+    # Antes da decodificação: um idioma incerto não gasta a transcrição inteira
+    if args.min_language_confidence and detection.probability < args.min_language_confidence:
+        raise RuntimeError(f"Idioma incerto ({detection.language}, {detection.probability:.0%}); "
+                           f"informe o idioma com -l")
+
+
+def transcribe_parallel(args, events, files, language):
+    """Transcreve cada arquivo dividido em trechos processados em paralelo"""
+    threads = args.threads or DEFAULT_THREADS_PER_WORKER
+    failed = 0
+    with ParallelTranscriber(args.model, workers=args.parallel, threads_per_worker=threads,
+                             engine=args.engine, fast_cpu=args.fast_cpu, batch_size=args.batch_size,
+                             batch_wait=args.batch_wait) as transcriber:
+        for file_path in files:
+            events.emit("start", file=file_path)
+            started = time.monotonic()
+            transcriber.set_callbacks(
+                progress=lambda progress, file_path=file_path: events.emit(
+                    "progress", file=file_path, progress=round(progress, 4)),
+                language_detected=lambda detection, file_path=file_path: check_language(
+                    args, events, file_path, detection),
+            )
+            try:
+                segments = transcriber.transcribe(file_path, language=language, low_memory=args.low_memory)
+                if args.segments:
+                    for segment in segments:
+                        events.emit("segment", file=file_path, **segment.to_dict())
+
+                with Exporter(output_paths(file_path, args.output_dir, args.format)) as exporter:
+                    exporter.write(segments)
+                outputs = exporter.paths
+
+                elapsed = time.monotonic() - started
+                duration = transcriber.last_duration
+                events.emit("done", file=file_path, output=outputs[0], outputs=outputs, elapsed=round(elapsed, 3),
+                            duration=round(duration, 3), rtf=round(elapsed / duration, 4) if duration else None)
+            except Exception as e:
+                failed += 1
+                events.emit("error", file=file_path, message=str(e))
+
+    events.emit("summary", files=len(files), failed=failed)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def cmd_batch(args, events):
+    """Processa uma pasta ou padrão glob com a fila persistente"""
+    language = None if args.language == "auto" else args.language
+    queue = BatchQueue(args.source, model_name=args.model, language=language, workers=args.workers,
+                       output_dir=args.output_dir, state_path=args.state, retry_failed=args.retry_failed,
+                       vad=args.vad, engine=args.engine, fast_cpu=args.fast_cpu, low_memory=args.low_memory,
+                       batch_size=args.batch_size, batch_wait=args.batch_wait)
+    queue.set_callbacks(job_update=lambda job, summary: events.emit("job", **job))
+
+    jobs = queue.load_state()
+    if not jobs:
+        events.emit("error", message="Nenhum arquivo de áudio encontrado.")
+        return EXIT_NO_INPUT
+
+    set_threads(args.threads)
+    try:
+        summary = queue.run()
+    except RuntimeError as e:
+        events.emit("error", message=str(e))
+        return EXIT_MODEL_ERROR
+
+    events.emit("summary", **summary)
+    return EXIT_FAILED if summary[JOB_FAILED] else EXIT_OK
+
+
+def cmd_cache(args, events):
+    """Mostra, limpa ou invalida o cache de resultados"""
+    cache = get_result_cache()
+    if args.clear:
+        cache.clear()
+        events.emit("cache", status="cleared")
+    for file_path in expand_inputs(args.invalidate or []):
+        removed = cache.invalidate(audio_hash=get_audio_cache().file_hash(file_path), model_name=args.model)
+        events.emit("cache", file=file_path, status="invalidated", removed=removed)
+    events.emit("cache", **cache.stats())
+    return EXIT_OK
+
+
+def cmd_models(args, events):
+    """Lista, baixa ou importa modelos para o diretório local"""
+    store = get_model_store()
+    if args.mirror:
+        store.mirror = args.mirror
+
+    if args.import_dir:
+        imported = store.import_directory(args.import_dir)
+        events.emit("models", status="imported", source=args.import_dir, models=imported)
+
+    for model_name in args.download or []:
+        if not store.is_known(model_name):
+            events.emit("error", model=model_name, message="Modelo desconhecido")
+            return EXIT_USAGE
+        last_percent = -1
+
+        def report(done, total, model_name=model_name):
+            nonlocal last_percent
+            percent = int(done * 100 / total) if total else None
+            if percent != last_percent:
+                last_percent = percent
+                events.emit("download", model=model_name, percent=percent, bytes=done, total=total)
+
+        try:
+            path = store.ensure(model_name, progress=report)
+        except RuntimeError as e:
+            events.emit("error", model=model_name, message=str(e))
+            return EXIT_MODEL_ERROR
+        events.emit("model", model=model_name, status="available", path=path)
+
+    for model_name, path, available in store.status():
+        events.emit("model", model=model_name, path=path, available=available)
+    return EXIT_OK
+
+
+def cmd_stream(args, events):
+    """Transcreve uma gravação em andamento ou PCM pela entrada padrão, com segmentos provisórios e definitivos"""
+    if args.input != "-" and not os.path.exists(args.input):
+        events.emit("error", message=f"Arquivo não encontrado: {args.input}")
+        return EXIT_NO_INPUT
+
+    set_threads(args.threads)
+    backend = TranscritorBackend()
+    events.emit("model", model=args.model, engine=args.engine, status="loading")
+    if not backend.load_model(args.model, engine=args.engine, fast_cpu=args.fast_cpu):
+        events.emit("error", message=f"Erro ao carregar modelo {args.model}")
+        return EXIT_MODEL_ERROR
+    events.emit("model", model=args.model, status="loaded")
+    backend.set_callbacks(language_detected=lambda detection: events.emit("language", **detection.to_dict()))
+
+    source = LiveSource(args.input, sample_rate=args.sample_rate, channels=args.channels,
+                        idle_timeout=args.idle_timeout)
+    name = args.input if args.input != "-" else f"stream_{time.strftime('%Y%m%d_%H%M%S')}"
+    paths = output_paths(name, args.output_dir or (None if args.input != "-" else os.getcwd()), args.format)
+    language = None if args.language == "auto" else args.language
+
+    # Primeiro Ctrl+C: parar de ler e concluir o que já chegou; o segundo interrompe
+    def finish(signum, frame):
+        signal.signal(signal.SIGINT, previous_handler)
+        backend.finish_live()
+
+    previous_handler = signal.signal(signal.SIGINT, finish)
+    events.emit("start", file=source.name)
+    try:
+        with Exporter(paths) as exporter:
+            for update in backend.transcribe_live(source, language=language, buffer_seconds=args.buffer_seconds,
+                                                  step_seconds=args.step):
+                exporter.write(update.final)
+                for segment in update.final:
+                    events.emit("segment", file=source.name, final=True, **segment.to_dict())
+                events.emit("provisional", file=source.name, position=round(update.position, 3),
+                            lag=round(update.lag, 3), dropped=round(update.dropped, 3),
+                            segments=[segment.to_dict() for segment in update.provisional])
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    outputs = exporter.paths
+    events.emit("done", file=source.name, output=outputs[0], outputs=outputs, duration=round(backend.last_duration, 3))
+    return EXIT_OK
+
+
+def cmd_serve(args, events):
+    """Atende pedidos de transcrição por HTTP até Ctrl+C"""
+    def ready(server):
+        manager = server.manager
+        events.emit("server", url=server.url, workers=manager.workers, threads=manager.threads_per_job,
+                    model=manager.default_model, engine=manager.engine, batch_size=manager.batch_size)
+
+    try:
+        serve(host=args.host, port=args.port, workers=args.workers, threads_per_job=args.threads,
+              model_name=args.model, preload=args.preload or (), engine=args.engine, fast_cpu=args.fast_cpu,
+              max_upload_mb=args.max_upload_mb, ready=ready, batch_size=args.batch_size,
+              batch_wait=args.batch_wait)
+    except RuntimeError as e:
+        events.emit("error", message=str(e))
+        return EXIT_MODEL_ERROR
+    except OSError as e:
+        events.emit("error", message=f"Não foi possível abrir {args.host}:{args.port}: {e}")
+        return EXIT_USAGE
+    return EXIT_OK
+
+
+def build_parser():
+    """Monta o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="transcritor_cli",
+        description="FalaMemo - transcrição de áudio pela linha de comando",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument("-m", "--model", default="base", help="Modelo Whisper (padrão: base)")
+        sub.add_argument("-l", "--language", default="auto", help="Idioma ou 'auto' (padrão: auto)")
+        sub.add_argument("-t", "--threads", type=int, default=None, help="Threads do PyTorch")
+        sub.add_argument("-o", "--output-dir", default=None, help="Pasta de saída (padrão: junto ao áudio)")
+        sub.add_argument("--vad", action="store_true", help="Pular trechos sem voz antes de transcrever")
+        sub.add_argument("-e", "--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                         help="Motor de inferência (padrão: whisper; faster-whisper usa int8 na CPU)")
+        sub.add_argument("--fast-cpu", action="store_true",
+                         help="Threads pelos núcleos físicos e, no motor whisper, pesos int8 salvos em disco")
+        sub.add_argument("--low-memory", action="store_true", default=None,
+                         help="Mel calculado por janela e segmentos direto para o disco, com memória constante "
+                              "(automático a partir de 1 h de áudio no motor whisper)")
+        sub.add_argument("--profile", default=None, metavar="ARQUIVO",
+                         help="Rodar sob o cProfile e gravar as estatísticas (abrir com pstats ou snakeviz)")
+        sub.add_argument("--trace", default=None, metavar="ARQUIVO",
+                         help="Gravar o tempo de cada etapa no formato do chrome://tracing (Perfetto)")
+
+    def add_batching(sub, scope):
+        sub.add_argument("--batch-size", type=int, default=1, metavar="N",
+                         help=f"Rodar o codificador em lotes de até N janelas de 30 s {scope} (padrão: 1, sem lote)")
+        sub.add_argument("--batch-wait", type=float, default=DEFAULT_MAX_WAIT, metavar="S",
+                         help=f"Espera máxima por janelas para completar um lote, contada com o decodificador "
+                              f"parado; mais espera troca latência por vazão (padrão: {DEFAULT_MAX_WAIT:g})")
+
+    transcribe = subparsers.add_parser("transcribe", help="Transcreve arquivos, padrões glob ou listas (-)")
+    transcribe.add_argument("inputs", nargs="+", help="Arquivos, padrões glob ou '-' para ler caminhos da entrada padrão")
+    add_common(transcribe)
+    transcribe.add_argument("-f", "--format", type=output_formats, default=["txt"], metavar="FORMATOS",
+                            help=f"Formatos de saída separados por vírgula: {', '.join(EXPORT_FORMATS)} "
+                                 f"ou all (padrão: txt)")
+    transcribe.add_argument("--segments", action="store_true", help="Emitir um evento por segmento transcrito")
+    transcribe.add_argument("--min-language-confidence", type=float, default=None, metavar="P",
+                            help="Com idioma auto, falhar o arquivo antes de transcrever se a detecção "
+                                 "tiver probabilidade menor que P (0 a 1)")
+    transcribe.add_argument("-p", "--parallel", type=int, default=0, metavar="N",
+                            help="Dividir cada arquivo em trechos e transcrever em N processos "
+                                 "(--threads passa a ser por processo; sem --vad, cache de resultados "
+                                 "nem checkpoint)")
+    add_batching(transcribe, "(com --parallel, N trechos do mesmo arquivo juntos em cada processo)")
+    transcribe.set_defaults(handler=cmd_transcribe)
+
+    batch = subparsers.add_parser("batch", help="Processa uma pasta com fila persistente")
+    batch.add_argument("source", help="Pasta ou padrão glob")
+    add_common(batch)
+    batch.add_argument("-w", "--workers", type=int, default=1, help="Processos de trabalho (padrão: 1)")
+    batch.add_argument("--state", default=None, help="Arquivo de estado da fila")
+    batch.add_argument("--retry-failed", action="store_true", help="Tentar de novo os arquivos que falharam")
+    add_batching(batch, "de N arquivos transcritos juntos (com --workers 1)")
+    batch.set_defaults(handler=cmd_batch)
+
+    live = subparsers.add_parser("stream", help="Transcreve uma gravação em andamento, um pipe ou PCM pela entrada padrão")
+    live.add_argument("input", help="WAV ou PCM que ainda está sendo gravado, pipe, ou '-' para a entrada padrão")
+    live.add_argument("-m", "--model", default="base", help="Modelo Whisper (padrão: base)")
+    live.add_argument("-l", "--language", default="auto", help="Idioma ou 'auto' (padrão: auto)")
+    live.add_argument("-t", "--threads", type=int, default=None, help="Threads do PyTorch")
+    live.add_argument("-e", "--engine", choices=ENGINES, default=DEFAULT_ENGINE, help="Motor de inferência")
+    live.add_argument("--fast-cpu", action="store_true", help="Pesos int8 no motor whisper")
+    live.add_argument("-o", "--output-dir", default=None, help="Pasta de saída (padrão: junto ao áudio)")
+    live.add_argument("-f", "--format", type=output_formats, default=["txt"], metavar="FORMATOS",
+                      help=f"Formatos dos segmentos definitivos: {', '.join(EXPORT_FORMATS)} ou all (padrão: txt)")
+    live.add_argument("--step", type=float, default=DEFAULT_STEP_SECONDS,
+                      help=f"Segundos de áudio novo entre decodificações (padrão: {DEFAULT_STEP_SECONDS})")
+    live.add_argument("--buffer-seconds", type=float, default=DEFAULT_BUFFER_SECONDS,
+                      help=f"Áudio mantido em memória (padrão: {DEFAULT_BUFFER_SECONDS})")
+    live.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                      help=f"Segundos sem o arquivo crescer para considerar a gravação concluída "
+                           f"(padrão: {DEFAULT_IDLE_TIMEOUT})")
+    live.add_argument("--sample-rate", type=int, default=SAMPLE_RATE,
+                      help=f"Taxa do PCM cru (padrão: {SAMPLE_RATE}; WAV usa o cabeçalho)")
+    live.add_argument("--channels", type=int, default=1, help="Canais do PCM cru (padrão: 1)")
+    live.add_argument("--trace", default=None, metavar="ARQUIVO",
+                      help="Gravar o tempo de cada etapa no formato do chrome://tracing (Perfetto)")
+    live.set_defaults(handler=cmd_stream)
+
+    server = subparsers.add_parser("serve", help="Servidor HTTP local com fila de jobs e modelos carregados")
+    server.add_argument("--host", default=DEFAULT_HOST, help=f"Endereço (padrão: {DEFAULT_HOST}, só esta máquina)")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Porta (padrão: {DEFAULT_PORT})")
+    server.add_argument("-m", "--model", default="base", help="Modelo dos pedidos que não informam um (padrão: base)")
+    server.add_argument("-e", "--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help="Motor dos pedidos que não informam um (padrão: whisper)")
+    server.add_argument("--fast-cpu", action="store_true", help="Pesos int8 no motor whisper")
+    server.add_argument("-w", "--workers", type=int, default=None,
+                        help="Jobs simultâneos (padrão: núcleos físicos / threads)")
+    server.add_argument("-t", "--threads", type=int, default=None, help="Threads do PyTorch por job (padrão: 4)")
+    server.add_argument("--preload", nargs="+", metavar="MODELO", help="Carregar estes modelos antes do primeiro pedido")
+    server.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB,
+                        help=f"Tamanho máximo de um áudio enviado (padrão: {DEFAULT_MAX_UPLOAD_MB})")
+    server.add_argument("--trace", default=None, metavar="ARQUIVO",
+                        help="Ao encerrar, gravar o tempo de cada etapa no formato do chrome://tracing")
+    add_batching(server, "com os jobs simultâneos do mesmo modelo")
+    server.set_defaults(handler=cmd_serve)
+
+    cache = subparsers.add_parser("cache", help="Mostra, limpa ou invalida o cache de transcrições")
+    cache.add_argument("--clear", action="store_true", help="Apagar todas as transcrições salvas")
+    cache.add_argument("--invalidate", nargs="+", metavar="ARQUIVO",
+                       help="Apagar as transcrições salvas destes arquivos")
+    cache.add_argument("-m", "--model", default=None, help="Invalidar apenas os resultados deste modelo")
+    cache.set_defaults(handler=cmd_cache)
+
+    models = subparsers.add_parser("models", help="Lista, baixa ou importa modelos para uso offline")
+    models.add_argument("--download", nargs="+", metavar="MODELO", help="Baixar estes modelos")
+    models.add_argument("--import", dest="import_dir", metavar="PASTA",
+                        help="Copiar os arquivos .pt de uma pasta local (verificando o SHA-256)")
+    models.add_argument("--mirror", default=None, help="URL ou pasta usada antes do servidor oficial")
+    models.set_defaults(handler=cmd_models)
+
+    return parser
+
+
+def run_handler(args, events):
+    """Executa o subcomando, sob o cProfile com --profile, gravando o trace com --trace"""
+    profile = getattr(args, "profile", None)
+    trace = getattr(args, "trace", None)
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler:
+            return profiler.runcall(args.handler, args, events)
+        return args.handler(args, events)
+    finally:
+        if profiler:
+            profiler.dump_stats(profile)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            events.emit("profile", path=profile)
+        if trace:
+            tracer = get_tracer()
+            tracer.export(trace)
+            events.emit("trace", path=trace, stages=tracer.stats(), counters=tracer.counters())
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "transcribe" and args.parallel and args.vad:
+        # Os trechos paralelos são cortados na linha do tempo original, sem o mapa do VAD
+        parser.error("--vad não pode ser usado com --parallel")
+
+    # Eventos vão para a saída padrão; mensagens de diagnóstico do backend vão para stderr
+    events = EventWriter(sys.stdout)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return run_handler(args, events)
+    except KeyboardInterrupt:
+        events.emit("interrupted")
+        return EXIT_INTERRUPTED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
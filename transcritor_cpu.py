@@ -0,0 +1,152 @@
+import os
+import warnings
+import threading
+from dataclasses import asdict
+
+QUANTIZED_DIR_NAME = "int8"
+
+_threads_lock = threading.Lock()
+_threads_configured = False
+
+
+def physical_cores():
+    """Número de núcleos físicos (sem contar hyper-threading)"""
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return cores
+    except ImportError:
+        pass
+
+    # Linux: pares únicos (processador físico, núcleo) em /proc/cpuinfo
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not key and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+
+    return os.cpu_count() or 1
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """Define as threads do PyTorch; sem valores, usa os núcleos físicos
+
+    Uma escolha explícita (ex.: --threads) prevalece sobre o ajuste automático
+    feito depois pelo perfil de CPU rápida.
+    """
+    import torch
+
+    global _threads_configured
+    with _threads_lock:
+        if threads is None and _threads_configured:
+            return torch.get_num_threads()
+
+        if threads is None:
+            threads = physical_cores()
+        _threads_configured = True
+        torch.set_num_threads(threads)
+
+        # Threads entre operadores: só podem ser definidas antes do primeiro uso paralelo
+        try:
+            torch.set_num_interop_threads(interop_threads or max(1, min(4, threads // 2)))
+        except RuntimeError:
+            pass
+
+        print(f"PyTorch usando {threads} threads")
+        return threads
+
+
+def quantized_path(model_dir, model_name):
+    """Arquivo com o state_dict int8 de um modelo"""
+    safe_name = os.path.basename(model_name).replace(os.sep, "_")
+    return os.path.join(model_dir, QUANTIZED_DIR_NAME, f"{os.path.splitext(safe_name)[0]}.int8.pt")
+
+
+def quantize_model(model):
+    """Converte as camadas Linear do Whisper para int8 com quantização dinâmica"""
+    import torch
+    import whisper.model
+    from torch import nn
+
+    # A Linear do Whisper é uma subclasse e quantize_dynamic só troca o tipo exato nn.Linear
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = nn.Linear
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    model.memory_bytes = quantized_memory_bytes(model)
+    return model
+
+
+def _replace_linear(module):
+    """Troca as Linear de um modelo recém-criado por Linear int8 vazias"""
+    import torch
+    from torch import nn
+    from torch.ao.nn.quantized.dynamic import Linear as QuantizedLinear
+
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            quantized = QuantizedLinear(child.in_features, child.out_features,
+                                        bias_=child.bias is not None, dtype=torch.qint8)
+            setattr(module, name, quantized)
+        else:
+            _replace_linear(child)
+
+
+def save_quantized(model, path):
+    """Salva o state_dict int8 junto das dimensões do modelo"""
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save({"dims": asdict(model.dims), "model_state_dict": model.state_dict()}, temp_path)
+    os.replace(temp_path, path)
+
+
+def load_quantized(path, alignment_heads=None):
+    """Monta o modelo int8 direto do state_dict salvo, sem passar pelos pesos fp32"""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+        model = Whisper(ModelDimensions(**checkpoint["dims"]))
+        _replace_linear(model)
+        model.load_state_dict(checkpoint["model_state_dict"])
+    if alignment_heads:
+        model.set_alignment_heads(alignment_heads)
+    model.eval()
+    model.memory_bytes = quantized_memory_bytes(model)
+    return model
+
+
+def quantized_memory_bytes(model):
+    """Memória dos pesos, contando os pesos int8 empacotados das camadas Linear"""
+    from torch.ao.nn.quantized.dynamic import Linear as QuantizedLinear
+
+    total = sum(tensor.numel() * tensor.element_size()
+                for tensor in list(model.parameters()) + list(model.buffers()) if not tensor.is_sparse)
+    for module in model.modules():
+        if isinstance(module, QuantizedLinear):
+            total += module.in_features * module.out_features + 4 * module.out_features
+    return total
@@ -0,0 +1,418 @@
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from transcritor_audio import load_audio
+from transcritor_batch import using_model
+from transcritor_trace import get_tracer
+
+# Temperaturas usadas como fallback quando a decodificação gulosa falha
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+# Token de cancelamento da decodificação em andamento em cada thread
+_active = threading.local()
+
+
+class TranscriptionCancelled(Exception):
+    """Levantada quando a decodificação é cancelada pelo usuário"""
+
+
+class CancellationToken:
+    def __init__(self):
+        """Sinaliza cancelamento e pausa para o laço de decodificação"""
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        """Pede o cancelamento; também libera uma pausa em andamento"""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        """Suspende a decodificação no próximo passo do modelo"""
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        """Retoma uma decodificação pausada"""
+        self._running.set()
+
+    def check(self):
+        """Bloqueia enquanto pausado e levanta TranscriptionCancelled se cancelado"""
+        self._running.wait()
+        if self.cancelled:
+            raise TranscriptionCancelled("Transcrição cancelada")
+
+
+def _check_active_token(module, inputs):
+    """Hook executado antes de cada passo do codificador e do decodificador"""
+    token = getattr(_active, "token", None)
+    if token is not None:
+        token.check()
+
+
+def _install_cancel_hooks(model):
+    """Instala (uma vez por modelo) os hooks que verificam o cancelamento"""
+    if getattr(model, "_falamemo_cancel_hooks", False):
+        return
+    model.encoder.register_forward_pre_hook(_check_active_token)
+    model.decoder.register_forward_pre_hook(_check_active_token)
+    model._falamemo_cancel_hooks = True
+
+
+@dataclass
+class Segment:
+    """Trecho transcrito com tempos em segundos na linha do tempo do áudio"""
+    start: float
+    end: float
+    text: str
+    avg_logprob: float = 0.0
+    no_speech_prob: float = 0.0
+    id: int = 0
+
+    def to_dict(self):
+        """Converte o segmento em um dicionário serializável"""
+        return {
+            "id": self.id,
+            "start": self.start,
+            "end": self.end,
+            "text": self.text,
+            "avg_logprob": self.avg_logprob,
+            "no_speech_prob": self.no_speech_prob,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Cria um segmento a partir de um dicionário gerado por to_dict"""
+        return cls(
+            start=data["start"],
+            end=data["end"],
+            text=data["text"],
+            avg_logprob=data.get("avg_logprob", 0.0),
+            no_speech_prob=data.get("no_speech_prob", 0.0),
+            id=data.get("id", 0),
+        )
+
+
+@dataclass
+class DecodedWindow:
+    """Resultado de uma janela de 30 s: segmentos novos e posição atual no áudio"""
+    start: float
+    end: float
+    duration: float
+    language: str
+    segments: list = field(default_factory=list)
+    prompt_tokens: list = field(default_factory=list)
+
+    @property
+    def progress(self):
+        """Fração do áudio já processada (0 a 1)"""
+        if self.duration <= 0:
+            return 1.0
+        return min(1.0, self.end / self.duration)
+
+
+class WindowedMel:
+    def __init__(self, audio, n_mels):
+        """Log-mel de cada janela calculado sob demanda, igual ao trecho do espectrograma do arquivo inteiro
+
+        O Whisper calcula o mel do arquivo todo (mais 30 s de silêncio) de
+        uma vez; em gravações de várias horas isso ocupa gigabytes. Aqui cada
+        janela lê do memmap só as amostras dos seus quadros, com a mesma
+        borda refletida do torch.stft. O piso da normalização depende do
+        máximo do arquivo inteiro, calculado antes em blocos.
+        """
+        import torch
+        from whisper.audio import HOP_LENGTH, N_FFT, N_FRAMES, N_SAMPLES, mel_filters
+
+        self.audio = audio
+        self.samples = len(audio)
+        self.hop = HOP_LENGTH
+        self.n_fft = N_FFT
+        self.frames = (self.samples + N_SAMPLES) // HOP_LENGTH
+        self.filters = mel_filters("cpu", n_mels)
+        self.window = torch.hann_window(N_FFT)
+
+        with get_tracer().span("mel_max", seconds=round(self.samples / 16000, 1)):
+            self.max = max(float(self._log_spec(first, min(self.frames, first + N_FRAMES)).max())
+                           for first in range(0, self.frames, N_FRAMES))
+
+    def _padded(self, start, end):
+        """Amostras [start, end) do áudio seguido de zeros (start >= 0)"""
+        data = np.asarray(self.audio[min(start, self.samples):min(end, self.samples)], dtype=np.float32)
+        missing = (end - start) - len(data)
+        if missing > 0:
+            data = np.concatenate((data, np.zeros(missing, dtype=np.float32)))
+        return data
+
+    def _log_spec(self, first, last):
+        """log10 do mel dos quadros [first, last), antes da normalização"""
+        import torch
+
+        start = first * self.hop - self.n_fft // 2
+        end = (last - 1) * self.hop + self.n_fft // 2
+        samples = self._padded(max(0, start), end)
+        if start < 0:
+            # Borda refletida, como o center=True do torch.stft
+            samples = np.concatenate((self._padded(1, 1 - start)[::-1], samples))
+        stft = torch.stft(torch.from_numpy(np.ascontiguousarray(samples)), self.n_fft, self.hop,
+                          window=self.window, center=False, return_complex=True)
+        mel_spec = self.filters @ (stft.abs() ** 2)
+        return torch.clamp(mel_spec, min=1e-10).log10()
+
+    def window_at(self, seek, size):
+        """Quadros [seek, seek + size) normalizados como no log_mel_spectrogram do Whisper"""
+        import torch
+
+        log_spec = self._log_spec(seek, min(self.frames, seek + size))
+        log_spec = torch.maximum(log_spec, torch.tensor(self.max - 8.0))
+        return (log_spec + 4.0) / 4.0
+
+
+def decode_windows(model, audio, language=None, task="transcribe",
+                   temperature=DEFAULT_TEMPERATURES, compression_ratio_threshold=2.4,
+                   logprob_threshold=-1.0, no_speech_threshold=0.6,
+                   condition_on_previous_text=True, initial_seek=0.0, initial_prompt_tokens=None,
+                   first_segment_id=0, cancel_token=None, low_memory=False, encoder=None,
+                   **decode_options):
+    """Decodifica o áudio janela a janela, gerando um DecodedWindow por janela
+
+    Reproduz o laço de whisper.transcribe sem escrever no console, para que
+    quem chama receba os segmentos assim que cada janela é decodificada.
+    initial_seek (em segundos) e initial_prompt_tokens permitem retomar uma
+    decodificação interrompida com o mesmo contexto de texto.
+
+    O cancel_token é verificado antes de cada passo do modelo (um token do
+    decodificador), então cancelar ou pausar tem efeito em frações de segundo.
+
+    Com low_memory=True, o mel é calculado janela a janela (WindowedMel) e o
+    áudio (memmap ou SpeechAudio) é lido só no trecho de cada janela, então
+    a memória não cresce com a duração do arquivo.
+
+    Com encoder (um EncoderBatcher), a saída do codificador vem de lotes
+    montados com as janelas de outras transcrições do mesmo modelo, e o
+    tempo no decodificador é informado ao agrupador (encoder.decoding()). As
+    chamadas ao decodificador passam sempre pelo lock do modelo, então várias
+    threads podem decodificar com o mesmo objeto de modelo.
+    """
+    # Importados só na primeira transcrição: torch e whisper atrasariam a abertura da janela
+    import torch
+    from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+    from whisper.decoding import DecodingOptions
+    from whisper.tokenizer import get_tokenizer
+
+    cancel_token = cancel_token or CancellationToken()
+    _install_cancel_hooks(model)
+    tracer = get_tracer()
+
+    if isinstance(audio, str):
+        audio = load_audio(audio)
+
+    # O agrupador do codificador espera pelas transcrições que estão no decodificador
+    decoding = encoder.decoding if encoder is not None else nullcontext
+
+    # fp16 só faz sentido em GPU; na CPU o Whisper apenas emitiria um aviso
+    dtype = torch.float32 if model.device.type == "cpu" else torch.float16
+    decode_options.setdefault("fp16", dtype == torch.float16)
+
+    if low_memory:
+        features = WindowedMel(audio, model.dims.n_mels)
+        content_frames = features.frames - N_FRAMES
+
+        def mel_window(seek, size):
+            with tracer.span("mel"):
+                return features.window_at(seek, size)
+    else:
+        with tracer.span("mel", seconds=round(len(audio) / SAMPLE_RATE, 1)):
+            mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+        content_frames = mel.shape[-1] - N_FRAMES
+
+        def mel_window(seek, size):
+            return mel[:, seek:seek + size]
+    duration = float(content_frames * HOP_LENGTH / SAMPLE_RATE)
+
+    if language is None:
+        if model.is_multilingual:
+            mel_segment = pad_or_trim(mel_window(0, N_FRAMES), N_FRAMES).to(model.device).to(dtype)
+            _active.token = cancel_token
+            try:
+                with tracer.span("detect_language"), decoding(), using_model(model, cancel_token):
+                    _, probs = model.detect_language(mel_segment)
+            finally:
+                _active.token = None
+            language = max(probs, key=probs.get)
+        else:
+            language = "en"
+
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=language,
+        task=task,
+    )
+
+    if isinstance(temperature, (int, float)):
+        temperature = (temperature,)
+
+    def decode_with_fallback(mel_segment, prompt):
+        # O codificador roda uma vez por janela; as temperaturas de fallback reaproveitam a saída
+        cancel_token.check()
+        if encoder is not None:
+            with tracer.span("encoder_wait"):
+                audio_features = encoder.encode(mel_segment, cancel_token)
+        else:
+            _active.token = cancel_token
+            try:
+                with tracer.span("encoder"), torch.no_grad():
+                    audio_features = model.embed_audio(mel_segment.unsqueeze(0))[0]
+            finally:
+                _active.token = None
+
+        with decoding():
+            result = None
+            for t in temperature:
+                kwargs = dict(decode_options)
+                if t > 0:
+                    # Amostragem não usa beam search
+                    kwargs.pop("beam_size", None)
+                    kwargs.pop("patience", None)
+                else:
+                    kwargs.pop("best_of", None)
+                options = DecodingOptions(
+                    task=task, language=language, temperature=t, prompt=prompt, **kwargs
+                )
+                cancel_token.check()
+                _active.token = cancel_token
+                try:
+                    with using_model(model, cancel_token), tracer.span("decoder", temperature=t):
+                        result = model.decode(audio_features, options)
+                finally:
+                    _active.token = None
+                tracer.count("decoded_tokens", len(result.tokens))
+                if t > 0:
+                    tracer.count("fallbacks")
+
+                needs_fallback = False
+                if compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold:
+                    needs_fallback = True  # Texto repetitivo demais
+                if logprob_threshold is not None and result.avg_logprob < logprob_threshold:
+                    needs_fallback = True  # Baixa confiança
+                if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+                    needs_fallback = False  # Silêncio: não adianta tentar de novo
+                if not needs_fallback:
+                    break
+            return result
+
+    # Cada token de tempo equivale a 2 quadros do mel (20 ms)
+    input_stride = N_FRAMES // model.dims.n_audio_ctx
+    time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+
+    # O Whisper só usa a metade final do contexto de texto como prompt
+    max_prompt_tokens = model.dims.n_text_ctx // 2 - 1
+
+    seek = min(content_frames, int(round(initial_seek * SAMPLE_RATE / HOP_LENGTH)))
+    segment_id = first_segment_id
+    prompt_tokens = list(initial_prompt_tokens or [])[-max_prompt_tokens:]
+
+    # Enquanto esta transcrição estiver ligada, os lotes do codificador esperam pelas janelas dela
+    if encoder is not None:
+        encoder.attach()
+    try:
+        while seek < content_frames:
+            previous_seek = seek
+            time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
+            segment_size = min(N_FRAMES, content_frames - seek)
+            segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+            mel_segment = mel_window(seek, segment_size)
+            mel_segment = pad_or_trim(mel_segment, N_FRAMES).to(model.device).to(dtype)
+
+            result = decode_with_fallback(mel_segment, prompt_tokens)
+            tokens = torch.tensor(result.tokens)
+
+            # Janela considerada silêncio: avançar sem gerar segmentos
+            if no_speech_threshold is not None:
+                should_skip = result.no_speech_prob > no_speech_threshold
+                if logprob_threshold is not None and result.avg_logprob > logprob_threshold:
+                    should_skip = False
+                if should_skip:
+                    seek += segment_size
+                    yield DecodedWindow(time_offset, float(seek * HOP_LENGTH / SAMPLE_RATE), duration,
+                                        language, [], list(prompt_tokens))
+                    continue
+
+            spans = []  # (início, fim, tokens) relativos à janela
+            timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+            single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+            consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+            consecutive.add_(1)
+
+            if len(consecutive) > 0:
+                slices = consecutive.tolist()
+                if single_timestamp_ending:
+                    slices.append(len(tokens))
+
+                last_slice = 0
+                for current_slice in slices:
+                    sliced_tokens = tokens[last_slice:current_slice]
+                    start_pos = sliced_tokens[0].item() - tokenizer.timestamp_begin
+                    end_pos = sliced_tokens[-1].item() - tokenizer.timestamp_begin
+                    spans.append((start_pos * time_precision, end_pos * time_precision, sliced_tokens.tolist()))
+                    last_slice = current_slice
+
+                if single_timestamp_ending:
+                    seek += segment_size
+                else:
+                    # Retomar a partir do último timestamp completo
+                    last_timestamp_pos = tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+                    seek += last_timestamp_pos * input_stride
+            else:
+                window_duration = segment_duration
+                timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+                if len(timestamps) > 0 and timestamps[-1].item() != tokenizer.timestamp_begin:
+                    window_duration = (timestamps[-1].item() - tokenizer.timestamp_begin) * time_precision
+                spans.append((0.0, window_duration, tokens.tolist()))
+                seek += segment_size
+
+            if seek <= previous_seek:
+                # Garantia contra laço infinito se o modelo não avançar no tempo
+                seek = previous_seek + segment_size
+
+            segments = []
+            for start, end, span_tokens in spans:
+                text = tokenizer.decode([t for t in span_tokens if t < tokenizer.eot])
+                prompt_tokens.extend(span_tokens)
+                if end <= start or not text.strip():
+                    continue
+                segments.append(Segment(
+                    start=round(time_offset + start, 3),
+                    end=round(time_offset + end, 3),
+                    text=text,
+                    avg_logprob=result.avg_logprob,
+                    no_speech_prob=result.no_speech_prob,
+                    id=segment_id,
+                ))
+                segment_id += 1
+
+            if not condition_on_previous_text or result.temperature > 0.5:
+                # Não condicionar a próxima janela em texto possivelmente alucinado
+                prompt_tokens = []
+            else:
+                del prompt_tokens[:-max_prompt_tokens]
+
+            yield DecodedWindow(time_offset, float(seek * HOP_LENGTH / SAMPLE_RATE), duration,
+                                language, segments, list(prompt_tokens))
+    finally:
+        if encoder is not None:
+            encoder.detach()
@@ -0,0 +1,362 @@
+import os
+import threading
+
+from transcritor_cpu import configure_threads, load_quantized, quantize_model, quantized_path, save_quantized
+from transcritor_decoder import DecodedWindow, Segment, decode_windows
+from transcritor_batch import using_model
+from transcritor_model_cache import get_model_cache
+from transcritor_model_store import get_model_store
+from transcritor_trace import get_tracer
+
+ENGINE_WHISPER = "whisper"
+ENGINE_FASTER_WHISPER = "faster-whisper"
+ENGINES = (ENGINE_WHISPER, ENGINE_FASTER_WHISPER)
+DEFAULT_ENGINE = ENGINE_WHISPER
+
+SAMPLE_RATE = 16000
+
+# Frames do espectrograma por segundo (HOP_LENGTH de 160 amostras a 16 kHz)
+FRAMES_PER_SECOND = 100
+
+# Contexto de texto dos modelos Whisper; o prompt usa no máximo a metade
+N_TEXT_CTX = 448
+
+_libraries_lock = threading.Lock()
+
+
+def import_libraries():
+    """Importa torch e whisper, a parte lenta da inicialização (só na primeira chamada)
+
+    Os módulos do FalaMemo importam essas bibliotecas apenas dentro das
+    funções que as usam, para a janela abrir sem esperar por elas; esta
+    função permite adiantar a importação em segundo plano.
+    """
+    import sys
+    import importlib
+    with _libraries_lock:
+        if "whisper.decoding" in sys.modules:
+            return
+        tracer = get_tracer()
+        # Só a importação interessa aqui; whisper.decoding também traz o tokenizer
+        with tracer.span("import_torch"):
+            importlib.import_module("torch")
+        with tracer.span("import_whisper"):
+            importlib.import_module("whisper.decoding")
+
+
+def default_device():
+    """Dispositivo usado quando nenhum é informado"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class InferenceEngine:
+    """Interface comum dos motores de inferência usados pelo backend
+
+    Todo motor gera DecodedWindow com objetos Segment, então a interface,
+    o checkpoint, os caches e as exportações não dependem do motor usado.
+    """
+    name = None
+    # Aceita low_memory=True em transcribe_stream (mel por janela, sem o espectrograma inteiro)
+    supports_low_memory = False
+    # Aceita encoder=EncoderBatcher em transcribe_stream (codificador em lote com outras transcrições)
+    supports_batching = False
+
+    def __init__(self, fast_cpu=False):
+        self.model = None
+        self.model_name = None
+        self.device = None
+        # Verdadeiro se a última carga criou a entrada no cache de modelos (em vez de reaproveitá-la)
+        self.created = False
+        # Perfil de CPU rápida: threads pelos núcleos físicos (e pesos int8, se o motor suportar)
+        self.fast_cpu = fast_cpu
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self, model_name, device=None, progress=None):
+        """Carrega o modelo; progress(percentual) recebe o andamento de um download"""
+        raise NotImplementedError
+
+    def is_local(self, model_name):
+        """Indica se o modelo pode ser carregado sem baixar nada"""
+        return False
+
+    def _creating(self, loader):
+        """Envolve o loader passado ao cache de modelos para registrar em created se ele rodou"""
+        self.created = False
+
+        def create():
+            model = loader()
+            self.created = True
+            return model
+        return create
+
+    def transcribe_stream(self, audio, language=None, task="transcribe", initial_seek=0.0,
+                          initial_prompt_tokens=None, first_segment_id=0, cancel_token=None, **options):
+        """Gera um DecodedWindow por janela decodificada do áudio (float32, 16 kHz)"""
+        raise NotImplementedError
+
+    def detect_language(self, audio):
+        """Detecta o idioma dos primeiros 30 s; devolve (idioma, probabilidades)"""
+        raise NotImplementedError
+
+    def unload(self):
+        """Libera o modelo da memória"""
+        raise NotImplementedError
+
+
+class WhisperEngine(InferenceEngine):
+    """Motor openai-whisper (PyTorch), com o laço de decodificação próprio do FalaMemo"""
+    name = ENGINE_WHISPER
+    supports_low_memory = True
+    supports_batching = True
+
+    @property
+    def quantized(self):
+        return self.fast_cpu and self.device == "cpu"
+
+    def load(self, model_name, device=None, progress=None):
+        device = device or default_device()
+        self.device = device
+        cache = get_model_cache()
+
+        if self.quantized:
+            configure_threads()
+            dtype = "int8"
+            loader = lambda: load_quantized_whisper_model(model_name, progress)
+        else:
+            dtype = "float32"
+            loader = lambda: load_whisper_model(model_name, device, progress)
+
+        if cache.contains(model_name, device, dtype):
+            print(f"Modelo {model_name} reaproveitado do cache")
+        self.model = cache.get(model_name, device, dtype, loader=self._creating(loader))
+        self.model_name = model_name
+        self.device = device
+        return self.model
+
+    def is_local(self, model_name):
+        store = get_model_store()
+        if not store.is_known(model_name):
+            return os.path.isfile(model_name)
+        if self.fast_cpu and os.path.exists(quantized_path(store.model_dir, model_name)):
+            return True
+        return store.is_available(model_name)
+
+    def transcribe_stream(self, audio, language=None, task="transcribe", initial_seek=0.0,
+                          initial_prompt_tokens=None, first_segment_id=0, cancel_token=None, **options):
+        return decode_windows(
+            self.model, audio, language=language, task=task, initial_seek=initial_seek,
+            initial_prompt_tokens=initial_prompt_tokens, first_segment_id=first_segment_id,
+            cancel_token=cancel_token, **options
+        )
+
+    def detect_language(self, audio):
+        import whisper
+
+        if not self.model.is_multilingual:
+            return "en", {"en": 1.0}
+        audio = whisper.pad_or_trim(audio[:whisper.audio.N_SAMPLES])
+        mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels).to(self.model.device)
+        # O decodificador pode estar em uso por outra thread com o mesmo modelo
+        with using_model(self.model):
+            _, probs = self.model.detect_language(mel)
+        return max(probs, key=probs.get), probs
+
+    def unload(self):
+        if self.model_name:
+            get_model_cache().remove(self.model_name, self.device, "int8" if self.quantized else "float32")
+        self.model = None
+
+
+class FasterWhisperEngine(InferenceEngine):
+    """Motor faster-whisper (CTranslate2), com pesos int8 na CPU"""
+    name = ENGINE_FASTER_WHISPER
+
+    def __init__(self, fast_cpu=False, compute_type=None):
+        super().__init__(fast_cpu)
+        self.compute_type = compute_type
+
+    def load(self, model_name, device=None, progress=None):
+        try:
+            from faster_whisper import WhisperModel
+            from faster_whisper.utils import download_model
+        except ImportError:
+            raise RuntimeError("O motor faster-whisper não está instalado (pip install faster-whisper)")
+
+        import torch
+
+        device = device or default_device()
+        compute_type = self.compute_type or ("int8" if device == "cpu" else "float16")
+        if self.fast_cpu and device == "cpu":
+            configure_threads()
+
+        def loader():
+            # Modelos convertidos para CTranslate2 ficam junto dos demais modelos
+            if os.path.isdir(model_name):
+                model_path = model_name
+            else:
+                output_dir = os.path.join(get_model_store().model_dir, "ctranslate2", model_name)
+                model_path = download_model(model_name, output_dir=output_dir)
+            model = WhisperModel(model_path, device=device, compute_type=compute_type,
+                                 cpu_threads=torch.get_num_threads())
+            # O cache de modelos não enxerga os pesos do CTranslate2: usar o tamanho em disco
+            model.memory_bytes = _directory_size(model_path)
+            return model
+
+        self.model = get_model_cache().get(f"{self.name}/{model_name}", device, compute_type,
+                                           loader=self._creating(loader))
+        self.model_name = model_name
+        self.device = device
+        self.compute_type = compute_type
+        return self.model
+
+    def is_local(self, model_name):
+        if os.path.isdir(model_name):
+            return True
+        output_dir = os.path.join(get_model_store().model_dir, "ctranslate2", model_name)
+        return os.path.isfile(os.path.join(output_dir, "model.bin"))
+
+    def transcribe_stream(self, audio, language=None, task="transcribe", initial_seek=0.0,
+                          initial_prompt_tokens=None, first_segment_id=0, cancel_token=None,
+                          temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0), compression_ratio_threshold=2.4,
+                          logprob_threshold=-1.0, no_speech_threshold=0.6, condition_on_previous_text=True,
+                          beam_size=None, best_of=None, **options):
+        """Agrupa os segmentos do faster-whisper por janela de 30 s
+
+        O CTranslate2 não pode ser interrompido no meio de uma janela, então o
+        cancelamento e a pausa são verificados entre os segmentos.
+        """
+        duration = len(audio) / SAMPLE_RATE
+        segments, info = self.model.transcribe(
+            audio, language=language, task=task,
+            # Mesmos padrões do motor whisper: busca gulosa, salvo pedido explícito
+            beam_size=beam_size or 1, best_of=best_of or 5,
+            temperature=list(temperature) if isinstance(temperature, (list, tuple)) else temperature,
+            compression_ratio_threshold=compression_ratio_threshold,
+            log_prob_threshold=logprob_threshold,
+            no_speech_threshold=no_speech_threshold,
+            condition_on_previous_text=condition_on_previous_text,
+            initial_prompt=list(initial_prompt_tokens) if initial_prompt_tokens else None,
+            clip_timestamps=[float(initial_seek)] if initial_seek else "0",
+            **options
+        )
+
+        max_prompt = N_TEXT_CTX // 2 - 1
+        prompt_tokens = list(initial_prompt_tokens or [])
+        window = None
+        segment_id = first_segment_id
+
+        for result in segments:
+            if cancel_token:
+                cancel_token.check()
+
+            start = result.seek / FRAMES_PER_SECOND
+            if window is not None and start != window.start:
+                yield window
+                window = None
+            if window is None:
+                window = DecodedWindow(start=start, end=start, duration=duration, language=info.language)
+
+            segment = Segment(
+                start=round(result.start, 3),
+                end=round(result.end, 3),
+                text=result.text,
+                avg_logprob=result.avg_logprob,
+                no_speech_prob=result.no_speech_prob,
+                id=segment_id,
+            )
+            segment_id += 1
+            window.segments.append(segment)
+            # A retomada continua do fim do último segmento concluído
+            window.end = max(window.end, result.end)
+
+            if condition_on_previous_text:
+                prompt_tokens = (prompt_tokens + list(result.tokens))[-max_prompt:]
+            else:
+                prompt_tokens = []
+            window.prompt_tokens = list(prompt_tokens)
+
+        if window is not None:
+            window.end = duration
+            yield window
+
+    def detect_language(self, audio):
+        language, _, all_probs = self.model.detect_language(audio[:30 * SAMPLE_RATE])
+        return language, dict(all_probs)
+
+    def unload(self):
+        if self.model_name:
+            get_model_cache().remove(f"{self.name}/{self.model_name}", self.device, self.compute_type)
+        self.model = None
+
+
+def create_engine(name=None, fast_cpu=False):
+    """Cria o motor de inferência pelo nome (padrão: whisper)"""
+    name = name or DEFAULT_ENGINE
+    if name == ENGINE_WHISPER:
+        return WhisperEngine(fast_cpu)
+    if name == ENGINE_FASTER_WHISPER:
+        return FasterWhisperEngine(fast_cpu)
+    raise ValueError(f"Motor de inferência desconhecido: {name}")
+
+
+def ensure_model_file(model_name, progress=None):
+    """Garante o arquivo do modelo whisper no diretório local, informando o progresso real do download"""
+    store = get_model_store()
+    if not store.is_known(model_name):
+        # Caminho de um arquivo de modelo informado diretamente
+        return model_name
+
+    last_percent = -1
+
+    def report(done, total):
+        nonlocal last_percent
+        if not total or not progress:
+            return
+        percent = int(done * 100 / total)
+        if percent != last_percent:
+            last_percent = percent
+            progress(percent)
+
+    return store.ensure(model_name, progress=report)
+
+
+def load_whisper_model(model_name, device, progress=None):
+    """Carrega o modelo a partir do arquivo local, sem o whisper recalcular o hash"""
+    import whisper
+
+    model = whisper.load_model(ensure_model_file(model_name, progress), device=device)
+    alignment_heads = whisper._ALIGNMENT_HEADS.get(model_name)
+    if alignment_heads:
+        model.set_alignment_heads(alignment_heads)
+    return model
+
+
+def load_quantized_whisper_model(model_name, progress=None):
+    """Carrega o modelo int8 do disco; na primeira vez converte o fp32 e salva o resultado"""
+    import whisper
+
+    path = quantized_path(get_model_store().model_dir, model_name)
+    alignment_heads = whisper._ALIGNMENT_HEADS.get(model_name)
+    if os.path.exists(path):
+        try:
+            return load_quantized(path, alignment_heads)
+        except Exception as e:
+            print(f"Modelo int8 salvo ilegível, convertendo de novo: {e}")
+
+    print(f"Convertendo {model_name} para int8 (feito uma única vez)")
+    model = quantize_model(load_whisper_model(model_name, "cpu", progress))
+    save_quantized(model, path)
+    return model
+
+
+def _directory_size(path):
+    """Soma do tamanho dos arquivos de uma pasta"""
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(folder, name))
+    return total
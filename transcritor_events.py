@@ -0,0 +1,155 @@
+import time
+import threading
+from collections import deque
+
+from transcritor_trace import get_tracer
+
+# Eventos em que só o valor mais recente importa: o anterior ainda não entregue é descartado
+LATEST_ONLY = ("download_progress", "transcription_progress", "batch_progress")
+
+# Eventos cujas listas pendentes são juntadas em uma só (nenhum item é perdido)
+MERGED = ("segments",)
+
+# Eventos pendentes antes de a thread produtora esperar a interface drenar a fila
+DEFAULT_MAX_EVENTS = 1000
+
+# Eventos tratados por rodada da bomba, para não travar a interface em rajadas
+DEFAULT_BATCH_SIZE = 200
+
+
+class EventBus:
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, latest_only=LATEST_ONLY, merged=MERGED):
+        """Fila de eventos entre as threads de trabalho e o mainloop do Tk
+
+        Qualquer thread publica; só a thread da interface consome, em lotes,
+        então nenhum widget é tocado fora do mainloop. O progresso é
+        coalescido (vale o último) e os segmentos são sempre mantidos.
+        """
+        self.max_events = max_events
+        self.latest_only = set(latest_only)
+        self.merged = set(merged)
+        self._events = deque()
+        self._latest = {}  # tipo -> evento pendente com o valor mais recente
+        self._condition = threading.Condition()
+        self._closed = False
+        self.owner = None  # Thread que drena a fila (a da interface); definida pela bomba
+
+    def publish(self, kind, payload=None):
+        """Publica um evento; pode ser chamado de qualquer thread
+
+        Só as threads de trabalho esperam a fila esvaziar. A thread da
+        interface (a que roda a bomba) nunca espera, porque é ela que drena a
+        fila; e segmentos publicados com a fila cheia são juntados ao último
+        evento de segmentos pendente, para um diálogo modal aberto na
+        interface não travar a transcrição.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            if kind in self.latest_only:
+                event = self._latest.get(kind)
+                if event is not None:
+                    event[1] = payload
+                    return
+            elif kind in self.merged and self._events and self._events[-1][0] == kind:
+                self._events[-1][1].extend(payload)
+                return
+
+            if len(self._events) >= self.max_events:
+                if kind in self.merged:
+                    for event in reversed(self._events):
+                        if event[0] == kind:
+                            event[1].extend(payload)
+                            return
+                # Fila cheia: esperar a interface consumir em vez de crescer sem limite
+                if threading.get_ident() != self.owner:
+                    while len(self._events) >= self.max_events and not self._closed:
+                        self._condition.wait(0.1)
+                    if self._closed:
+                        return
+
+            event = [kind, list(payload) if kind in self.merged else payload]
+            self._events.append(event)
+            if kind in self.latest_only:
+                self._latest[kind] = event
+
+    def publisher(self, kind):
+        """Função de um argumento que publica eventos de um tipo (para usar como callback)"""
+        return lambda payload=None: self.publish(kind, payload)
+
+    def call(self, func, *args):
+        """Agenda uma função para rodar na thread da interface, na ordem dos demais eventos"""
+        self.publish("call", (func, args))
+
+    def drain(self, limit=None):
+        """Retira até limit eventos pendentes como lista de (tipo, valor)"""
+        with self._condition:
+            count = len(self._events) if limit is None else min(limit, len(self._events))
+            events = []
+            for _ in range(count):
+                kind, payload = self._events.popleft()
+                if kind in self.latest_only:
+                    self._latest.pop(kind, None)
+                events.append((kind, payload))
+            self._condition.notify_all()
+        return events
+
+    def discard(self, kind):
+        """Remove os eventos pendentes de um tipo (ex.: segmentos de uma transcrição antiga)"""
+        with self._condition:
+            self._events = deque(event for event in self._events if event[0] != kind)
+            self._latest.pop(kind, None)
+            self._condition.notify_all()
+
+    def close(self):
+        """Libera as threads que esperam espaço na fila; eventos publicados depois são descartados"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class TkEventPump:
+    def __init__(self, root, bus, handlers, interval_ms=16, batch_size=DEFAULT_BATCH_SIZE):
+        """Drena o EventBus pelo root.after e chama o tratador de cada tipo de evento"""
+        self.root = root
+        self.bus = bus
+        self.handlers = handlers
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self._running = False
+
+    def start(self):
+        """Inicia o ciclo de drenagem no mainloop"""
+        if not self._running:
+            self._running = True
+            self.bus.owner = threading.get_ident()
+            self.root.after(self.interval_ms, self._pump)
+
+    def stop(self):
+        """Interrompe o ciclo de drenagem"""
+        self._running = False
+
+    def _pump(self):
+        """Trata um lote de eventos e agenda a próxima rodada"""
+        if not self._running:
+            return
+        start = time.perf_counter()
+        handled = 0
+        try:
+            for kind, payload in self.bus.drain(self.batch_size):
+                handled += 1
+                try:
+                    if kind == "call":
+                        func, args = payload
+                        func(*args)
+                    else:
+                        self.handlers[kind](payload)
+                except Exception as e:
+                    print(f"Erro ao tratar evento {kind}: {e}")
+        finally:
+            # Só rodadas com eventos entram no trace; as vazias acontecem a cada 16 ms
+            if handled:
+                tracer = get_tracer()
+                tracer.record("ui_update", start, time.perf_counter(), {"events": handled})
+                tracer.count("ui_events", handled)
+            self.root.after(self.interval_ms, self._pump)
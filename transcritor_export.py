@@ -0,0 +1,200 @@
+import os
+import json
+
+# Formatos de saída, na ordem mostrada ao usuário
+EXPORT_FORMATS = ("txt", "srt", "vtt", "json", "tsv")
+
+# Sufixo do arquivo em andamento; renomeado para o nome final ao concluir
+PARTIAL_SUFFIX = ".part"
+
+
+def format_timestamp(seconds, separator="."):
+    """Tempo em segundos no formato HH:MM:SS.mmm (separador "," no SRT)"""
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+class SegmentWriter:
+    """Grava segmentos em um formato à medida que chegam
+
+    Cada segmento é escrito e enviado ao disco assim que recebido, em
+    <saída>.part; close() renomeia para o nome final de forma atômica.
+    Nada além do último segmento fica em memória.
+    """
+    extension = None
+
+    def __init__(self, path):
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(self.partial_path, "w", encoding="utf-8", newline="\n")
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write_footer(self):
+        pass
+
+    def format_segment(self, segment):
+        raise NotImplementedError
+
+    def write(self, segments):
+        """Acrescenta os segmentos ao arquivo em andamento"""
+        for segment in segments:
+            text = self.format_segment(segment)
+            if text:
+                self.file.write(text)
+                self.count += 1
+        self.file.flush()
+
+    def close(self):
+        """Conclui o arquivo e o move para o nome final"""
+        self.write_footer()
+        self.file.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Fecha sem concluir: o .part fica no disco com o que já foi transcrito"""
+        if not self.file.closed:
+            self.file.close()
+
+
+class TextWriter(SegmentWriter):
+    extension = "txt"
+
+    def format_segment(self, segment):
+        # Mesmo texto de antes: os segmentos concatenados, sem o espaço inicial
+        return segment.text.lstrip() if self.count == 0 else segment.text
+
+
+class SrtWriter(SegmentWriter):
+    extension = "srt"
+
+    def format_segment(self, segment):
+        text = segment.text.strip()
+        if not text:
+            return None
+        return (f"{self.count + 1}\n"
+                f"{format_timestamp(segment.start, ',')} --> {format_timestamp(segment.end, ',')}\n"
+                f"{text.replace('-->', '->')}\n\n")
+
+
+class VttWriter(SegmentWriter):
+    extension = "vtt"
+
+    def write_header(self):
+        self.file.write("WEBVTT\n\n")
+
+    def format_segment(self, segment):
+        text = segment.text.strip()
+        if not text:
+            return None
+        return f"{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}\n{text.replace('-->', '->')}\n\n"
+
+
+class TsvWriter(SegmentWriter):
+    extension = "tsv"
+
+    def write_header(self):
+        self.file.write("start\tend\ttext\n")
+
+    def format_segment(self, segment):
+        # Tempos inteiros em milissegundos, como no formato tsv do Whisper
+        text = " ".join(segment.text.split())
+        return f"{int(round(segment.start * 1000))}\t{int(round(segment.end * 1000))}\t{text}\n"
+
+
+class JsonWriter(SegmentWriter):
+    extension = "json"
+
+    def write_header(self):
+        self.file.write("[")
+
+    def format_segment(self, segment):
+        separator = "\n  " if self.count == 0 else ",\n  "
+        return separator + json.dumps(segment.to_dict(), ensure_ascii=False)
+
+    def write_footer(self):
+        self.file.write("\n]\n" if self.count else "]\n")
+
+
+WRITERS = {writer.extension: writer for writer in (TextWriter, SrtWriter, VttWriter, JsonWriter, TsvWriter)}
+
+
+def parse_formats(value):
+    """Lista de formatos a partir de "srt,vtt" ou "all"; levanta ValueError se algum for desconhecido"""
+    if value.strip() == "all":
+        return list(EXPORT_FORMATS)
+    formats = [name.strip().lower().lstrip(".") for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in WRITERS]
+    if unknown or not formats:
+        raise ValueError(f"Formatos desconhecidos: {', '.join(unknown) or value}; use {', '.join(EXPORT_FORMATS)} ou all")
+    return list(dict.fromkeys(formats))
+
+
+def format_for_path(path, default="txt"):
+    """Formato deduzido da extensão do arquivo"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return extension if extension in WRITERS else default
+
+
+class Exporter:
+    def __init__(self, paths):
+        """Grava os mesmos segmentos em vários arquivos; paths é {formato: caminho}
+
+        Usado como gerenciador de contexto: conclui os arquivos se o bloco
+        terminar normalmente e deixa os .part no disco se houver erro ou
+        cancelamento.
+        """
+        self.writers = []
+        try:
+            for output_format, path in paths.items():
+                self.writers.append(WRITERS[output_format](path))
+        except Exception:
+            self.abort()
+            raise
+
+    @property
+    def paths(self):
+        return [writer.path for writer in self.writers]
+
+    def write(self, segments):
+        for writer in self.writers:
+            writer.write(segments)
+
+    def close(self):
+        return [writer.close() for writer in self.writers]
+
+    def abort(self):
+        for writer in self.writers:
+            writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def output_paths(file_path, output_dir, formats):
+    """{formato: caminho} dos arquivos de saída de um áudio"""
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    directory = output_dir or os.path.dirname(file_path)
+    return {output_format: os.path.join(directory, f"{base}.{output_format}") for output_format in formats}
+
+
+def export_segments(path, segments, output_format=None):
+    """Grava uma lista de segmentos já pronta em um arquivo (formato pela extensão se não informado)"""
+    with Exporter({output_format or format_for_path(path): path}) as exporter:
+        exporter.write(segments)
+    return path
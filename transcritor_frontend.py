@@ -1,11 +1,41 @@
 import os
 import sys
+import time
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
 from datetime import datetime
 from transcritor_backend import TranscritorBackend
+from transcritor_queue import BatchQueue, JOB_DONE, JOB_FAILED
+from transcritor_events import EventBus, TkEventPump
+from transcritor_preload import ModelPreloader
+from transcritor_trace import get_tracer, record_startup
+from transcritor_export import export_segments
+
+# Intervalo entre as rodadas de eventos na interface (~1 quadro a 60 Hz)
+FLUSH_INTERVAL_MS = 16
+
+# Intervalo de atualização do painel de desempenho
+STATS_INTERVAL_MS = 1000
+
+# Espera depois da janela aparecer antes de importar torch e whisper em segundo plano
+WARMUP_DELAY_MS = 500
+
+# Espera depois de uma mudança de modelo/arquivo antes da carga antecipada (a escolha pode mudar de novo)
+PRELOAD_DELAY_MS = 400
+
+READY_STATUS = "Pronto para iniciar"
+
+# Tipos oferecidos ao salvar; o formato é escolhido pela extensão
+SAVE_FILETYPES = [
+    ("Arquivo de Texto", "*.txt"),
+    ("Legendas SubRip", "*.srt"),
+    ("Legendas WebVTT", "*.vtt"),
+    ("JSON com tempos", "*.json"),
+    ("Tabela TSV", "*.tsv"),
+    ("Todos os arquivos", "*.*"),
+]
 
 class TranscritorFrontend:
     def __init__(self, root):
@@ -23,29 +53,87 @@ class TranscritorFrontend:
         # Inicializar backend
         self.backend = TranscritorBackend()
         
-        # Configurar callbacks do backend
+        # Os callbacks do backend rodam nas threads de trabalho: só publicam eventos,
+        # que são tratados no mainloop pela bomba de eventos. A conclusão é
+        # tratada pela própria thread de transcrição.
+        self.events = EventBus()
         self.backend.set_callbacks(
-            download_progress=self.update_download_progress,
-            transcription_progress=self.update_progress,
-            transcription_complete=self.update_transcription_complete,
-            transcription_update=self.update_partial_transcription,
-            error=self.show_error
+            download_progress=self.events.publisher("download_progress"),
+            transcription_progress=self.events.publisher("transcription_progress"),
+            transcription_update=self.events.publisher("segments"),
+            error=self.events.publisher("error"),
+            language_detected=self.events.publisher("language_detected")
         )
         
+        # Carga antecipada do modelo escolhido, para ele já estar pronto no clique
+        self.preloader = ModelPreloader(self.backend,
+                                        on_ready=lambda model_name: self.events.call(self.show_preloaded, model_name))
+        self.preload_after_id = None
+        self.preload_status = None
+        
         # Variáveis de controle
         self.transcription_thread = None
+        self.batch_queue = None
         self.transcription_paused = False
         self.current_file_path = None
-        self.partial_transcription = ""
+        self.partial_transcription = []  # Trechos de texto já recebidos, na ordem
         self.transcription = None
+        self.transcription_segments = []  # Segmentos com tempos, para salvar legendas
+        self.saved_path = None
         self.is_downloading = False
         self.is_transcribing = False
+        self.stats_window = None
+        self.stats_after_id = None
         
         # Configurar a interface
         self.setup_ui()
+        
+        # Tratar no mainloop, em lotes, os eventos publicados pelas threads
+        self.event_pump = TkEventPump(self.root, self.events, {
+            "download_progress": self.update_download_progress,
+            "transcription_progress": self.update_progress,
+            "segments": self.update_partial_transcription,
+            "batch_progress": lambda args: self.update_batch_progress(*args),
+            "error": self.show_error,
+            "language_detected": self.show_language_detection,
+        }, interval_ms=FLUSH_INTERVAL_MS)
+        self.event_pump.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # torch e whisper só são importados na primeira transcrição; adiantar em segundo
+        # plano depois que a janela aparece (FALAMEMO_WARMUP=0 desativa)
+        if os.environ.get("FALAMEMO_WARMUP", "1") != "0":
+            self.root.after(WARMUP_DELAY_MS, self.start_warmup)
     
 
     
+    def start_warmup(self):
+        """Importa as bibliotecas de inferência em uma thread, sem travar a interface"""
+        threading.Thread(target=self._warmup_thread, daemon=True).start()
+    
+    def _warmup_thread(self):
+        """Thread de pré-aquecimento; uma falha aqui aparece de novo na transcrição"""
+        try:
+            self.backend.preload_libraries()
+        except Exception as e:
+            print(f"Falha ao pré-carregar as bibliotecas: {e}")
+    
+    def report_startup(self, started, imported):
+        """Mede o tempo até a janela aparecer (a partir do início do main.py) e registra o resultado"""
+        built = time.perf_counter()
+        reported = False
+        
+        def on_map(event):
+            nonlocal reported
+            if reported or event.widget is not self.root:
+                return
+            reported = True
+            entry = record_startup(started, imported, built, time.perf_counter())
+            print(f"Janela exibida em {entry['time_to_window']:.2f}s "
+                  f"(importações {entry['imports']:.2f}s, interface {entry['ui']:.2f}s)")
+        
+        self.root.bind("<Map>", on_map, add="+")
+    
     def setup_ui(self):
         """Configura a interface do usuário"""
         # Frame principal
@@ -87,6 +175,7 @@ class TranscritorFrontend:
         self.file_entry = ctk.CTkEntry(file_content_frame, textvariable=self.file_path_var, width=400)
         self.file_entry.grid(row=0, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
         ctk.CTkButton(file_content_frame, text="Selecionar Arquivo", command=self.select_file).grid(row=0, column=2, padx=5, pady=5)
+        ctk.CTkButton(file_content_frame, text="Transcrever Pasta", command=self.select_folder).grid(row=0, column=3, padx=5, pady=5)
     
     def _setup_model_frame(self, parent):
         """Configura o frame de opções de modelo"""
@@ -118,6 +207,8 @@ class TranscritorFrontend:
                 if hasattr(self, 'continue_button'):
                     self.continue_button.grid_forget()
                 self.stop_button.grid(row=0, column=1, padx=10)
+            
+            self.schedule_preload()
         
         # Dropdown com os modelos
         model_dropdown = ctk.CTkOptionMenu(
@@ -136,6 +227,12 @@ class TranscritorFrontend:
         )
         self.model_description_label.grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
         
+        # Perfil de CPU rápida: pesos int8 convertidos uma única vez e threads pelos núcleos físicos
+        self.fast_cpu_var = tk.BooleanVar(value=False)
+        fast_cpu_checkbox = ctk.CTkCheckBox(options_frame, text="CPU rápida (int8)", variable=self.fast_cpu_var,
+                                            command=self.schedule_preload)
+        fast_cpu_checkbox.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
+        
         ctk.CTkLabel(options_frame, text="Idioma").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
         self.language_var = tk.StringVar(value="pt")
         language_options = ["auto", "pt", "en", "es", "fr", "de", "it", "ja", "zh", "ru"]
@@ -149,6 +246,24 @@ class TranscritorFrontend:
             font=ctk.CTkFont(size=11, slant="italic")
         )
         language_description_label.grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+        
+        # Pré-processamento de detecção de voz
+        self.vad_var = tk.BooleanVar(value=False)
+        vad_checkbox = ctk.CTkCheckBox(options_frame, text="Pular silêncio (VAD)", variable=self.vad_var)
+        vad_checkbox.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        vad_description_label = ctk.CTkLabel(
+            options_frame, 
+            text="Envia ao modelo apenas os trechos com voz",
+            font=ctk.CTkFont(size=11, slant="italic")
+        )
+        vad_description_label.grid(row=2, column=2, sticky=tk.W, padx=5, pady=5)
+        
+        # Painel com o tempo gasto em cada etapa (carga, ffmpeg, mel, codificador, decodificador, interface)
+        self.stats_var = tk.BooleanVar(value=False)
+        stats_checkbox = ctk.CTkCheckBox(options_frame, text="Mostrar desempenho", variable=self.stats_var,
+                                         command=self.toggle_stats_panel)
+        stats_checkbox.grid(row=2, column=3, sticky=tk.W, padx=5, pady=5)
     
     def _setup_action_frame(self, parent):
         """Configura o frame de botões de ação"""
@@ -200,6 +315,17 @@ class TranscritorFrontend:
             font=ctk.CTkFont(size=13, weight="bold")
         )
         self.save_button.grid(row=0, column=2, padx=10)
+        
+        self.pause_button = ctk.CTkButton(
+            button_frame, 
+            text="Pausar", 
+            command=self.toggle_pause, 
+            width=100,
+            height=35,
+            state="disabled",
+            font=ctk.CTkFont(size=13, weight="bold")
+        )
+        self.pause_button.grid(row=0, column=3, padx=10)
     
     def _setup_progress_frame(self, parent):
         """Configura o frame de progresso"""
@@ -217,7 +343,7 @@ class TranscritorFrontend:
         self.progress_percent_label = ctk.CTkLabel(progress_container, text="0%", width=50)
         self.progress_percent_label.pack(side=tk.RIGHT)
         
-        self.status_var = tk.StringVar(value="Pronto para iniciar")
+        self.status_var = tk.StringVar(value=READY_STATUS)
         status_label = ctk.CTkLabel(progress_frame, textvariable=self.status_var)
         status_label.pack(fill=tk.X, pady=5)
     
@@ -249,7 +375,92 @@ class TranscritorFrontend:
         if file_path:
             self.file_path_var.set(file_path)
             self.transcribe_button.configure(state="normal")
+            self.schedule_preload()
+
+            # Oferecer a retomada de uma transcrição interrompida, mesmo de outra sessão
+            if self.backend.has_checkpoint(file_path):
+                self.current_file_path = file_path
+                self.transcription_paused = True
+                self.stop_button.grid_forget()
+                self.continue_button.grid(row=0, column=1, padx=10)
+                self.continue_button.configure(state="normal")
+                self.status_var.set("Transcrição interrompida encontrada. Clique em Continuar para retomar.")
+    
+    def schedule_preload(self):
+        """Agenda a carga antecipada do modelo escolhido; mudanças seguidas geram uma só carga"""
+        if self.preload_after_id is not None:
+            self.root.after_cancel(self.preload_after_id)
+        self.preload_after_id = self.root.after(PRELOAD_DELAY_MS, self._request_preload)
+    
+    def _request_preload(self):
+        """Pede a carga ao ModelPreloader, exceto durante uma transcrição (que já tem o seu modelo)"""
+        self.preload_after_id = None
+        if self.transcription_thread and self.transcription_thread.is_alive():
+            return
+        self.preloader.request(self.model_var.get(), fast_cpu=self.fast_cpu_var.get())
     
+    def show_preloaded(self, model_name):
+        """Avisa que o modelo escolhido já está carregado, sem sobrescrever outras mensagens"""
+        busy = self.transcription_thread and self.transcription_thread.is_alive()
+        if not busy and model_name == self.model_var.get() and self.status_var.get() in (READY_STATUS, self.preload_status):
+            self.preload_status = f"Modelo {model_name} carregado e pronto"
+            self.status_var.set(self.preload_status)
+    
+    def select_folder(self):
+        """Abre um diálogo para selecionar uma pasta e transcreve todos os áudios dela"""
+        if self.transcription_thread and self.transcription_thread.is_alive():
+            messagebox.showerror("Erro", "Aguarde a transcrição atual terminar.")
+            return
+
+        folder = filedialog.askdirectory(title="Selecione uma pasta com arquivos de áudio")
+        if not folder:
+            return
+
+        language = None if self.language_var.get() == "auto" else self.language_var.get()
+        self.batch_queue = BatchQueue(folder, model_name=self.model_var.get(), language=language,
+                                      fast_cpu=self.fast_cpu_var.get())
+        self.batch_queue.set_callbacks(
+            job_update=lambda job, summary: self.events.publish("batch_progress", (job, summary))
+        )
+
+        # Atualizar interface
+        self.transcription_paused = False
+        self.status_var.set(f"Preparando fila da pasta {folder}...")
+        self.transcribe_button.configure(state="disabled")
+        self.stop_button.configure(state="normal")
+        self.pause_button.configure(text="Pausar", state="normal")
+        self.save_button.configure(state="disabled")
+
+        # Processar a fila em uma thread separada
+        self.transcription_thread = threading.Thread(target=self._batch_thread)
+        self.transcription_thread.daemon = True
+        self.transcription_thread.start()
+
+    def _batch_thread(self):
+        """Thread para processar a fila de uma pasta"""
+        try:
+            self.batch_queue.load_state()
+            model_name = self.batch_queue.model_name
+            self.events.call(self.status_var.set, f"Carregando modelo {model_name}...")
+            self.events.call(self.configure_progress_bar_determinate)
+
+            summary = self.batch_queue.run(self.backend)
+
+            message = f"Fila concluída: {summary[JOB_DONE]} transcritos, {summary[JOB_FAILED]} com erro"
+            self.events.call(self.status_var.set, message)
+        except Exception as e:
+            self.events.call(self.show_error, f"Erro na fila de transcrição: {str(e)}")
+        finally:
+            self.batch_queue = None
+            self.events.call(self.reset_ui)
+
+    def update_batch_progress(self, job, summary):
+        """Mostra o andamento da fila na barra de status"""
+        total = sum(summary.values())
+        finished = summary[JOB_DONE] + summary[JOB_FAILED]
+        name = os.path.basename(job["path"])
+        self.status_var.set(f"Fila: {finished}/{total} concluídos - {name}")
+
     def start_transcription(self):
         """Inicia o processo de transcrição"""
         file_path = self.file_path_var.get()
@@ -276,8 +487,11 @@ class TranscritorFrontend:
         self.transcription_text.configure(state="normal")
         self.transcription_text.delete("0.0", "end")
         self.transcription_text.configure(state="disabled")
-        self.partial_transcription = ""
+        self.partial_transcription = []
+        self.events.discard("segments")
         self.transcription = None
+        self.transcription_segments = []
+        self.saved_path = None
         self.transcription_paused = False
         
         # Atualizar interface
@@ -286,6 +500,7 @@ class TranscritorFrontend:
         self.status_var.set("Carregando modelo... (isso pode levar alguns minutos)")
         self.transcribe_button.configure(state="disabled")
         self.stop_button.configure(state="normal")
+        self.pause_button.configure(text="Pausar", state="normal")
         self.save_button.configure(state="disabled")
         
         # Iniciar transcrição em uma thread separada
@@ -296,42 +511,61 @@ class TranscritorFrontend:
     def _transcribe_thread(self, file_path):
         """Thread para executar a transcrição"""
         try:
-            # Carregar modelo
             model_name = self.model_var.get()
-            self.root.after(0, lambda: self.status_var.set(f"Carregando modelo {model_name}..."))
+            language = None if self.language_var.get() == "auto" else self.language_var.get()
+            
+            # Resultado idêntico já transcrito: mostrar sem carregar o modelo
+            cached = self.backend.lookup_result(file_path, model_name, language, vad=self.vad_var.get(),
+                                                fast_cpu=self.fast_cpu_var.get())
+            if cached:
+                self.transcription = cached.text
+                self.transcription_segments = cached.segments
+                self.saved_path = cached.saved_path
+                self.events.call(self.update_transcription_complete)
+                self.events.call(self.status_var.set, "Transcrição recuperada do cache")
+                return
+            
+            # Carregar modelo
+            self.events.call(self.status_var.set, f"Carregando modelo {model_name}...")
             
             # Mostrar mensagem de download na área de transcrição antes de carregar o modelo
-            self.root.after(0, lambda: self.show_model_info(model_name))
+            self.events.call(self.show_model_info, model_name)
             
-            if not self.backend.load_model(model_name):
-                self.root.after(0, lambda: self.show_error("Erro ao carregar o modelo."))
-                self.root.after(0, self.reset_ui)
+            if not self.backend.load_model(model_name, fast_cpu=self.fast_cpu_var.get()):
+                self.events.call(self.show_error, "Erro ao carregar o modelo.")
+                self.events.call(self.reset_ui)
                 return
             
             # Definir idioma
             language = None if self.language_var.get() == "auto" else self.language_var.get()
             
             # Atualizar status
-            self.root.after(0, lambda: self.status_var.set("Transcrevendo áudio..."))
-            self.root.after(0, lambda: self.configure_progress_bar_determinate())
+            self.events.call(self.status_var.set, "Transcrevendo áudio...")
+            self.events.call(self.configure_progress_bar_determinate)
             
             # Transcrever áudio
-            result = self.backend.transcribe(file_path, language, start_from_scratch=True)
+            result = self.backend.transcribe(file_path, language, start_from_scratch=True, vad=self.vad_var.get())
             
             # Verificar se a transcrição foi interrompida
             if self.backend.stop_transcription:
-                self.root.after(0, lambda: self.status_var.set("Transcrição interrompida"))
-                self.root.after(0, self.reset_ui)
+                self.events.call(self.status_var.set, "Transcrição interrompida")
+                self.events.call(self.reset_ui)
+                return
+            
+            # Erro já publicado pelo backend
+            if result is None:
                 return
             
             # Atualizar UI com resultado final
             self.transcription = result
-            self.root.after(0, self.update_transcription_complete)
+            self.transcription_segments = list(self.backend.last_segments)
+            self.events.call(self.update_transcription_complete)
+            self.events.call(self.show_vad_report)
             
         except Exception as e:
-            self.root.after(0, lambda: self.show_error(f"Erro na transcrição: {str(e)}"))
+            self.events.call(self.show_error, f"Erro na transcrição: {str(e)}")
         finally:
-            self.root.after(0, self.reset_ui)
+            self.events.call(self.reset_ui)
     
     def continue_transcription(self):
         """Continua a transcrição de onde parou"""
@@ -346,11 +580,15 @@ class TranscritorFrontend:
         
         # Atualizar estado
         self.transcription_paused = False
-        self.backend.stop_transcription = False
+        
+        # O backend reenvia os segmentos do checkpoint, então o texto parcial recomeça
+        self.partial_transcription = []
+        self.events.discard("segments")
         
         # Atualizar interface
         self.status_var.set("Continuando transcrição...")
         self.transcribe_button.configure(state="disabled")
+        self.pause_button.configure(text="Pausar", state="normal")
         
         # Iniciar transcrição em uma thread separada
         self.transcription_thread = threading.Thread(target=self._continue_thread, args=(self.current_file_path,))
@@ -362,44 +600,65 @@ class TranscritorFrontend:
         try:
             # Carregar modelo se necessário
             model_name = self.model_var.get()
-            if not self.backend.model or self.backend.model_name != model_name:
-                self.root.after(0, lambda: self.status_var.set(f"Carregando modelo {model_name}..."))
-                self.root.after(0, lambda: self.show_model_info(model_name))
+            fast_cpu = self.fast_cpu_var.get()
+            if not self.backend.model or self.backend.model_name != model_name or self.backend.fast_cpu != fast_cpu:
+                self.events.call(self.status_var.set, f"Carregando modelo {model_name}...")
+                self.events.call(self.show_model_info, model_name)
                 
-                if not self.backend.load_model(model_name):
-                    self.root.after(0, lambda: self.show_error("Erro ao carregar o modelo."))
-                    self.root.after(0, self.reset_ui)
+                if not self.backend.load_model(model_name, fast_cpu=fast_cpu):
+                    self.events.call(self.show_error, "Erro ao carregar o modelo.")
+                    self.events.call(self.reset_ui)
                     return
             
             # Definir idioma
             language = None if self.language_var.get() == "auto" else self.language_var.get()
             
             # Atualizar status
-            self.root.after(0, lambda: self.status_var.set("Continuando transcrição..."))
-            self.root.after(0, lambda: self.configure_progress_bar_determinate())
+            self.events.call(self.status_var.set, "Continuando transcrição...")
+            self.events.call(self.configure_progress_bar_determinate)
             
             # Transcrever áudio (continuando de onde parou)
-            result = self.backend.transcribe(file_path, language, start_from_scratch=False)
+            result = self.backend.transcribe(file_path, language, start_from_scratch=False, vad=self.vad_var.get())
             
             # Verificar se a transcrição foi interrompida
             if self.backend.stop_transcription:
-                self.root.after(0, lambda: self.status_var.set("Transcrição interrompida"))
-                self.root.after(0, self.reset_ui)
+                self.events.call(self.status_var.set, "Transcrição interrompida")
+                self.events.call(self.reset_ui)
+                return
+            
+            # Erro já publicado pelo backend
+            if result is None:
                 return
             
             # Atualizar UI com resultado final
             self.transcription = result
-            self.root.after(0, self.update_transcription_complete)
+            self.transcription_segments = list(self.backend.last_segments)
+            self.events.call(self.update_transcription_complete)
+            self.events.call(self.show_vad_report)
             
         except Exception as e:
-            self.root.after(0, lambda: self.show_error(f"Erro na transcrição: {str(e)}"))
+            self.events.call(self.show_error, f"Erro na transcrição: {str(e)}")
         finally:
-            self.root.after(0, self.reset_ui)
+            self.events.call(self.reset_ui)
+    
+    def toggle_pause(self):
+        """Pausa ou retoma a transcrição em andamento sem perder o progresso"""
+        if self.backend.paused:
+            self.backend.resume()
+            self.pause_button.configure(text="Pausar")
+            self.status_var.set("Transcrevendo áudio...")
+        else:
+            self.backend.pause()
+            self.pause_button.configure(text="Retomar")
+            self.status_var.set("Transcrição pausada")
     
     def stop_transcription(self):
         """Para a transcrição em andamento"""
         # Parar o backend
         self.backend.stop()
+        self.pause_button.configure(text="Pausar", state="disabled")
+        if self.batch_queue:
+            self.batch_queue.stop()
         
         # Marcar como pausado
         self.transcription_paused = True
@@ -424,6 +683,7 @@ class TranscritorFrontend:
     def reset_ui(self):
         """Reseta a interface após uma transcrição"""
         self.transcribe_button.configure(text="Transcrever Áudio", state="normal")
+        self.pause_button.configure(text="Pausar", state="disabled")
         
         if self.transcription_paused and self.partial_transcription:
             # Se pausado e com transcrição parcial, mostrar botão continuar
@@ -471,6 +731,18 @@ class TranscritorFrontend:
            self.status_var.get().startswith("Modelo"):
             self.status_var.set("Transcrevendo áudio...")
     
+    def show_language_detection(self, detection):
+        """Mostra o idioma detectado antes da transcrição e avisa quando a detecção é incerta"""
+        self.status_var.set(f"Transcrevendo áudio em {detection.language} ({detection.probability:.0%})...")
+        if detection.low_confidence:
+            others = ", ".join(f"{language} {probability:.0%}" for language, probability
+                               in detection.probabilities.items())
+            messagebox.showwarning(
+                "Idioma incerto",
+                f"O idioma detectado ({detection.language}) tem pouca confiança: {others}.\n\n"
+                "Se estiver errado, pare a transcrição e escolha o idioma na lista."
+            )
+    
     def show_model_info(self, model_name):
         """Mostra informações sobre o modelo que será baixado"""
         try:
@@ -557,13 +829,14 @@ class TranscritorFrontend:
             self.transcription_text.insert("0.0", f"Modelo {model_name} carregado com sucesso.\n\nIniciando transcrição do áudio...")
             self.transcription_text.configure(state="disabled")
     
-    def update_partial_transcription(self, text):
-        """Atualiza a UI com a transcrição parcial"""
+    def update_partial_transcription(self, segments):
+        """Acrescenta ao final da caixa de texto os segmentos novos recebidos do backend"""
+        if not segments:
+            return
+        
         self.is_downloading = False
         self.is_transcribing = True
         
-        self.partial_transcription = text
-        
         # Atualizar o status para mostrar que está transcrevendo
         if self.status_var.get().startswith("Baixando modelo") or \
            self.status_var.get() == "Carregando modelo...":
@@ -571,8 +844,14 @@ class TranscritorFrontend:
         
         # Habilitar temporariamente para edição
         self.transcription_text.configure(state="normal")
-        self.transcription_text.delete("0.0", "end")
-        self.transcription_text.insert("0.0", text)
+        text = "".join(segment.text for segment in segments)
+        if not self.partial_transcription:
+            # Primeiro texto: remover a mensagem de carregamento do modelo
+            self.transcription_text.delete("0.0", "end")
+            text = text.lstrip()
+        self.partial_transcription.append(text)
+        # Só o texto novo é inserido; o que já está na tela não é redesenhado
+        self.transcription_text.insert("end", text)
         # Voltar para somente leitura
         self.transcription_text.configure(state="disabled")
         # Rolar para o final
@@ -596,32 +875,127 @@ class TranscritorFrontend:
         self.progress_bar.set(1.0)  # 100%
         self.progress_percent_label.configure(text="100%")
     
+    def show_vad_report(self):
+        """Mostra quanto do áudio foi pulado pela detecção de voz"""
+        report = self.backend.last_vad_report
+        if report:
+            self.status_var.set(
+                f"Transcrição concluída - {report.skipped_duration:.0f}s sem voz pulados "
+                f"({report.skipped_ratio:.0%} do áudio)"
+            )
+    
     def save_results(self):
         """Salva os resultados da transcrição em um arquivo"""
         if not self.transcription and not self.partial_transcription:
             messagebox.showerror("Erro", "Não há transcrição para salvar.")
             return
         
-        text_to_save = self.transcription if self.transcription else self.partial_transcription
+        # Transcrição interrompida: salvar os segmentos já recebidos
+        segments = self.transcription_segments if self.transcription else list(self.backend.last_segments)
+        
+        # Sugerir o mesmo arquivo onde este resultado foi salvo da última vez
+        if self.saved_path:
+            initialdir, initialfile = os.path.split(self.saved_path)
+        else:
+            initialdir, initialfile = None, f"transcrição_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         file_path = filedialog.asksaveasfilename(
             title="Salvar Transcrição",
             defaultextension=".txt",
-            filetypes=[("Arquivo de Texto", "*.txt"), ("Todos os arquivos", "*.*")],
-            initialfile=f"transcrição_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            filetypes=SAVE_FILETYPES,
+            initialdir=initialdir,
+            initialfile=initialfile
         )
         
         if not file_path:
             return
         
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(text_to_save)
+            export_segments(file_path, segments)
+            
+            self.saved_path = file_path
+            if self.transcription:
+                self.backend.remember_saved_path(file_path)
             
             messagebox.showinfo("Sucesso", f"Transcrição salva em {file_path}")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar arquivo: {str(e)}")
     
+    def toggle_stats_panel(self):
+        """Abre ou fecha o painel de desempenho"""
+        if not self.stats_var.get():
+            self.close_stats_panel()
+            return
+        if self.stats_window is not None:
+            return
+        
+        self.stats_window = ctk.CTkToplevel(self.root)
+        self.stats_window.title("Desempenho")
+        self.stats_window.geometry("560x420")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.close_stats_panel)
+        
+        self.stats_text = ctk.CTkTextbox(self.stats_window, wrap="none", font=ctk.CTkFont(family="Courier", size=12))
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        button_frame = ctk.CTkFrame(self.stats_window)
+        button_frame.pack(pady=(5, 10))
+        ctk.CTkButton(button_frame, text="Exportar Trace", command=self.export_trace).grid(row=0, column=0, padx=5)
+        ctk.CTkButton(button_frame, text="Zerar", command=self.reset_stats).grid(row=0, column=1, padx=5)
+        
+        self.update_stats_panel()
+    
+    def close_stats_panel(self):
+        """Fecha o painel de desempenho"""
+        if self.stats_after_id is not None:
+            self.root.after_cancel(self.stats_after_id)
+            self.stats_after_id = None
+        if self.stats_window is not None:
+            self.stats_window.destroy()
+            self.stats_window = None
+        self.stats_var.set(False)
+    
+    def update_stats_panel(self):
+        """Mostra o resumo do tracer e agenda a próxima atualização enquanto o painel estiver aberto"""
+        self.stats_after_id = None
+        if self.stats_window is None:
+            return
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert("1.0", get_tracer().report())
+        self.stats_after_id = self.root.after(STATS_INTERVAL_MS, self.update_stats_panel)
+    
+    def reset_stats(self):
+        """Descarta as medições acumuladas"""
+        get_tracer().reset()
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert("1.0", get_tracer().report())
+    
+    def export_trace(self):
+        """Salva os trechos medidos no formato do chrome://tracing (e Perfetto)"""
+        file_path = filedialog.asksaveasfilename(
+            title="Exportar Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("Todos os arquivos", "*.*")],
+            initialfile=f"falamemo_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        if not file_path:
+            return
+        try:
+            get_tracer().export(file_path)
+            messagebox.showinfo("Sucesso", f"Trace salvo em {file_path}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao salvar trace: {str(e)}")
+    
+    def on_closing(self):
+        """Para o trabalho em andamento e solta as threads presas na fila de eventos antes de fechar"""
+        if self.is_transcribing:
+            self.backend.stop()
+        if self.batch_queue:
+            self.batch_queue.stop()
+        self.preloader.cancel()
+        self.event_pump.stop()
+        self.events.close()
+        self.root.destroy()
+    
     def show_error(self, message):
         """Exibe uma mensagem de erro"""
         messagebox.showerror("Erro", message)
@@ -0,0 +1,126 @@
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from transcritor_vad import SAMPLE_RATE, detect_speech
+from transcritor_result_cache import get_result_cache
+
+# Janelas de 30 s amostradas ao longo do arquivo
+DEFAULT_SAMPLE_WINDOWS = 3
+WINDOW_SECONDS = 30
+
+# Trecho em volta de cada ponto de amostragem onde a janela com voz é procurada
+SEARCH_SECONDS = 120
+
+# Probabilidade abaixo da qual a detecção é sinalizada antes da transcrição
+LOW_CONFIDENCE = 0.6
+
+# Arquivos recentes da mesma pasta, todos no mesmo idioma e com boa confiança,
+# para os próximos arquivos da pasta dispensarem a detecção
+DIRECTORY_MIN_FILES = 3
+DIRECTORY_RECENT_FILES = 10
+
+TOP_LANGUAGES = 5
+
+
+@dataclass
+class LanguageDetection:
+    """Idioma detectado, com as probabilidades dos mais prováveis"""
+    language: str
+    probability: float
+    probabilities: dict = field(default_factory=dict)
+    windows: int = 0
+    source: str = "audio"  # "audio", "cache" (mesmo arquivo) ou "directory" (outros arquivos da pasta)
+
+    @property
+    def low_confidence(self):
+        return self.probability < LOW_CONFIDENCE
+
+    def to_dict(self):
+        """Converte a detecção em um dicionário serializável"""
+        return {
+            "language": self.language,
+            "probability": round(self.probability, 4),
+            "probabilities": {language: round(p, 4) for language, p in self.probabilities.items()},
+            "windows": self.windows,
+            "source": self.source,
+            "low_confidence": self.low_confidence,
+        }
+
+
+def sample_windows(audio, count=DEFAULT_SAMPLE_WINDOWS, sample_rate=SAMPLE_RATE):
+    """Escolhe até count janelas de 30 s com voz, espalhadas pelo áudio; devolve (início, fim) em amostras
+
+    O áudio é dividido em count partes e, em volta do centro de cada uma,
+    a janela começa na primeira região com voz; só esses trechos passam
+    pelo detector de voz, não o arquivo inteiro.
+    """
+    total = len(audio)
+    window = WINDOW_SECONDS * sample_rate
+    if total <= window or count <= 1:
+        return [(0, min(total, window))]
+
+    search = SEARCH_SECONDS * sample_rate
+    windows = []
+    for index in range(count):
+        center = int(total * (2 * index + 1) / (2 * count))
+        start = max(0, min(total - search, center - search // 2))
+        regions = detect_speech(np.asarray(audio[start:start + search]), sample_rate)
+        if regions:
+            start += regions[0][0]
+        start = max(0, min(total - window, start))
+        # Áudios curtos: janelas sobrepostas repetiriam a mesma detecção
+        if windows and start < windows[-1][1]:
+            continue
+        windows.append((start, start + window))
+    return windows
+
+
+def combine_probabilities(results):
+    """Média das probabilidades de cada janela"""
+    totals = {}
+    for probabilities in results:
+        for language, probability in probabilities.items():
+            totals[language] = totals.get(language, 0.0) + probability / len(results)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    language, probability = ranked[0]
+    return LanguageDetection(language, probability, dict(ranked[:TOP_LANGUAGES]), windows=len(results))
+
+
+def detect_in_windows(engine, audio, count=DEFAULT_SAMPLE_WINDOWS):
+    """Detecta o idioma em várias janelas do áudio com o motor carregado"""
+    results = []
+    for start, end in sample_windows(audio, count):
+        _, probabilities = engine.detect_language(np.asarray(audio[start:end]))
+        results.append(probabilities)
+    return combine_probabilities(results)
+
+
+def cached_detection(audio_hash, model_name, directory=None):
+    """Detecção já feita para o arquivo (mesmo modelo) ou, na falta dela, o idioma da pasta"""
+    cache = get_result_cache()
+    data = cache.get_language(audio_hash, model_name)
+    if data:
+        return LanguageDetection(data["language"], data["probability"], data["probabilities"],
+                                 windows=data["windows"], source="cache")
+
+    if directory:
+        recent = cache.directory_languages(directory, DIRECTORY_RECENT_FILES)
+        languages = {language for language, _ in recent}
+        if len(recent) >= DIRECTORY_MIN_FILES and len(languages) == 1:
+            probability = min(probability for _, probability in recent)
+            if probability >= LOW_CONFIDENCE:
+                language = languages.pop()
+                return LanguageDetection(language, probability, {language: probability}, source="directory")
+    return None
+
+
+def store_detection(audio_hash, model_name, file_path, detection):
+    """Guarda uma detecção feita no áudio (as vindas do cache ou da pasta não são regravadas)"""
+    if detection.source != "audio":
+        return
+    get_result_cache().put_language(
+        audio_hash, model_name, os.path.dirname(os.path.abspath(file_path)), detection.language,
+        detection.probability, detection.probabilities, detection.windows,
+    )
@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Orçamento padrão de memória para modelos carregados (em MB)
+DEFAULT_BUDGET_MB = 4096
+
+_model_cache = None
+_model_cache_lock = threading.Lock()
+
+
+def model_memory_bytes(model):
+    """Estima a memória ocupada pelos pesos de um modelo"""
+    # Modelos que informam o próprio tamanho (CTranslate2, pesos int8 empacotados)
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if tensor.is_sparse:
+            continue
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelCache:
+    def __init__(self, max_bytes=None):
+        """Cache de modelos carregados com descarte do menos usado (LRU)"""
+        if max_bytes is None:
+            budget_mb = int(os.environ.get("FALAMEMO_MODEL_CACHE_MB", DEFAULT_BUDGET_MB))
+            max_bytes = budget_mb * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()  # chave -> (modelo, bytes)
+        self._loading = {}  # chave -> threading.Event
+        self._lock = threading.Lock()
+
+    def get(self, name, device="cpu", dtype="float32", loader=None):
+        """Retorna o modelo da chave (nome, dispositivo, dtype), carregando se necessário"""
+        key = (name, device, dtype)
+
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+                if loader is None:
+                    return None
+
+                pending = self._loading.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._loading[key] = threading.Event()
+
+            if owner:
+                break
+
+            # Outra thread já está carregando este modelo: esperar por ela
+            pending.wait()
+
+        try:
+            model = loader()
+            with self._lock:
+                self._models[key] = (model, model_memory_bytes(model))
+                self._models.move_to_end(key)
+                self._evict()
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+    def contains(self, name, device="cpu", dtype="float32"):
+        """Indica se o modelo já está em memória"""
+        with self._lock:
+            return (name, device, dtype) in self._models
+
+    def is_loading(self, name, device="cpu", dtype="float32"):
+        """Indica se o modelo está sendo carregado por alguma thread"""
+        with self._lock:
+            return (name, device, dtype) in self._loading
+
+    def remove(self, name, device="cpu", dtype="float32"):
+        """Remove um modelo do cache"""
+        with self._lock:
+            return self._models.pop((name, device, dtype), None) is not None
+
+    def clear(self):
+        """Remove todos os modelos do cache"""
+        with self._lock:
+            self._models.clear()
+
+    def set_budget(self, max_bytes):
+        """Altera o orçamento de memória e descarta o excedente"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def used_bytes(self):
+        """Memória estimada ocupada pelos modelos em cache"""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def keys(self):
+        """Chaves em ordem do menos para o mais recentemente usado"""
+        with self._lock:
+            return list(self._models.keys())
+
+    def _evict(self):
+        """Descarta os modelos menos usados até caber no orçamento (chamar com o lock)"""
+        used = sum(size for _, size in self._models.values())
+        # O modelo mais recente sempre fica, mesmo que sozinho exceda o orçamento
+        while used > self.max_bytes and len(self._models) > 1:
+            key, (_, size) = self._models.popitem(last=False)
+            used -= size
+            print(f"Modelo {key[0]} ({key[1]}, {key[2]}) removido do cache de modelos")
+
+
+def get_model_cache():
+    """Retorna o cache de modelos compartilhado pelo processo"""
+    global _model_cache
+    with _model_cache_lock:
+        if _model_cache is None:
+            _model_cache = ModelCache()
+        return _model_cache
@@ -0,0 +1,261 @@
+import os
+import json
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Mesmo diretório usado pelo whisper.load_model, para reaproveitar modelos já baixados
+DEFAULT_MODEL_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "whisper"
+)
+
+VERIFIED_FILE_NAME = "verificados.json"
+PARTIAL_SUFFIX = ".part"
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+_model_store = None
+_model_store_lock = threading.Lock()
+
+
+def whisper_model_urls():
+    """URLs oficiais dos modelos do openai-whisper (nome -> URL)"""
+    import whisper
+    return dict(whisper._MODELS)
+
+
+def expected_sha256(url):
+    """O SHA-256 esperado faz parte da URL dos modelos oficiais"""
+    return url.split("/")[-2]
+
+
+class ModelStore:
+    def __init__(self, model_dir=None, mirror=None, urls=None):
+        """Diretório local dos modelos: download com progresso real, retomada e verificação
+
+        mirror pode ser uma URL base (http/https) ou uma pasta local com os
+        arquivos .pt; ele é consultado antes das URLs oficiais.
+        """
+        self.model_dir = model_dir or os.environ.get("FALAMEMO_MODEL_DIR", DEFAULT_MODEL_DIR)
+        self.mirror = mirror if mirror is not None else os.environ.get("FALAMEMO_MODEL_MIRROR")
+        self._urls = urls
+        self.verified_path = os.path.join(self.model_dir, VERIFIED_FILE_NAME)
+        self._lock = threading.Lock()
+        self._download_locks = {}
+
+    @property
+    def urls(self):
+        if self._urls is None:
+            self._urls = whisper_model_urls()
+        return self._urls
+
+    def is_known(self, model_name):
+        """Indica se o modelo tem URL conhecida (os demais são caminhos de arquivo)"""
+        return model_name in self.urls
+
+    def path_for(self, model_name):
+        """Caminho local do arquivo do modelo"""
+        return os.path.join(self.model_dir, os.path.basename(self.urls[model_name]))
+
+    def _load_verified(self):
+        """Lê o registro de arquivos já verificados (chamar com o lock)"""
+        try:
+            with open(self.verified_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record_verified(self, path, sha256):
+        """Registra que o arquivo, com este tamanho e data, tem o hash esperado"""
+        stat = os.stat(path)
+        with self._lock:
+            verified = self._load_verified()
+            verified[os.path.basename(path)] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256,
+            }
+            os.makedirs(self.model_dir, exist_ok=True)
+            temp_path = f"{self.verified_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(verified, f, indent=2)
+            os.replace(temp_path, self.verified_path)
+
+    def _is_recorded(self, path, sha256):
+        """Verdadeiro se o arquivo já foi verificado e não mudou desde então"""
+        with self._lock:
+            entry = self._load_verified().get(os.path.basename(path))
+        if not entry or entry["sha256"] != sha256:
+            return False
+        stat = os.stat(path)
+        return entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def verify(self, path, sha256):
+        """Confere o SHA-256 do arquivo, calculando-o só na primeira vez"""
+        if not os.path.isfile(path):
+            return False
+        if self._is_recorded(path, sha256):
+            return True
+        print(f"Verificando integridade de {os.path.basename(path)}...")
+        if _file_sha256(path) != sha256:
+            return False
+        self._record_verified(path, sha256)
+        return True
+
+    def is_available(self, model_name):
+        """Indica se o modelo já está no diretório local e íntegro"""
+        url = self.urls[model_name]
+        return self.verify(self.path_for(model_name), expected_sha256(url))
+
+    def ensure(self, model_name, progress=None):
+        """Garante o modelo no diretório local e devolve o caminho do arquivo
+
+        progress(baixados, total) é chamado com a contagem real de bytes.
+        """
+        url = self.urls[model_name]
+        sha256 = expected_sha256(url)
+        path = self.path_for(model_name)
+
+        with self._lock:
+            download_lock = self._download_locks.setdefault(model_name, threading.Lock())
+        with download_lock:
+            if self.verify(path, sha256):
+                return path
+
+            sources = []
+            if self.mirror:
+                sources.append(self._mirror_source(os.path.basename(url)))
+            sources.append(url)
+
+            errors = []
+            for source in sources:
+                try:
+                    self._fetch(source, path, sha256, progress)
+                    return path
+                except (OSError, RuntimeError, http.client.HTTPException) as e:
+                    print(f"Falha ao obter {model_name} de {source}: {e}")
+                    errors.append(str(e))
+            raise RuntimeError(f"Não foi possível obter o modelo {model_name}: {'; '.join(errors)}")
+
+    def _mirror_source(self, file_name):
+        """URL ou caminho do arquivo no espelho configurado"""
+        if urllib.parse.urlparse(self.mirror).scheme in ("http", "https", "file"):
+            return self.mirror.rstrip("/") + "/" + file_name
+        return os.path.join(self.mirror, file_name)
+
+    def _fetch(self, source, path, sha256, progress):
+        """Baixa (ou copia) para um arquivo .part, confere o hash e move para o lugar final"""
+        os.makedirs(self.model_dir, exist_ok=True)
+        partial_path = path + PARTIAL_SUFFIX
+
+        if os.path.isfile(source):
+            _copy_with_progress(source, partial_path, progress)
+        else:
+            download(source, partial_path, progress)
+
+        if _file_sha256(partial_path) != sha256:
+            os.remove(partial_path)
+            raise RuntimeError("o SHA-256 do arquivo não confere")
+        os.replace(partial_path, path)
+        self._record_verified(path, sha256)
+
+    def import_directory(self, directory, progress=None):
+        """Pré-carrega os modelos encontrados em uma pasta local; devolve os nomes importados"""
+        imported = []
+        for model_name, url in self.urls.items():
+            source = os.path.join(directory, os.path.basename(url))
+            if not os.path.isfile(source):
+                continue
+            path = self.path_for(model_name)
+            sha256 = expected_sha256(url)
+            if not self.verify(path, sha256):
+                try:
+                    self._fetch(source, path, sha256, progress)
+                except RuntimeError as e:
+                    print(f"Ignorando {source}: {e}")
+                    continue
+            imported.append(model_name)
+        return imported
+
+    def status(self):
+        """Lista (nome, caminho, baixado) dos modelos conhecidos, sem recalcular hashes"""
+        result = []
+        for model_name in self.urls:
+            path = self.path_for(model_name)
+            recorded = os.path.isfile(path) and self._is_recorded(path, expected_sha256(self.urls[model_name]))
+            result.append((model_name, path, recorded))
+        return result
+
+
+def download(url, path, progress=None, timeout=DOWNLOAD_TIMEOUT):
+    """Baixa url para path, continuando de onde parou se path já existir em parte"""
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        # 416: o arquivo parcial já está completo
+        if e.code == 416 and offset:
+            return
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            # O servidor não aceita retomada: começar do zero
+            offset = 0
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length else None
+
+        done = offset
+        with open(path, "ab" if offset else "wb") as f:
+            if progress:
+                progress(done, total)
+            while True:
+                block = response.read(DOWNLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+                done += len(block)
+                if progress:
+                    progress(done, total)
+
+    if total is not None and done < total:
+        raise RuntimeError(f"download incompleto ({done} de {total} bytes)")
+
+
+def _copy_with_progress(source, path, progress=None):
+    """Copia um arquivo local informando o progresso em bytes"""
+    total = os.path.getsize(source)
+    done = 0
+    with open(source, "rb") as src, open(path, "wb") as dst:
+        while True:
+            block = src.read(DOWNLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            dst.write(block)
+            done += len(block)
+            if progress:
+                progress(done, total)
+
+
+def _file_sha256(path):
+    """SHA-256 de um arquivo lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_model_store():
+    """Retorna o diretório de modelos compartilhado pelo processo"""
+    global _model_store
+    with _model_store_lock:
+        if _model_store is None:
+            _model_store = ModelStore()
+        return _model_store
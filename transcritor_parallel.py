@@ -0,0 +1,254 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from transcritor_audio import get_audio_cache, open_pcm
+from transcritor_batch import DEFAULT_MAX_WAIT, get_encoder_batcher
+from transcritor_decoder import Segment
+from transcritor_engines import create_engine
+from transcritor_language import cached_detection, detect_in_windows, store_detection
+from transcritor_queue import init_worker, worker_backend
+from transcritor_vad import SAMPLE_RATE, frame_features
+
+# Threads do PyTorch por processo: acima disso o ganho por thread cai muito na CPU
+DEFAULT_THREADS_PER_WORKER = 4
+
+# Trechos menores que isso não compensam o contexto perdido na emenda
+MIN_CHUNK_SECONDS = 120
+
+# Áudio extra decodificado em cada lado da emenda, descartado na junção
+OVERLAP_SECONDS = 2.0
+
+# Distância máxima, em segundos, para procurar um silêncio perto de cada corte
+SEARCH_SECONDS = 15.0
+
+
+def find_silence_cuts(audio, n_chunks, sample_rate=SAMPLE_RATE, search_seconds=SEARCH_SECONDS):
+    """Escolhe pontos de corte em amostras, cada um no quadro mais silencioso perto do alvo"""
+    if n_chunks <= 1:
+        return []
+
+    frame_size = int(sample_rate * 0.03)
+    energy_db, _ = frame_features(audio, frame_size)
+    search_frames = int(search_seconds * sample_rate / frame_size)
+    chunk_frames = len(energy_db) / n_chunks
+
+    cuts = []
+    for index in range(1, n_chunks):
+        target = int(index * chunk_frames)
+        first = max(0, target - search_frames)
+        last = min(len(energy_db), target + search_frames)
+        quietest = first + int(np.argmin(energy_db[first:last]))
+        cuts.append(quietest * frame_size)
+    return sorted(set(cuts))
+
+
+def plan_chunks(total_samples, cuts, sample_rate=SAMPLE_RATE, overlap=OVERLAP_SECONDS):
+    """Monta os trechos (início, fim, início_útil, fim_útil) em amostras"""
+    overlap_samples = int(overlap * sample_rate)
+    bounds = [0] + list(cuts) + [total_samples]
+    chunks = []
+    for core_start, core_end in zip(bounds[:-1], bounds[1:]):
+        start = max(0, core_start - overlap_samples)
+        end = min(total_samples, core_end + overlap_samples)
+        chunks.append((start, end, core_start, core_end))
+    return chunks
+
+
+def _detect_language_job(pcm_path):
+    """Detecta o idioma em janelas espalhadas pelo áudio dentro de um processo de trabalho"""
+    return detect_in_windows(worker_backend().engine, open_pcm(pcm_path))
+
+
+def _transcribe_chunk_job(pcm_path, start, end, language, options):
+    """Transcreve um trecho dentro de um processo de trabalho
+
+    Cada processo abre o mesmo PCM do cache de áudio, então o trecho não
+    precisa ser copiado entre processos.
+    """
+    engine = worker_backend().engine
+    audio = open_pcm(pcm_path)[start:end]
+    segments = []
+    for window in engine.transcribe_stream(audio, language=language, **options):
+        segments.extend(segment.to_dict() for segment in window.segments)
+    return segments
+
+
+def _transcribe_chunk_group_job(pcm_path, chunks, language, options, batch_wait=DEFAULT_MAX_WAIT):
+    """Transcreve vários trechos juntos em um processo de trabalho, com o codificador em lote
+
+    Cada trecho roda em uma thread com o mesmo modelo; as janelas de 30 s
+    dos trechos passam juntas pelo codificador. Devolve os segmentos de cada
+    trecho, na ordem de chunks.
+    """
+    if len(chunks) == 1:
+        return [_transcribe_chunk_job(pcm_path, chunks[0][0], chunks[0][1], language, options)]
+
+    backend = worker_backend()
+    if backend.engine.supports_batching:
+        options = dict(options, encoder=get_encoder_batcher(backend.model, len(chunks), batch_wait))
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [executor.submit(_transcribe_chunk_job, pcm_path, start, end, language, options)
+                   for start, end in chunks]
+        return [future.result() for future in futures]
+
+
+def stitch_segments(results, sample_rate=SAMPLE_RATE):
+    """Junta os segmentos dos trechos, removendo os duplicados da sobreposição
+
+    results é uma lista de ((início, fim, início_útil, fim_útil), segmentos).
+    Cada segmento fica no trecho cuja parte útil contém o seu ponto médio.
+    """
+    merged = []
+    for (start, _, core_start, core_end), segments in sorted(results, key=lambda item: item[0][0]):
+        offset = start / sample_rate
+        core_start /= sample_rate
+        core_end /= sample_rate
+        for data in segments:
+            segment = Segment.from_dict(data)
+            segment.start = round(segment.start + offset, 3)
+            segment.end = round(segment.end + offset, 3)
+            middle = (segment.start + segment.end) / 2
+            if core_start <= middle < core_end:
+                merged.append(segment)
+
+    for index, segment in enumerate(merged):
+        segment.id = index
+    return merged
+
+
+class ParallelTranscriber:
+    def __init__(self, model_name="base", workers=None, threads_per_worker=DEFAULT_THREADS_PER_WORKER,
+                 min_chunk_seconds=MIN_CHUNK_SECONDS, engine=None, fast_cpu=False, batch_size=1,
+                 batch_wait=DEFAULT_MAX_WAIT):
+        """Transcreve um arquivo longo dividindo-o em trechos processados em paralelo
+
+        Cada processo carrega o próprio modelo uma única vez e o mantém entre
+        arquivos, então o mesmo objeto pode ser reaproveitado em vários arquivos.
+        Com batch_size > 1, cada processo recebe até batch_size trechos de uma
+        vez e roda o codificador em lote com as janelas deles.
+        """
+        self.model_name = model_name
+        self.engine = engine
+        self.fast_cpu = fast_cpu
+        self.threads_per_worker = max(1, threads_per_worker)
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.workers = workers
+        self.min_chunk_seconds = min_chunk_seconds
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.progress_callback = None
+        self.language_detected_callback = None
+        self.last_duration = 0.0
+        self.last_language_detection = None
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def set_callbacks(self, progress=None, language_detected=None):
+        """Define os callbacks de progresso (fração do áudio concluída) e de idioma detectado
+
+        language_detected(detection) é chamado antes de os trechos serem
+        enviados; uma exceção nele interrompe o arquivo sem transcrever nada.
+        """
+        self.progress_callback = progress
+        self.language_detected_callback = language_detected
+
+    def _get_executor(self):
+        """Cria o pool de processos na primeira utilização"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=(self.model_name, self.threads_per_worker, self.engine, self.fast_cpu),
+            )
+        return self._executor
+
+    def transcribe(self, file_path, language=None, low_memory=False, **options):
+        """Transcreve o arquivo e retorna a lista de segmentos em ordem
+
+        Com low_memory=True, cada trecho calcula o mel por janela (só no motor
+        whisper), então a memória de cada processo não cresce com o trecho.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError("O arquivo selecionado não existe.")
+        if low_memory:
+            engine = create_engine(self.engine, self.fast_cpu)
+            if engine.supports_low_memory:
+                options = dict(options, low_memory=True)
+            else:
+                print(f"O motor {engine.name} não tem modo de memória limitada; usando o modo normal")
+
+        started = time.monotonic()
+        pcm_path = get_audio_cache().decode(file_path)
+        audio = open_pcm(pcm_path)
+        self.last_duration = len(audio) / SAMPLE_RATE
+
+        n_chunks = int(min(self.workers * self.batch_size, max(1, self.last_duration // self.min_chunk_seconds)))
+        chunks = plan_chunks(len(audio), find_silence_cuts(audio, n_chunks))
+        print(f"Transcrição paralela: {len(chunks)} trechos em {self.workers} processos")
+
+        executor = self._get_executor()
+
+        # Detectar o idioma uma única vez para todos os trechos usarem o mesmo
+        if language is None:
+            audio_hash = get_audio_cache().file_hash(file_path)
+            detection = cached_detection(audio_hash, self.model_name, os.path.dirname(os.path.abspath(file_path)))
+            if detection is None:
+                detection = executor.submit(_detect_language_job, pcm_path).result()
+                store_detection(audio_hash, self.model_name, file_path, detection)
+            self.last_language_detection = detection
+            language = detection.language
+            print(f"Idioma detectado: {language} ({detection.probability:.0%})")
+            if self.language_detected_callback:
+                self.language_detected_callback(detection)
+
+        # Trechos maiores primeiro, para o último processo não ficar sozinho no final
+        order = sorted(chunks, key=lambda chunk: chunk[1] - chunk[0], reverse=True)
+        if self.batch_size > 1:
+            # Um grupo por processo, com trechos de tamanhos parecidos no mesmo lote
+            groups = [order[index:index + self.batch_size] for index in range(0, len(order), self.batch_size)]
+        else:
+            groups = [[chunk] for chunk in order]
+        futures = {
+            executor.submit(_transcribe_chunk_group_job, pcm_path, [chunk[:2] for chunk in group], language,
+                            options, self.batch_wait): group
+            for group in groups
+        }
+
+        results = []
+        done_samples = 0
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group = futures[future]
+                    for chunk, segments in zip(group, future.result()):
+                        results.append((chunk, segments))
+                        done_samples += chunk[3] - chunk[2]
+                    if self.progress_callback:
+                        self.progress_callback(min(0.99, done_samples / max(1, len(audio))))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        segments = stitch_segments(results)
+        elapsed = time.monotonic() - started
+        print(f"Transcrição paralela concluída em {elapsed:.1f}s "
+              f"(fator de tempo real {elapsed / max(self.last_duration, 1e-6):.3f})")
+        return segments
+
+    def close(self):
+        """Encerra os processos de trabalho"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
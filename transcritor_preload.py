@@ -0,0 +1,86 @@
+import threading
+
+
+class ModelPreloader:
+    def __init__(self, backend, on_ready=None):
+        """Carrega em segundo plano o modelo escolhido, antes do clique em Transcrever
+
+        Só o pedido mais recente importa: pedidos feitos durante uma carga
+        substituem o anterior ainda não iniciado, um pedido igual ao que está
+        carregando é ignorado e um modelo que termina de carregar depois de a
+        escolha mudar é liberado da memória (se não estava no cache antes).
+        on_ready(model_name) é chamado (na thread de carga) quando o modelo
+        escolhido fica pronto.
+        """
+        self.backend = backend
+        self.on_ready = on_ready
+        self._lock = threading.Lock()
+        self._wanted = None    # (modelo, motor, fast_cpu) escolhido por último
+        self._pending = None   # próximo pedido a carregar
+        self._current = None   # pedido sendo carregado
+        self._thread = None
+
+    def request(self, model_name, engine=None, fast_cpu=False):
+        """Pede a carga antecipada do modelo; um pedido igual ao que está carregando não faz nada
+
+        Um modelo que já está no cache de modelos volta na hora, sem nova carga.
+        """
+        key = (model_name, engine, fast_cpu)
+        with self._lock:
+            self._wanted = key
+            if key == self._current:
+                self._pending = None
+                return
+            self._pending = key
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def cancel(self):
+        """Desiste do pedido atual
+
+        O cancelamento é atendido até o início da carga. A leitura dos pesos
+        não pode ser interrompida no meio: uma carga já iniciada termina e o
+        modelo é liberado logo em seguida, se foi ela que o colocou no cache
+        de modelos.
+        """
+        with self._lock:
+            self._wanted = None
+            self._pending = None
+
+    def _is_stale(self, key):
+        with self._lock:
+            return key != self._wanted
+
+    def _run(self):
+        """Carrega os pedidos pendentes, um por vez, até a fila esvaziar"""
+        while True:
+            with self._lock:
+                key = self._pending
+                self._pending = None
+                self._current = key
+                if key is None:
+                    self._thread = None
+                    return
+
+            model_name, engine_name, fast_cpu = key
+            engine = None
+            try:
+                engine = self.backend.preload_model(model_name, engine_name, fast_cpu,
+                                                    cancelled=lambda: self._is_stale(key))
+            except Exception as e:
+                # Falhas aparecem de novo, com a mensagem para o usuário, no load_model do clique
+                print(f"Carga antecipada de {model_name} falhou: {e}")
+
+            with self._lock:
+                self._current = None
+                stale = key != self._wanted
+
+            if engine is None:
+                continue
+            if stale:
+                self.backend.release_preloaded(engine)
+            else:
+                print(f"Modelo {model_name} pronto (carregado em segundo plano)")
+                if self.on_ready:
+                    self.on_ready(model_name)
@@ -0,0 +1,382 @@
+import os
+import glob
+import json
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from transcritor_backend import TranscritorBackend
+from transcritor_batch import DEFAULT_MAX_WAIT
+from transcritor_decoder import TranscriptionCancelled
+from transcritor_engines import DEFAULT_ENGINE
+from transcritor_cpu import configure_threads
+from transcritor_export import Exporter, format_for_path
+
+# Estados possíveis de cada arquivo da fila
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".m4a", ".ogg", ".opus", ".aac", ".wma", ".mp4", ".webm")
+
+STATE_FILE_NAME = "falamemo_fila.json"
+
+# Backend do processo de trabalho (um modelo por processo)
+_worker_backend = None
+
+
+def collect_audio_files(source, extensions=AUDIO_EXTENSIONS):
+    """Lista os arquivos de áudio de uma pasta ou de um padrão glob"""
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(extensions)
+        ]
+    else:
+        paths = [
+            path for path in glob.glob(source, recursive=True)
+            if os.path.isfile(path) and path.lower().endswith(extensions)
+        ]
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+def source_root(source):
+    """Pasta base de uma pasta ou padrão glob (o trecho do caminho antes do primeiro curinga)"""
+    if os.path.isdir(source):
+        return os.path.abspath(source)
+    root = os.path.dirname(source)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return os.path.abspath(root or ".")
+
+
+def init_worker(model_name, threads=None, engine=None, fast_cpu=False):
+    """Inicializa um processo de trabalho carregando seu próprio modelo"""
+    global _worker_backend
+
+    if threads:
+        configure_threads(threads)
+
+    _worker_backend = TranscritorBackend()
+    if not _worker_backend.load_model(model_name, engine=engine, fast_cpu=fast_cpu):
+        raise RuntimeError(f"Erro ao carregar modelo {model_name}")
+
+
+def worker_backend():
+    """Backend carregado por init_worker no processo de trabalho atual"""
+    return _worker_backend
+
+
+def transcribe_to_file(backend, file_path, output_path, language=None, vad=False, low_memory=None):
+    """Transcreve um arquivo e grava o texto, devolvendo as métricas da execução"""
+    started = time.monotonic()
+    # Segmentos gravados em <saída>.part à medida que chegam e renomeados no fim,
+    # para nunca deixar um arquivo de saída pela metade.
+    # resume=True continua um arquivo interrompido por uma queda a partir do checkpoint
+    segments = 0
+    with Exporter({format_for_path(output_path): output_path}) as exporter:
+        for segment in backend.transcribe_iter(file_path, language=language, resume=True, vad=vad,
+                                               low_memory=low_memory):
+            exporter.write([segment])
+            segments += 1
+
+    elapsed = time.monotonic() - started
+    duration = backend.last_duration
+    return {
+        "elapsed": round(elapsed, 3),
+        "duration": round(duration, 3),
+        "rtf": round(elapsed / duration, 4) if duration else None,
+        "segments": segments,
+    }
+
+
+def _run_worker_job(file_path, output_path, language, vad, low_memory=None):
+    """Executa um job dentro de um processo de trabalho"""
+    return transcribe_to_file(_worker_backend, file_path, output_path, language, vad, low_memory)
+
+
+class BatchQueue:
+    def __init__(self, source, model_name="base", language=None, workers=1,
+                 output_dir=None, state_path=None, retry_failed=False, vad=False, engine=None, fast_cpu=False,
+                 low_memory=None, batch_size=1, batch_wait=DEFAULT_MAX_WAIT):
+        """Inicializa uma fila de transcrição para uma pasta ou padrão glob
+
+        Com workers=1 e batch_size > 1, até batch_size arquivos são
+        transcritos juntos no processo atual, com o codificador em lote.
+        """
+        self.source = source
+        self.model_name = model_name
+        self.engine = engine or DEFAULT_ENGINE
+        self.fast_cpu = fast_cpu
+        self.language = language
+        self.workers = max(1, int(workers))
+        self.retry_failed = retry_failed
+        self.vad = vad
+        # None: automático pela duração de cada arquivo (ver TranscritorBackend.transcribe_iter)
+        self.low_memory = low_memory
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.stop_requested = False
+        self.job_update_callback = None
+        self._lock = threading.Lock()
+
+        self.source_root = source_root(source)
+        if output_dir is None:
+            output_dir = self.source_root
+        self.output_dir = os.path.abspath(output_dir)
+        self.state_path = state_path or os.path.join(self.output_dir, STATE_FILE_NAME)
+
+        self.jobs = {}
+
+    def set_callbacks(self, job_update=None):
+        """Define o callback chamado a cada mudança de estado de um job"""
+        self.job_update_callback = job_update
+
+    def load_state(self):
+        """Carrega o estado salvo e adiciona arquivos novos à fila"""
+        saved = {}
+        same_settings = True
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                saved = data.get("jobs", {})
+                # Transcrições feitas com outro modelo, motor, idioma, VAD ou modo rápido não valem para esta
+                # execução (estados antigos não gravavam os dois últimos: valiam desligados)
+                same_settings = (data.get("model") == self.model_name and data.get("language") == self.language
+                                 and data.get("engine", DEFAULT_ENGINE) == self.engine
+                                 and data.get("vad", False) == bool(self.vad)
+                                 and data.get("fast_cpu", False) == bool(self.fast_cpu))
+            except (OSError, ValueError) as e:
+                print(f"Estado da fila ilegível, recomeçando: {e}")
+        if saved and not same_settings:
+            print("Configuração diferente da execução anterior: os arquivos concluídos serão transcritos de novo")
+
+        self.jobs = {}
+        taken = set()
+        for file_path in collect_audio_files(self.source):
+            job = saved.get(file_path)
+            if job and os.path.normcase(job["output"]) in taken:
+                # Estado antigo com duas entradas gravando no mesmo arquivo
+                job = None
+            if job is None:
+                job = {
+                    "path": file_path,
+                    "status": JOB_QUEUED,
+                    "output": self._output_path(file_path, taken),
+                    "elapsed": None,
+                    "rtf": None,
+                    "error": None,
+                }
+            taken.add(os.path.normcase(job["output"]))
+
+            # Jobs interrompidos por uma queda voltam para a fila
+            if job["status"] == JOB_RUNNING:
+                job["status"] = JOB_QUEUED
+            elif job["status"] == JOB_DONE and (not same_settings or not os.path.exists(job["output"])):
+                job["status"] = JOB_QUEUED
+            elif job["status"] == JOB_FAILED and self.retry_failed:
+                job["status"] = JOB_QUEUED
+
+            self.jobs[file_path] = job
+
+        self.save_state()
+        return self.jobs
+
+    def save_state(self):
+        """Salva o estado da fila em disco de forma atômica"""
+        with self._lock:
+            data = {
+                "source": self.source,
+                "model": self.model_name,
+                "engine": self.engine,
+                "language": self.language,
+                "vad": bool(self.vad),
+                "fast_cpu": bool(self.fast_cpu),
+                "updated": time.time(),
+                "jobs": self.jobs,
+            }
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.state_path)
+
+    def pending_jobs(self):
+        """Retorna os caminhos dos arquivos ainda não transcritos"""
+        return [path for path, job in self.jobs.items() if job["status"] == JOB_QUEUED]
+
+    def summary(self):
+        """Conta os jobs por estado"""
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+    def run(self, backend=None):
+        """Processa todos os jobs pendentes e retorna o resumo final"""
+        if not self.jobs:
+            self.load_state()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        pending = self.pending_jobs()
+        if not pending:
+            return self.summary()
+
+        if self.workers == 1:
+            self._run_in_process(pending, backend)
+        else:
+            self._run_in_pool(pending)
+
+        return self.summary()
+
+    def stop(self):
+        """Pede para a fila não iniciar novos jobs"""
+        self.stop_requested = True
+
+    def _run_in_process(self, pending, backend):
+        """Processa a fila no processo atual, compartilhando um único modelo"""
+        if backend is None:
+            backend = TranscritorBackend()
+        if (not backend.model or backend.model_name != self.model_name or backend.engine_name != self.engine
+                or backend.fast_cpu != self.fast_cpu):
+            if not backend.load_model(self.model_name, engine=self.engine, fast_cpu=self.fast_cpu):
+                raise RuntimeError(f"Erro ao carregar modelo {self.model_name}")
+
+        backend.reset_cancellation()
+        if self.batch_size > 1:
+            self._run_batched(pending, backend)
+            return
+
+        for file_path in pending:
+            if self.stop_requested or backend.stop_transcription:
+                break
+            self._update_job(file_path, status=JOB_RUNNING)
+            try:
+                metrics = transcribe_to_file(backend, file_path, self.jobs[file_path]["output"],
+                                             self.language, self.vad, self.low_memory)
+                self._update_job(file_path, status=JOB_DONE, error=None,
+                                 elapsed=metrics["elapsed"], rtf=metrics["rtf"])
+            except TranscriptionCancelled:
+                # Job interrompido volta para a fila e será retomado pelo checkpoint
+                self._update_job(file_path, status=JOB_QUEUED)
+                break
+            except Exception as e:
+                self._update_job(file_path, status=JOB_FAILED, error=str(e))
+
+    def _run_batched(self, pending, backend):
+        """Processa vários arquivos ao mesmo tempo em threads, com o codificador em lote
+
+        Cada thread tem seu backend com o mesmo modelo do cache de modelos e
+        o token de cancelamento do backend principal, então stop e pause
+        valem para todos os arquivos em andamento.
+        """
+        local = threading.local()
+
+        def run_job(file_path):
+            worker = getattr(local, "backend", None)
+            if worker is None:
+                worker = local.backend = TranscritorBackend()
+                if not worker.load_model(self.model_name, engine=self.engine, fast_cpu=self.fast_cpu):
+                    raise RuntimeError(f"Erro ao carregar modelo {self.model_name}")
+                worker.set_batching(self.batch_size, self.batch_wait)
+            worker.cancel_token = backend.cancel_token
+            return transcribe_to_file(worker, file_path, self.jobs[file_path]["output"],
+                                      self.language, self.vad, self.low_memory)
+
+        remaining = iter(pending)
+        with ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix="falamemo-lote") as executor:
+            running = {}
+
+            def submit_next():
+                if self.stop_requested or backend.stop_transcription:
+                    return False
+                file_path = next(remaining, None)
+                if file_path is None:
+                    return False
+                running[executor.submit(run_job, file_path)] = file_path
+                self._update_job(file_path, status=JOB_RUNNING)
+                return True
+
+            for _ in range(self.batch_size):
+                if not submit_next():
+                    break
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = running.pop(future)
+                    try:
+                        metrics = future.result()
+                        self._update_job(file_path, status=JOB_DONE, error=None,
+                                         elapsed=metrics["elapsed"], rtf=metrics["rtf"])
+                    except TranscriptionCancelled:
+                        # Retomado pelo checkpoint na próxima execução
+                        self._update_job(file_path, status=JOB_QUEUED)
+                    except Exception as e:
+                        self._update_job(file_path, status=JOB_FAILED, error=str(e))
+                    submit_next()
+
+    def _run_in_pool(self, pending):
+        """Processa a fila com vários processos, cada um com seu próprio modelo"""
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        remaining = iter(pending)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                 initargs=(self.model_name, threads, self.engine, self.fast_cpu)) as executor:
+            running = {}
+
+            def submit_next():
+                file_path = next(remaining, None)
+                if file_path is None or self.stop_requested:
+                    return False
+                future = executor.submit(_run_worker_job, file_path, self.jobs[file_path]["output"],
+                                         self.language, self.vad, self.low_memory)
+                running[future] = file_path
+                self._update_job(file_path, status=JOB_RUNNING)
+                return True
+
+            # Só envia um job por processo livre, para que o estado salvo reflita a realidade
+            for _ in range(self.workers):
+                if not submit_next():
+                    break
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = running.pop(future)
+                    try:
+                        metrics = future.result()
+                        self._update_job(file_path, status=JOB_DONE, error=None,
+                                         elapsed=metrics["elapsed"], rtf=metrics["rtf"])
+                    except Exception as e:
+                        self._update_job(file_path, status=JOB_FAILED, error=str(e))
+                    submit_next()
+
+    def _update_job(self, file_path, **changes):
+        """Atualiza um job, persiste o estado e notifica o callback"""
+        job = self.jobs[file_path]
+        job.update(changes)
+        self.save_state()
+        if self.job_update_callback:
+            self.job_update_callback(dict(job), self.summary())
+
+    def _output_path(self, file_path, taken=()):
+        """Caminho do arquivo de texto gerado para um áudio
+
+        Mantém as subpastas em relação à pasta base da origem, então
+        a/aula.mp3 e b/aula.wav não gravam no mesmo arquivo; a mesma base com
+        extensões diferentes na mesma pasta ganha a extensão no nome.
+        """
+        relative = os.path.relpath(file_path, self.source_root)
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(file_path)
+        base, extension = os.path.splitext(relative)
+        output = os.path.join(self.output_dir, base + ".txt")
+        if os.path.normcase(output) in taken:
+            output = os.path.join(self.output_dir, f"{base}_{extension.lstrip('.').lower()}.txt")
+        counter = 2
+        while os.path.normcase(output) in taken:
+            output = os.path.join(self.output_dir, f"{base}_{counter}.txt")
+            counter += 1
+        return output
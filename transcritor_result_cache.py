@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+from dataclasses import dataclass
+
+from transcritor_decoder import Segment
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), ".falamemo", "resultados.sqlite3")
+
+# Orçamento padrão do cache de resultados (em MB)
+DEFAULT_BUDGET_MB = 512
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+@dataclass
+class CachedResult:
+    """Transcrição encontrada no cache de resultados"""
+    key: str
+    segments: list
+    language: str
+    duration: float = 0.0
+    saved_path: str = None
+
+    @property
+    def text(self):
+        return "".join(segment.text for segment in self.segments).strip()
+
+
+def result_key(audio_hash, model_name, language, options=None):
+    """Chave do resultado: hash do áudio + modelo + idioma + opções de decodificação"""
+    data = [audio_hash, model_name, language or "auto", options or {}]
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=None, max_bytes=None):
+        """Cache em SQLite das transcrições já concluídas"""
+        self.path = path or os.environ.get("FALAMEMO_RESULT_CACHE", DEFAULT_DB_PATH)
+        if max_bytes is None:
+            budget_mb = int(os.environ.get("FALAMEMO_RESULT_CACHE_MB", DEFAULT_BUDGET_MB))
+            max_bytes = budget_mb * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Abre uma transação em uma conexão própria, para poder ser usado de qualquer thread"""
+        connection = self._open()
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _open(self):
+        """Abre a conexão e cria a tabela na primeira vez"""
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    audio_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    detected_language TEXT,
+                    duration REAL NOT NULL DEFAULT 0,
+                    segments TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    saved_path TEXT,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS results_audio ON results (audio_hash)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            # Idiomas detectados por arquivo (hash + modelo), consultados também por pasta
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS languages (
+                    audio_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    directory TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    probability REAL NOT NULL,
+                    probabilities TEXT NOT NULL,
+                    windows INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (audio_hash, model)
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS languages_directory ON languages (directory, created)")
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def get(self, audio_hash, model_name, language, options=None):
+        """Retorna o resultado salvo ou None"""
+        key = result_key(audio_hash, model_name, language, options)
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT segments, detected_language, duration, saved_path FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+
+        segments = [Segment.from_dict(data) for data in json.loads(row[0])]
+        return CachedResult(key=key, segments=segments, language=row[1], duration=row[2], saved_path=row[3])
+
+    def put(self, audio_hash, model_name, language, options, segments, detected_language=None, duration=0.0):
+        """Salva um resultado completo e descarta os mais antigos se passar do orçamento"""
+        key = result_key(audio_hash, model_name, language, options)
+        payload = json.dumps([segment.to_dict() for segment in segments], ensure_ascii=False)
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                """INSERT OR REPLACE INTO results
+                   (key, audio_hash, model, language, options, detected_language, duration, segments, size,
+                    saved_path, created, accessed)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?,
+                           (SELECT saved_path FROM results WHERE key = ?), ?, ?)""",
+                (key, audio_hash, model_name, language or "auto", json.dumps(options or {}, sort_keys=True),
+                 detected_language, duration, payload, len(payload.encode("utf-8")), key, now, now),
+            )
+        self.evict()
+        return key
+
+    def get_language(self, audio_hash, model_name):
+        """Idioma detectado antes para este áudio com este modelo, ou None"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT language, probability, probabilities, windows FROM languages WHERE audio_hash = ? AND model = ?",
+                (audio_hash, model_name),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"language": row[0], "probability": row[1], "probabilities": json.loads(row[2]), "windows": row[3]}
+
+    def put_language(self, audio_hash, model_name, directory, language, probability, probabilities, windows):
+        """Salva o idioma detectado para um áudio"""
+        with self._connect() as connection:
+            connection.execute(
+                """INSERT OR REPLACE INTO languages
+                   (audio_hash, model, directory, language, probability, probabilities, windows, created)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (audio_hash, model_name, directory, language, probability, json.dumps(probabilities),
+                 windows, time.time()),
+            )
+
+    def directory_languages(self, directory, limit):
+        """(idioma, probabilidade) das detecções mais recentes de arquivos da pasta"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT language, probability FROM languages WHERE directory = ? ORDER BY created DESC LIMIT ?",
+                (directory, limit),
+            ).fetchall()
+
+    def set_saved_path(self, key, saved_path):
+        """Lembra onde o usuário salvou a transcrição deste resultado"""
+        with self._connect() as connection:
+            connection.execute("UPDATE results SET saved_path = ? WHERE key = ?", (saved_path, key))
+
+    def invalidate(self, audio_hash=None, model_name=None, key=None):
+        """Remove resultados por chave, por áudio e/ou por modelo; retorna quantos saíram"""
+        clauses, params = [], []
+        if key is not None:
+            clauses.append("key = ?")
+            params.append(key)
+        if audio_hash is not None:
+            clauses.append("audio_hash = ?")
+            params.append(audio_hash)
+        if model_name is not None:
+            clauses.append("model = ?")
+            params.append(model_name)
+        if not clauses:
+            return 0
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM results WHERE " + " AND ".join(clauses), params).rowcount
+
+    def clear(self):
+        """Remove todos os resultados e idiomas detectados"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM results")
+            connection.execute("DELETE FROM languages")
+        with self._connect() as connection:
+            connection.execute("VACUUM")
+
+    def stats(self):
+        """Quantidade de resultados e tamanho ocupado"""
+        with self._connect() as connection:
+            count, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def evict(self):
+        """Descarta os resultados acessados há mais tempo até caber no orçamento"""
+        with self._connect() as connection:
+            used = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if used <= self.max_bytes:
+                return
+            for key, size in connection.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+                if used <= self.max_bytes:
+                    break
+                connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                used -= size
+
+
+def get_result_cache():
+    """Retorna o cache de resultados compartilhado pelo processo"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -0,0 +1,535 @@
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+from contextlib import nullcontext
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transcritor_backend import TranscritorBackend
+from transcritor_decoder import CancellationToken, TranscriptionCancelled
+from transcritor_batch import DEFAULT_MAX_WAIT, using_model
+from transcritor_engines import DEFAULT_ENGINE, ENGINES
+from transcritor_cpu import configure_threads, physical_cores
+from transcritor_model_cache import get_model_cache
+from transcritor_parallel import DEFAULT_THREADS_PER_WORKER
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MODEL = "base"
+
+# Estados de um job do servidor
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Jobs concluídos mantidos em memória para consulta; os mais antigos saem primeiro
+MAX_FINISHED_JOBS = 200
+
+# Tamanho máximo de um envio de áudio (em MB)
+DEFAULT_MAX_UPLOAD_MB = 2048
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Intervalo do comentário enviado nos fluxos parados, para proxies não fecharem a conexão
+KEEPALIVE_SECONDS = 15
+
+def default_workers(threads_per_job):
+    """Jobs simultâneos para ocupar os núcleos físicos sem disputa"""
+    return max(1, physical_cores() // threads_per_job)
+
+
+class ServerJob:
+    def __init__(self, file_path, model_name, language=None, vad=False, engine=None, fast_cpu=False,
+                 upload=False):
+        """Um pedido de transcrição e o histórico de eventos enviado aos clientes"""
+        self.id = uuid.uuid4().hex[:12]
+        self.file_path = file_path
+        self.model_name = model_name
+        self.language = language
+        self.vad = vad
+        self.engine = engine or DEFAULT_ENGINE
+        self.fast_cpu = fast_cpu
+        self.upload = upload
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.detected_language = None
+        self.duration = 0.0
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_token = CancellationToken()
+        # Eventos (tipo, dados) na ordem; cada cliente lê a partir de um índice
+        self.events = []
+        self.segments = []
+        self._condition = threading.Condition()
+
+    @property
+    def finished_state(self):
+        return self.status in FINISHED_STATES
+
+    def publish(self, kind, data):
+        """Acrescenta um evento e acorda os clientes conectados"""
+        with self._condition:
+            self.events.append((kind, data))
+            self._condition.notify_all()
+
+    def wait_events(self, index, timeout):
+        """Eventos a partir de index; espera até timeout se ainda não houver nenhum novo"""
+        with self._condition:
+            if index >= len(self.events) and not self.finished_state:
+                self._condition.wait(timeout)
+            return self.events[index:], self.finished_state
+
+    def to_dict(self, text=False):
+        """Estado do job para GET /jobs/{id}"""
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "file": None if self.upload else self.file_path,
+            "model": self.model_name,
+            "engine": self.engine,
+            "language": self.language or "auto",
+            "detected_language": self.detected_language,
+            "progress": round(self.progress, 4),
+            "duration": round(self.duration, 3),
+            "segments": len(self.segments),
+            "error": self.error,
+            "created": round(self.created, 3),
+            "started": self.started and round(self.started, 3),
+            "finished": self.finished and round(self.finished, 3),
+        }
+        if self.started and self.finished and self.duration:
+            data["rtf"] = round((self.finished - self.started) / self.duration, 4)
+        if text and self.status == JOB_DONE:
+            data["text"] = "".join(segment.text for segment in self.segments).strip()
+        return data
+
+
+class JobManager:
+    def __init__(self, workers=None, threads_per_job=None, default_model=DEFAULT_MODEL, engine=None,
+                 fast_cpu=False, upload_dir=None, batch_size=1, batch_wait=DEFAULT_MAX_WAIT):
+        """Fila de jobs atendida por threads de trabalho, cada uma com seu backend
+
+        Os modelos vêm do cache de modelos do processo, então continuam
+        carregados entre pedidos e são compartilhados pelas threads.
+        Sem agrupamento, jobs do mesmo modelo esperam a vez inteira; com
+        batch_size > 1, rodam juntos, o codificador processa as janelas
+        deles em lote e só cada passada do decodificador espera a vez.
+        """
+        self.threads_per_job = threads_per_job or DEFAULT_THREADS_PER_WORKER
+        self.workers = workers or default_workers(self.threads_per_job)
+        self.default_model = default_model
+        self.engine = engine or DEFAULT_ENGINE
+        self.fast_cpu = fast_cpu
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.upload_dir = upload_dir or os.path.join(tempfile.gettempdir(), "falamemo_uploads")
+        self.jobs = {}
+        self._finished = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        """Ajusta as threads do PyTorch e inicia as threads de trabalho"""
+        configure_threads(self.threads_per_job)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"falamemo-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Servidor com {self.workers} jobs simultâneos de {self.threads_per_job} threads")
+        if self.batch_size > 1:
+            print(f"Codificador em lotes de até {self.batch_size} janelas (espera máxima {self.batch_wait:g}s)")
+
+    def stop(self):
+        """Cancela os jobs em andamento e encerra as threads de trabalho"""
+        self._stopping = True
+        for job in list(self.jobs.values()):
+            self.cancel(job.id)
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def preload(self, model_name):
+        """Carrega um modelo no cache antes do primeiro pedido"""
+        if not TranscritorBackend().load_model(model_name, engine=self.engine, fast_cpu=self.fast_cpu):
+            raise RuntimeError(f"Erro ao carregar modelo {model_name}")
+
+    def submit(self, file_path, model_name=None, language=None, vad=False, engine=None, fast_cpu=None,
+               upload=False):
+        """Enfileira um job e devolve o ServerJob criado (motor e fast_cpu padrão do servidor)"""
+        job = ServerJob(file_path, model_name or self.default_model, language, vad, engine or self.engine,
+                        self.fast_cpu if fast_cpu is None else fast_cpu, upload)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """Cancela um job na fila ou em andamento; devolve o job ou None"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_token.cancel()
+        # Na fila: termina aqui e é descartado pela thread de trabalho quando sair da fila.
+        # Já em andamento: o token interrompe a transcrição e a thread de trabalho o encerra.
+        self._finish(job, JOB_CANCELLED, only_from=JOB_QUEUED)
+        return job
+
+    def stats(self):
+        """Resumo para GET /health"""
+        counts = {}
+        for job in self.list():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "threads_per_job": self.threads_per_job,
+            "batch_size": self.batch_size,
+            "queued": self._queue.qsize(),
+            "jobs": counts,
+            "models": [name for name, _, _ in get_model_cache().keys()],
+        }
+
+    def _worker(self):
+        backend = TranscritorBackend()
+        backend.set_batching(self.batch_size, self.batch_wait)
+        while True:
+            job = self._queue.get()
+            if job is None or self._stopping:
+                return
+            if job.finished_state:
+                continue
+            try:
+                self._run(backend, job)
+            except TranscriptionCancelled:
+                self._finish(job, JOB_CANCELLED)
+            except Exception as e:
+                print(f"Erro no job {job.id}: {e}")
+                if not job.finished_state:
+                    job.error = str(e)
+                    self._finish(job, JOB_FAILED)
+
+    def _run(self, backend, job):
+        """Transcreve um job com o backend da thread, publicando cada segmento"""
+        # Um cancelamento pode ter encerrado o job depois de ele sair da fila
+        with self._lock:
+            if job.finished_state:
+                return
+            job.status = JOB_RUNNING
+            job.started = time.time()
+        job.publish("status", {"status": JOB_RUNNING})
+
+        errors = []
+        backend.set_callbacks(error=errors.append)
+        if (backend.model is None or backend.model_name != job.model_name or backend.engine_name != job.engine
+                or backend.fast_cpu != job.fast_cpu):
+            # Modelo já usado por outro pedido: sai do cache de modelos, sem nova carga
+            if not backend.load_model(job.model_name, engine=job.engine, fast_cpu=job.fast_cpu):
+                raise RuntimeError(errors[-1] if errors else f"Erro ao carregar modelo {job.model_name}")
+
+        def report_progress(progress):
+            job.progress = progress
+            job.publish("progress", {"progress": round(progress, 4)})
+
+        def report_language(detection):
+            job.detected_language = detection.language
+            job.publish("language", detection.to_dict())
+
+        backend.set_callbacks(transcription_progress=report_progress, language_detected=report_language)
+
+        # Sem agrupamento, esperar a vez no modelo inteiro (sem deixar de atender um cancelamento)
+        with using_model(backend.model, job.cancel_token) if self.batch_size == 1 else nullcontext():
+            for segment in backend.transcribe_iter(job.file_path, language=job.language, vad=job.vad,
+                                                   checkpoint=False, cancel_token=job.cancel_token):
+                # Um resultado do cache sai sem passar pelo modelo, que é quem confere o token
+                job.cancel_token.check()
+                job.segments.append(segment)
+                job.publish("segment", segment.to_dict())
+            job.duration = backend.last_duration
+            job.progress = 1.0
+            self._finish(job, JOB_DONE)
+
+    def _finish(self, job, status, only_from=None):
+        """Marca o fim de um job, apaga o áudio enviado e limita o histórico
+
+        Com only_from, só encerra o job que ainda estiver nesse estado.
+        """
+        # Cancelamento (thread da conexão) e fim do job (thread de trabalho) podem chegar juntos
+        with self._lock:
+            if job.finished_state or (only_from is not None and job.status != only_from):
+                return
+            job.finished = time.time()
+            job.status = status
+        # O áudio enviado sai antes do evento final: quem recebe o fim não encontra mais o arquivo
+        if job.upload:
+            shutil.rmtree(os.path.dirname(job.file_path), ignore_errors=True)
+        job.publish(status, job.to_dict())
+
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self._finished.pop(0), None)
+
+
+class RequestError(Exception):
+    """Erro do cliente, respondido com o código HTTP informado"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TranscriptionRequestHandler(BaseHTTPRequestHandler):
+    """API HTTP sobre o JobManager do servidor
+
+    POST   /jobs                 cria um job: JSON {"path": ...} ou o próprio áudio no corpo
+    GET    /jobs                 lista os jobs
+    GET    /jobs/{id}            estado (com o texto quando concluído)
+    GET    /jobs/{id}/events     eventos em Server-Sent Events (segmentos, progresso, idioma, fim)
+    GET    /jobs/{id}/segments   segmentos em linhas JSON, com resposta chunked
+    DELETE /jobs/{id}            cancela
+    GET    /health               threads, fila e modelos carregados
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "FalaMemo"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if parts == ["health"] and method == "GET":
+                self._send_json(200, self.manager.stats())
+            elif parts == ["jobs"] and method == "GET":
+                self._send_json(200, {"jobs": [job.to_dict() for job in self.manager.list()]})
+            elif parts == ["jobs"] and method == "POST":
+                job = self._create_job(query)
+                self._send_json(202, job.to_dict(), headers={"Location": f"/jobs/{job.id}"})
+            elif len(parts) in (2, 3) and parts[0] == "jobs":
+                job = self.manager.get(parts[1])
+                if job is None:
+                    raise RequestError(404, "Job não encontrado")
+                action = parts[2] if len(parts) == 3 else None
+                if action is None and method == "GET":
+                    self._send_json(200, job.to_dict(text=True))
+                elif action is None and method == "DELETE":
+                    self._send_json(200, self.manager.cancel(job.id).to_dict())
+                elif action == "events" and method == "GET":
+                    self._stream_events(job)
+                elif action == "segments" and method == "GET":
+                    self._stream_segments(job)
+                else:
+                    raise RequestError(405, "Método não permitido")
+            else:
+                raise RequestError(404, "Caminho não encontrado")
+        except RequestError as e:
+            # O corpo pode não ter sido lido: não reaproveitar a conexão
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desconectou no meio de um fluxo; o job continua
+            self.close_connection = True
+
+    def _create_job(self, query):
+        """Job a partir de um JSON com path (arquivo local do servidor) ou do áudio enviado no corpo"""
+        length = int(self.headers.get("Content-Length") or 0)
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type == "application/json":
+            try:
+                options = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                raise RequestError(400, "JSON inválido")
+            options = {**query, **options}
+            file_path = options.get("path")
+            if not file_path or not os.path.isfile(file_path):
+                raise RequestError(400, "Informe em path um arquivo existente no servidor")
+            upload = False
+        else:
+            options = query
+            file_path = self._receive_upload(length, options.get("filename"))
+            upload = True
+
+        engine = options.get("engine")
+        if engine and engine not in ENGINES:
+            raise RequestError(400, f"Motor desconhecido: {engine}")
+        language = options.get("language")
+        return self.manager.submit(
+            file_path,
+            model_name=options.get("model"),
+            language=None if language in (None, "", "auto") else language,
+            vad=_flag(options.get("vad")),
+            engine=engine,
+            fast_cpu=_flag(options["fast_cpu"]) if "fast_cpu" in options else None,
+            upload=upload,
+        )
+
+    def _receive_upload(self, length, filename=None):
+        """Grava o corpo da requisição em disco aos poucos, sem guardar o áudio em memória"""
+        if length <= 0:
+            raise RequestError(411, "Envie o áudio no corpo, com Content-Length")
+        if length > self.server.max_upload_bytes:
+            raise RequestError(413, "Arquivo maior que o limite do servidor")
+
+        directory = tempfile.mkdtemp(dir=self.manager.upload_dir)
+        path = os.path.join(directory, os.path.basename(filename or "") or "audio")
+        try:
+            with open(path, "wb") as f:
+                remaining = length
+                while remaining:
+                    chunk = self.rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise RequestError(400, "Envio incompleto")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return path
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _follow(self, job, write, keepalive=None):
+        """Envia os eventos do job desde o início e segue os novos até o job terminar"""
+        index = 0
+        while True:
+            events, finished = job.wait_events(index, KEEPALIVE_SECONDS)
+            index += len(events)
+            for kind, data in events:
+                write(kind, data)
+            if finished and not events:
+                return
+            if not events and keepalive:
+                keepalive()
+
+    def _stream_events(self, job):
+        """GET /jobs/{id}/events: Server-Sent Events com o tipo do evento e os dados em JSON"""
+        self._start_chunked("text/event-stream; charset=utf-8")
+        self._follow(
+            job,
+            lambda kind, data: self._write_chunk(f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"),
+            keepalive=lambda: self._write_chunk(": keepalive\n\n"),
+        )
+        self._end_chunked()
+
+    def _stream_segments(self, job):
+        """GET /jobs/{id}/segments: uma linha JSON por segmento, terminando com o estado final"""
+        self._start_chunked("application/x-ndjson; charset=utf-8")
+
+        def write(kind, data):
+            if kind == "segment":
+                self._write_chunk(json.dumps(data, ensure_ascii=False) + "\n")
+            elif kind in FINISHED_STATES:
+                self._write_chunk(json.dumps({"status": kind, "error": data.get("error")}, ensure_ascii=False) + "\n")
+
+        self._follow(job, write)
+        self._end_chunked()
+
+
+def _flag(value):
+    """Valor booleano vindo do JSON ou da query string"""
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "sim")
+    return bool(value)
+
+
+class TranscriptionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, manager, host=DEFAULT_HOST, port=DEFAULT_PORT, max_upload_mb=DEFAULT_MAX_UPLOAD_MB):
+        """Servidor HTTP local: cada conexão em uma thread, os jobs nas threads do manager"""
+        self.manager = manager
+        self.max_upload_bytes = max_upload_mb * 1024 * 1024
+        super().__init__((host, port), TranscriptionRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def _stop_on_sigterm(signum, frame):
+    """SIGTERM (systemd, docker stop) encerra como o Ctrl+C"""
+    raise KeyboardInterrupt
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, threads_per_job=None, model_name=DEFAULT_MODEL,
+          preload=(), engine=None, fast_cpu=False, max_upload_mb=DEFAULT_MAX_UPLOAD_MB, ready=None,
+          batch_size=1, batch_wait=DEFAULT_MAX_WAIT):
+    """Inicia o servidor e atende até Ctrl+C; ready(server) é chamado quando a porta está aberta"""
+    manager = JobManager(workers=workers, threads_per_job=threads_per_job, default_model=model_name,
+                         engine=engine, fast_cpu=fast_cpu, batch_size=batch_size, batch_wait=batch_wait)
+    manager.start()
+    for name in preload:
+        manager.preload(name)
+
+    server = TranscriptionServer(manager, host, port, max_upload_mb)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    print(f"FalaMemo atendendo em {server.url}")
+    if ready:
+        ready(server)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        manager.stop()
@@ -0,0 +1,399 @@
+import os
+import sys
+import time
+import stat
+import struct
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from transcritor_vad import SAMPLE_RATE
+from transcritor_decoder import Segment, CancellationToken
+from transcritor_trace import get_tracer
+from transcritor_language import combine_probabilities
+
+# Áudio mantido em memória (em segundos); o que passa disso é descartado e contado
+DEFAULT_BUFFER_SECONDS = 120
+
+# Janela máxima decodificada de uma vez (o contexto do Whisper)
+WINDOW_SECONDS = 30
+
+# Áudio novo que dispara uma nova decodificação da janela
+DEFAULT_STEP_SECONDS = 5
+
+# Segmentos que terminam a mais que isso do fim do áudio recebido viram definitivos
+STABLE_SECONDS = 3
+
+# Leitura da entrada: bloco máximo e intervalo entre verificações de um arquivo que cresce
+READ_CHUNK_BYTES = 64 * 1024
+POLL_SECONDS = 0.25
+
+# Arquivo parado por este tempo é considerado concluído
+DEFAULT_IDLE_TIMEOUT = 30
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class RingBuffer:
+    def __init__(self, seconds=DEFAULT_BUFFER_SECONDS, sample_rate=SAMPLE_RATE):
+        """Buffer circular de tamanho fixo com posições absolutas em amostras
+
+        end é o total de amostras já escritas; só as últimas capacity
+        amostras continuam disponíveis, então a memória não cresce com a
+        duração da sessão.
+        """
+        self.capacity = int(seconds * sample_rate)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.end = 0
+        self.closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def start(self):
+        """Primeira posição ainda disponível"""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples):
+        """Acrescenta amostras; as mais antigas são sobrescritas quando o buffer enche"""
+        samples = np.asarray(samples, dtype=np.float32)
+        with self._condition:
+            if self.closed or not len(samples):
+                return
+            if len(samples) > self.capacity:
+                self.end += len(samples) - self.capacity
+                samples = samples[-self.capacity:]
+            offset = self.end % self.capacity
+            first = min(len(samples), self.capacity - offset)
+            self._data[offset:offset + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.end += len(samples)
+            self._condition.notify_all()
+
+    def read(self, start, end):
+        """Cópia das amostras [start, end); start é ajustado se já tiver sido descartado"""
+        with self._condition:
+            start = max(start, self.start)
+            end = min(end, self.end)
+            if end <= start:
+                return start, np.zeros(0, dtype=np.float32)
+            first, last = start % self.capacity, end % self.capacity
+            if first < last or last == 0:
+                data = self._data[first:last or self.capacity].copy()
+            else:
+                data = np.concatenate((self._data[first:], self._data[:last]))
+            return start, data
+
+    def wait(self, position, timeout):
+        """Espera até haver áudio até position ou o buffer ser fechado; devolve end"""
+        with self._condition:
+            if self.end < position and not self.closed:
+                self._condition.wait(timeout)
+            return self.end
+
+    def close(self):
+        """Indica que não chegará mais áudio"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class PcmDecoder:
+    def __init__(self, sample_rate=SAMPLE_RATE, channels=1, sample_width=2):
+        """Converte blocos de PCM inteiro little-endian em float32 mono de 16 kHz
+
+        Os bytes de uma amostra incompleta ficam guardados para o próximo
+        bloco; outras taxas são convertidas por interpolação linear, com a
+        fase mantida entre os blocos.
+        """
+        if sample_width not in (2, 4):
+            raise ValueError(f"PCM de {sample_width * 8} bits não suportado; use 16 ou 32 bits")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._pending = b""
+        self._ratio = sample_rate / SAMPLE_RATE
+        self._previous = None
+        self._position = 0.0
+
+    def decode(self, data):
+        data = self._pending + data
+        frame = self.sample_width * self.channels
+        usable = len(data) - len(data) % frame
+        self._pending = data[usable:]
+        if not usable:
+            return np.zeros(0, dtype=np.float32)
+
+        dtype = "<i2" if self.sample_width == 2 else "<i4"
+        scale = 32768.0 if self.sample_width == 2 else 2147483648.0
+        samples = np.frombuffer(data[:usable], dtype=dtype).astype(np.float32) / scale
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        if self.sample_rate == SAMPLE_RATE:
+            return samples
+        return self._resample(samples)
+
+    def _resample(self, samples):
+        # A última amostra do bloco anterior entra como índice 0, para interpolar através da emenda
+        if self._previous is not None:
+            samples = np.concatenate(([self._previous], samples))
+        last = len(samples) - 1
+        positions = np.arange(self._position, last + 1e-9, self._ratio) if last > 0 else np.zeros(0)
+        output = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        next_position = (positions[-1] + self._ratio) if len(positions) else self._position
+        self._position = next_position - last
+        self._previous = samples[-1]
+        return output
+
+
+def read_wav_header(f, header=None):
+    """Lê o cabeçalho de um WAV PCM e deixa f no início dos dados
+
+    header são os 12 primeiros bytes, se já tiverem sido lidos (pipes).
+    Devolve (taxa, canais, bytes por amostra) ou None se o cabeçalho ainda
+    não foi todo gravado. O tamanho do chunk de dados é ignorado: gravadores
+    só o preenchem ao fechar o arquivo.
+    """
+    header = header if header is not None else f.read(12)
+    if len(header) < 12:
+        return None
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise ValueError("Arquivo não é um WAV")
+
+    audio_format = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"data":
+            if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+                raise ValueError("Só WAV PCM inteiro pode ser lido enquanto é gravado")
+            return sample_rate, channels, bits // 8
+        body = f.read(size + size % 2)
+        if len(body) < size:
+            return None
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack("<HHI", body[:8])
+            bits = struct.unpack("<H", body[14:16])[0]
+
+
+class LiveSource:
+    def __init__(self, path, sample_rate=SAMPLE_RATE, channels=1, sample_width=2,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Entrada de áudio ao vivo: "-" (PCM cru pela entrada padrão), pipe, ou arquivo que ainda cresce
+
+        Entradas começando com RIFF são lidas como WAV (formato do
+        cabeçalho); as demais, como PCM cru com sample_rate/channels/
+        sample_width informados.
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.idle_timeout = idle_timeout
+
+    @property
+    def name(self):
+        return "stdin" if self.path == "-" else self.path
+
+    def start(self, buffer, stop):
+        """Lê em uma thread própria até o fim da entrada ou stop ser sinalizado"""
+        thread = threading.Thread(target=self.run, args=(buffer, stop), name="falamemo-stream-reader", daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, buffer, stop):
+        try:
+            if self.path == "-":
+                self._read_pipe(sys.stdin.buffer, buffer, stop)
+            elif stat.S_ISFIFO(os.stat(self.path).st_mode):
+                with open(self.path, "rb") as f:
+                    self._read_pipe(f, buffer, stop)
+            else:
+                with open(self.path, "rb") as f:
+                    self._tail(f, buffer, stop)
+        except Exception as e:
+            print(f"Erro ao ler {self.name}: {e}")
+        finally:
+            buffer.close()
+
+    def _read_pipe(self, stream, buffer, stop):
+        # WAV pela entrada (ex.: ffmpeg -f wav -) ou PCM cru
+        first = stream.read(12)
+        if first[:4] == b"RIFF":
+            header = read_wav_header(stream, first)
+            if header is None:
+                return
+            decoder = PcmDecoder(*header)
+        else:
+            decoder = PcmDecoder(self.sample_rate, self.channels, self.sample_width)
+            buffer.write(decoder.decode(first))
+        read = getattr(stream, "read1", stream.read)
+        while not stop.is_set():
+            data = read(READ_CHUNK_BYTES)
+            if not data:
+                return
+            buffer.write(decoder.decode(data))
+
+    def _tail(self, f, buffer, stop):
+        decoder = None
+        idle_since = time.monotonic()
+        while not stop.is_set():
+            if decoder is None:
+                decoder = self._open_decoder(f)
+                if decoder is None:
+                    # Cabeçalho do WAV ainda incompleto
+                    if time.monotonic() - idle_since > self.idle_timeout:
+                        return
+                    time.sleep(POLL_SECONDS)
+                    continue
+
+            data = f.read(READ_CHUNK_BYTES)
+            if data:
+                buffer.write(decoder.decode(data))
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > self.idle_timeout:
+                return
+            else:
+                time.sleep(POLL_SECONDS)
+
+    def _open_decoder(self, f):
+        f.seek(0)
+        if f.read(4) != b"RIFF":
+            f.seek(0)
+            # Menos de 4 bytes ainda: esperar para saber o formato
+            if os.fstat(f.fileno()).st_size < 4:
+                return None
+            return PcmDecoder(self.sample_rate, self.channels, self.sample_width)
+        f.seek(0)
+        header = read_wav_header(f)
+        if header is None:
+            return None
+        return PcmDecoder(*header)
+
+
+@dataclass
+class StreamUpdate:
+    """Resultado de uma decodificação ao vivo
+
+    final traz os segmentos novos que não mudam mais; provisional, os
+    segmentos depois deles, que substituem os provisórios anteriores.
+    """
+    final: list = field(default_factory=list)
+    provisional: list = field(default_factory=list)
+    position: float = 0.0   # Segundos de áudio recebidos
+    lag: float = 0.0        # Áudio recebido que ainda não entrou na decodificação
+    dropped: float = 0.0    # Áudio descartado por o buffer encher antes de ser decodificado
+    done: bool = False
+
+
+class StreamingTranscriber:
+    def __init__(self, engine, language=None, step_seconds=DEFAULT_STEP_SECONDS,
+                 stable_seconds=STABLE_SECONDS, cancel_token=None, language_detected=None, **options):
+        """Decodifica janelas sobrepostas de um RingBuffer à medida que o áudio chega
+
+        A janela começa no fim do último segmento definitivo e vai até o fim
+        do áudio recebido (no máximo 30 s). Segmentos que terminam a mais de
+        stable_seconds do fim da janela viram definitivos; o resto é
+        reenviado como provisório na decodificação seguinte. Uma janela cheia
+        sempre torna algo definitivo, então o atraso fica limitado a cerca de
+        30 s mais o tempo de decodificação.
+        """
+        self.engine = engine
+        self.language = language
+        self.step = int(step_seconds * SAMPLE_RATE)
+        self.stable = int(stable_seconds * SAMPLE_RATE)
+        self.window = WINDOW_SECONDS * SAMPLE_RATE
+        self.cancel_token = cancel_token or CancellationToken()
+        self.language_detected = language_detected
+        self.options = options
+        self.next_id = 0
+
+    def run(self, buffer):
+        """Gera um StreamUpdate por decodificação, até o buffer ser fechado e esvaziado"""
+        committed = 0   # Fim do último segmento definitivo (amostras)
+        decoded = 0     # Fim da última janela decodificada
+        dropped = 0
+
+        while True:
+            self.cancel_token.check()
+            available = buffer.wait(decoded + self.step, POLL_SECONDS)
+            closed = buffer.closed
+            backlog = available - committed >= self.window
+            if available - decoded < self.step and not closed and not backlog:
+                continue
+
+            if buffer.start > committed:
+                # Decodificação mais lenta que o áudio: o trecho que saiu do buffer foi perdido
+                dropped += buffer.start - committed
+                print(f"Buffer cheio: {(buffer.start - committed) / SAMPLE_RATE:.1f}s de áudio descartados")
+                committed = buffer.start
+
+            window_end = min(available, committed + self.window)
+            start, audio = buffer.read(committed, window_end)
+            finishing = closed and window_end == available
+            segments = self._decode(audio, start) if len(audio) else []
+            decoded = window_end
+
+            full = window_end - start >= self.window
+            final, provisional = self._split(segments, window_end, finishing, full)
+            if final:
+                committed = min(window_end, max(start, int(round(final[-1].end * SAMPLE_RATE))))
+            if full or (not segments and window_end - start > self.stable):
+                # Janela cheia ou sem fala: a próxima começa perto do fim desta, o que limita o atraso
+                committed = max(committed, window_end - self.stable)
+
+            for segment in final:
+                segment.id = self.next_id
+                self.next_id += 1
+            for index, segment in enumerate(provisional):
+                segment.id = self.next_id + index
+
+            yield StreamUpdate(final, provisional, available / SAMPLE_RATE, (buffer.end - window_end) / SAMPLE_RATE,
+                               dropped / SAMPLE_RATE, done=finishing)
+            if finishing:
+                return
+
+    def _decode(self, audio, start):
+        """Segmentos da janela com os tempos na linha do tempo da sessão"""
+        if self.language is None:
+            # Idioma fixado na primeira janela, para não variar entre as decodificações
+            _, probabilities = self.engine.detect_language(audio)
+            detection = combine_probabilities([probabilities])
+            self.language = detection.language
+            if self.language_detected:
+                self.language_detected(detection)
+
+        offset = start / SAMPLE_RATE
+        segments = []
+        with get_tracer().span("stream_window", seconds=round(len(audio) / SAMPLE_RATE, 1)):
+            for window in self.engine.transcribe_stream(audio, language=self.language,
+                                                        cancel_token=self.cancel_token,
+                                                        condition_on_previous_text=False, **self.options):
+                for segment in window.segments:
+                    segments.append(Segment(
+                        start=round(offset + segment.start, 3),
+                        end=round(offset + segment.end, 3),
+                        text=segment.text,
+                        avg_logprob=segment.avg_logprob,
+                        no_speech_prob=segment.no_speech_prob,
+                    ))
+        return segments
+
+    def _split(self, segments, window_end, finishing, full):
+        """Separa os segmentos em definitivos (um prefixo) e provisórios"""
+        if finishing:
+            return segments, []
+        horizon = (window_end - self.stable) / SAMPLE_RATE
+        if full:
+            # A janela não cresce mais: tudo que começa antes do horizonte é definitivo
+            count = sum(1 for segment in segments if segment.start < horizon)
+            return segments[:count], segments[count:]
+        # O último segmento de uma janela costuma estar cortado: fica provisório
+        count = 0
+        for index, segment in enumerate(segments[:-1]):
+            if segment.end <= horizon:
+                count = index + 1
+        return segments[:count], segments[count:]
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+from collections import deque
+
+# Trechos guardados para exportação; as estatísticas por etapa não têm limite
+DEFAULT_MAX_SPANS = 20000
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+class Tracer:
+    def __init__(self, max_spans=DEFAULT_MAX_SPANS):
+        """Trechos nomeados com tempo monotônico e contadores por etapa
+
+        Cada trecho custa duas leituras de time.perf_counter e um append; os
+        mais antigos são descartados quando o limite é atingido, mas o total,
+        a contagem e o máximo de cada etapa continuam corretos.
+        """
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_spans)
+        self._stats = {}
+        self._counters = {}
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Mede o bloco with como um trecho da etapa name"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), args)
+
+    def record(self, name, start, end, args=None):
+        """Registra um trecho já medido (start e end de time.perf_counter)"""
+        if not self.enabled:
+            return
+        duration = end - start
+        event = (name, start, duration, threading.get_ident(), args or None)
+        with self._lock:
+            self._events.append(event)
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+
+    def count(self, name, value=1):
+        """Soma value ao contador name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def stats(self):
+        """Tempo por etapa: {nome: {count, total, mean, max}} em segundos"""
+        with self._lock:
+            return {
+                name: {"count": count, "total": total, "mean": total / count, "max": longest}
+                for name, (count, total, longest) in self._stats.items()
+            }
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        """Descarta trechos, estatísticas e contadores"""
+        with self._lock:
+            self._events.clear()
+            self._stats.clear()
+            self._counters.clear()
+            self._origin = time.perf_counter()
+
+    def report(self):
+        """Resumo em texto, etapas ordenadas pelo tempo total"""
+        stats = sorted(self.stats().items(), key=lambda item: item[1]["total"], reverse=True)
+        lines = [f"{'etapa':<24}{'vezes':>7}{'total (s)':>11}{'média (ms)':>12}{'máx (ms)':>10}"]
+        for name, entry in stats:
+            lines.append(f"{name:<24}{entry['count']:>7}{entry['total']:>11.2f}"
+                         f"{entry['mean'] * 1000:>12.1f}{entry['max'] * 1000:>10.1f}")
+        counters = self.counters()
+        if counters:
+            lines.append("")
+            for name, value in sorted(counters.items()):
+                value = f"{value:,.1f}" if isinstance(value, float) else f"{value:,}"
+                lines.append(f"{name:<24}{value:>18}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """Estatísticas e contadores em um dicionário serializável"""
+        return {"stages": self.stats(), "counters": self.counters()}
+
+    def to_chrome_trace(self):
+        """Trechos no formato do chrome://tracing e do Perfetto (eventos completos "X")"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            origin = self._origin
+            counters = dict(self._counters)
+
+        trace_events = []
+        for name, start, duration, thread_id, args in events:
+            event = {
+                "name": name, "cat": "falamemo", "ph": "X", "pid": pid, "tid": thread_id,
+                "ts": round((start - origin) * 1e6, 1), "dur": round(duration * 1e6, 1),
+            }
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": counters},
+        }
+
+    def export(self, path, format=None):
+        """Grava o trace; format "chrome" (padrão para .json) ou "stats" (só o resumo por etapa)"""
+        data = self.to_dict() if format == "stats" else self.to_chrome_trace()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return path
+
+
+def get_tracer():
+    """Retorna o tracer compartilhado pelo processo"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+STARTUP_LOG_PATH = os.path.join(os.path.expanduser("~"), ".falamemo", "inicializacao.jsonl")
+
+
+def process_age():
+    """Segundos desde a criação do processo (inclui a extração do executável onefile), se o psutil existir"""
+    try:
+        import psutil
+        return max(0.0, time.time() - psutil.Process().create_time())
+    except Exception:
+        return None
+
+
+def record_startup(started, imported, built, shown, log_path=None):
+    """Registra o tempo até a janela aparecer no tracer e em um log JSONL (um registro por abertura)
+
+    started, imported, built e shown são leituras de time.perf_counter: início
+    do main.py, fim das importações, interface montada e janela exibida.
+    """
+    tracer = get_tracer()
+    tracer.record("startup_imports", started, imported)
+    tracer.record("startup_ui", imported, built)
+    tracer.record("time_to_window", started, shown)
+
+    entry = {
+        "time": round(time.time(), 3),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "imports": round(imported - started, 3),
+        "ui": round(built - imported, 3),
+        "time_to_window": round(shown - started, 3),
+    }
+    # Tempo antes do main.py (interpretador e, no executável, extração dos arquivos)
+    age = process_age()
+    if age is not None:
+        entry["before_main"] = round(max(0.0, age - (time.perf_counter() - started)), 3)
+
+    log_path = log_path or STARTUP_LOG_PATH
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"Não foi possível gravar o tempo de inicialização: {e}")
+    return entry
@@ -0,0 +1,213 @@
+import bisect
+from dataclasses import dataclass, field
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Quantos quadros analisar por vez, para não criar uma matriz do áudio inteiro
+FRAMES_PER_BLOCK = 8192
+
+
+@dataclass
+class VadReport:
+    """Resumo do pré-processamento de detecção de voz"""
+    total_duration: float
+    speech_duration: float
+    regions: list = field(default_factory=list)
+
+    @property
+    def skipped_duration(self):
+        return max(0.0, self.total_duration - self.speech_duration)
+
+    @property
+    def skipped_ratio(self):
+        if self.total_duration <= 0:
+            return 0.0
+        return self.skipped_duration / self.total_duration
+
+    def to_dict(self):
+        """Converte o relatório em um dicionário serializável"""
+        return {
+            "total_duration": round(self.total_duration, 3),
+            "speech_duration": round(self.speech_duration, 3),
+            "skipped_duration": round(self.skipped_duration, 3),
+            "skipped_ratio": round(self.skipped_ratio, 4),
+            "regions": len(self.regions),
+        }
+
+
+def frame_features(audio, frame_size):
+    """Calcula energia (dB) e planicidade espectral de cada quadro do áudio"""
+    n_frames = len(audio) // frame_size
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+    window = np.hanning(frame_size).astype(np.float32)
+
+    for first in range(0, n_frames, FRAMES_PER_BLOCK):
+        last = min(n_frames, first + FRAMES_PER_BLOCK)
+        frames = np.asarray(audio[first * frame_size:last * frame_size], dtype=np.float32)
+        frames = frames.reshape(last - first, frame_size)
+
+        energy_db[first:last] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        # Ruído tem espectro plano (perto de 1); voz concentra energia em harmônicos
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-10
+        flatness[first:last] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+    return energy_db, flatness
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=None,
+                  max_flatness=0.5, min_speech=0.25, min_silence=0.6, padding=0.3):
+    """Encontra as regiões com voz, devolvendo pares (início, fim) em amostras
+
+    O limiar de energia se adapta ao ruído de fundo da gravação (10 dB acima
+    do 10º percentil), a menos que threshold_db seja informado.
+    """
+    frame_size = int(sample_rate * frame_ms / 1000)
+    energy_db, flatness = frame_features(audio, frame_size)
+    if len(energy_db) == 0:
+        return []
+
+    if threshold_db is None:
+        threshold_db = max(float(np.percentile(energy_db, 10)) + 10, -60.0)
+
+    is_speech = (energy_db > threshold_db) & (flatness < max_flatness)
+
+    # Converter quadros com voz em regiões contínuas [início, fim)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0]))))
+    regions = [[int(start), int(end)] for start, end in zip(edges[0::2], edges[1::2])]
+
+    frames_per_second = 1000 / frame_ms
+    gap_frames = int(min_silence * frames_per_second)
+    min_frames = int(min_speech * frames_per_second)
+    pad_samples = int(padding * sample_rate)
+
+    # Unir regiões separadas por pausas curtas
+    merged = []
+    for region in regions:
+        if merged and region[0] - merged[-1][1] <= gap_frames:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+
+    # Descartar estalos curtos e expandir as bordas para não cortar palavras
+    total = len(audio)
+    padded = []
+    for start, end in merged:
+        if end - start < min_frames:
+            continue
+        start = max(0, start * frame_size - pad_samples)
+        end = min(total, end * frame_size + pad_samples)
+        if padded and start <= padded[-1][1]:
+            padded[-1][1] = max(padded[-1][1], end)
+        else:
+            padded.append([start, end])
+
+    return [(start, end) for start, end in padded]
+
+
+class SpeechAudio:
+    def __init__(self, audio, regions):
+        """Áudio só com voz sem cópia: cada fatia lê do áudio original apenas as regiões que cobre
+
+        Equivale a SpeechTimeline.extract, mas não materializa o áudio
+        concatenado; com um memmap, a memória fica limitada ao trecho lido.
+        """
+        self.audio = audio
+        self.regions = list(regions)
+        self.dtype = np.dtype(np.float32)
+        self._offsets = []
+        offset = 0
+        for start, end in self.regions:
+            self._offsets.append(offset)
+            offset += end - start
+        self._length = offset
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def shape(self):
+        return (self._length,)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("SpeechAudio só aceita fatias contíguas")
+        first, last, _ = key.indices(self._length)
+        if last <= first:
+            return np.zeros(0, dtype=np.float32)
+
+        pieces = []
+        index = max(0, bisect.bisect_right(self._offsets, first) - 1)
+        while index < len(self.regions) and self._offsets[index] < last:
+            start, end = self.regions[index]
+            offset = self._offsets[index]
+            piece_first = max(first, offset) - offset
+            piece_last = min(last, offset + end - start) - offset
+            if piece_last > piece_first:
+                pieces.append(np.asarray(self.audio[start + piece_first:start + piece_last], dtype=np.float32))
+            index += 1
+        return np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+
+
+class SpeechTimeline:
+    def __init__(self, regions, sample_rate=SAMPLE_RATE):
+        """Converte tempos do áudio só com voz para a linha do tempo original"""
+        self.sample_rate = sample_rate
+        self.regions = list(regions)
+        self._concat_starts = []
+        self._original_starts = []
+
+        offset = 0
+        for start, end in self.regions:
+            self._concat_starts.append(offset / sample_rate)
+            self._original_starts.append(start / sample_rate)
+            offset += end - start
+        self.speech_duration = offset / sample_rate
+
+    def extract(self, audio):
+        """Concatena apenas os trechos com voz do áudio"""
+        if not self.regions:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([np.asarray(audio[start:end], dtype=np.float32) for start, end in self.regions])
+
+    def view(self, audio):
+        """Como extract, mas sem copiar: as amostras são lidas sob demanda"""
+        return SpeechAudio(audio, self.regions)
+
+    def to_original(self, seconds, is_end=False):
+        """Converte um tempo do áudio concatenado para o áudio original"""
+        if not self.regions:
+            return seconds
+        # Um fim exatamente na junção pertence à região anterior
+        if is_end:
+            index = bisect.bisect_left(self._concat_starts, seconds) - 1
+        else:
+            index = bisect.bisect_right(self._concat_starts, seconds) - 1
+        index = max(0, index)
+        return self._original_starts[index] + (seconds - self._concat_starts[index])
+
+    def map_segment(self, segment):
+        """Ajusta os tempos de um segmento para a linha do tempo original"""
+        segment.start = round(self.to_original(segment.start), 3)
+        segment.end = round(self.to_original(segment.end, is_end=True), 3)
+        return segment
+
+
+def prepare_speech_audio(audio, sample_rate=SAMPLE_RATE, lazy=False, **vad_options):
+    """Detecta a voz e devolve (áudio só com voz, linha do tempo, relatório)
+
+    Com lazy=True, o áudio só com voz é um SpeechAudio que lê do original
+    sob demanda, em vez de uma cópia concatenada.
+    """
+    regions = detect_speech(audio, sample_rate, **vad_options)
+    timeline = SpeechTimeline(regions, sample_rate)
+    report = VadReport(
+        total_duration=len(audio) / sample_rate,
+        speech_duration=timeline.speech_duration,
+        regions=[(start / sample_rate, end / sample_rate) for start, end in regions],
+    )
+    speech = timeline.view(audio) if lazy else timeline.extract(audio)
+    return speech, timeline, report